@@ -1,16 +1,38 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends, Request
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
-from typing import List
+from typing import List, Optional, Iterable, Union
 import uuid
+import asyncio
+import gzip
+import json
+import hashlib
 from code_analyzer.pipeline import analyze_code
+from code_analyzer.response_parser import CompactResult, ResponseParser, SECTIONS
+from code_analyzer.concurrency import model_circuit_breaker, get_backend_metrics
+from code_analyzer.static_analyzer import get_static_pass_metrics
+from code_analyzer.batcher import get_batcher_metrics
+from code_analyzer.fingerprint import fingerprint_index
+from code_analyzer.router import model_router
+from code_analyzer.admission import AdmissionRejected, admission_controller
+from code_analyzer.cancellation import ANALYSIS_IDLE_TIMEOUT, CancellationToken, get_cancellation_metrics
+from code_analyzer.streaming import MAX_UPLOAD_BYTES, UploadStream
+from code_analyzer.profiling import ProfileSession
+from code_analyzer.cassette import get_cassette_metrics
+from code_analyzer.warmup import get_readiness, warm_up
 import os
 from datetime import datetime
 from fastapi.security import APIKeyHeader
 from fastapi.openapi.utils import get_openapi
 import logging
 
+try:
+    import brotli  # Optional, enables 'br' encoding of large results
+except ImportError:
+    brotli = None
+
 app = FastAPI(
     title="AI Code Analysis API",
     description="API for AI-based code analysis and correctness assessment",
@@ -30,6 +52,10 @@ RATE_LIMIT_WINDOW = 60  # 1 minute window
 MAX_REQUESTS_PER_WINDOW = 100  # Increased from 10 to 100 requests per minute
 request_times = {}
 
+# Header a trusted gateway sets to identify the tenant. Unset, tenants are told
+# apart by client IP, since every client shares the one API key.
+TENANT_HEADER = os.getenv('TENANT_HEADER', '')
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -40,14 +66,28 @@ app.add_middleware(
 )
 
 # Store analysis results and status
-analysis_results = {}
+analysis_results = {}  # CompactResult once completed, or a small error dict once failed
 analysis_status = {}
 analysis_timestamps = {}
+analysis_completed_at = {}
+analysis_tokens = {}  # CancellationToken per analysis that may still be doing work
+analysis_profiles = {}  # ProfileReport of analyses submitted with an X-Profile header
+upload_tasks = set()  # Analyses of uploads still in progress, referenced so they are not collected
+
+# Finished analyses are dropped after this long so results are not held forever
+RESULT_TTL_SECONDS = int(os.getenv('RESULT_TTL_SECONDS', 3600))
+# Responses smaller than this are not worth compressing
+MIN_COMPRESS_BYTES = 1024
 
 class CodeSubmission(BaseModel):
     code: str = Field(..., min_length=1, description="The code to analyze")
     language: str = Field(default="python", description="Programming language of the code")
     mode: str = Field(default="full", description="Analysis mode: 'full', 'quick', or 'deep'")
+    latency_budget_ms: Optional[int] = Field(
+        default=None, gt=0,
+        description="Time the caller is willing to wait for results; partial results are returned when it expires"
+    )
+    refine: bool = Field(default=True, description="Keep refining partial results in the background")
 
 async def get_api_key(api_key: str = Depends(api_key_header)):
     # In production, validate against a database or environment variable
@@ -80,20 +120,125 @@ async def rate_limit_middleware(request: Request, call_next):
 # Add rate limiting middleware
 app.middleware("http")(rate_limit_middleware)
 
+@app.on_event("startup")
+async def start_warm_up():
+    # In the background, so /health answers while the process warms up
+    asyncio.get_running_loop().run_in_executor(None, warm_up)
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.now().isoformat()}
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 503 until warm-up has finished, or if it failed to build the model client.
+
+    /health only shows the process is up. The 503 body lists the phases that failed.
+    """
+    readiness = get_readiness()
+    if not readiness["ready"]:
+        return JSONResponse(status_code=503, content=readiness)
+    return readiness
+
+@app.get("/metrics")
+async def metrics():
+    return {
+        "model_backend": get_backend_metrics(),
+        "static_pass": get_static_pass_metrics(),
+        "micro_batching": get_batcher_metrics(),
+        "result_reuse": fingerprint_index.snapshot(),
+        "model_routing": model_router.snapshot(),
+        "cancellation": get_cancellation_metrics(),
+        "admission": admission_controller.snapshot(),
+        "model_cassette": get_cassette_metrics(),
+        "timestamp": datetime.now().isoformat()
+    }
+
+def store_results(analysis_id: str, results: dict):
+    """Keep completed results in compact, structured form."""
+    analysis_results[analysis_id] = ResponseParser().parse(results).compact()
+    analysis_completed_at[analysis_id] = datetime.now()
+
+def evict_expired_analyses():
+    """Forget analyses that finished more than RESULT_TTL_SECONDS ago.
+
+    The TTL runs from when results were stored, so long analyses keep them
+    as long as short ones; analyses that ended without results count from
+    submission.
+    """
+    now = datetime.now()
+    expired = [
+        analysis_id for analysis_id, submitted_at in list(analysis_timestamps.items())
+        if analysis_status.get(analysis_id) != "processing"
+        and (now - analysis_completed_at.get(analysis_id, submitted_at)).total_seconds() > RESULT_TTL_SECONDS
+    ]
+    for analysis_id in expired:
+        forget_analysis(analysis_id)
+    if expired:
+        logger.info(f"Evicted {len(expired)} expired analyses")
+
+def tenant_of(request: Request) -> str:
+    """Who an analysis is accounted to, for admission quotas and result reuse."""
+    if TENANT_HEADER:
+        tenant = request.headers.get(TENANT_HEADER)
+        if tenant:
+            return f"tenant:{tenant}"
+    return f"ip:{request.client.host}"
+
+def register_analysis(tenant: str, mode: str) -> str:
+    """Admit a new analysis and set up its bookkeeping.
+
+    Raises:
+        HTTPException: 503 while the model backend is unhealthy or the server is
+            overloaded, 429 when the tenant is over its quota.
+    """
+    # Fail fast while the model backend is known to be unhealthy
+    if model_circuit_breaker.is_open():
+        retry_after = max(1, int(round(model_circuit_breaker.retry_after())))
+        raise HTTPException(
+            status_code=503,
+            detail="Model backend is temporarily unavailable. Please retry later.",
+            headers={"Retry-After": str(retry_after)}
+        )
+    evict_expired_analyses()
+    analysis_id = str(uuid.uuid4())
+    # Bound the work in flight: overload and per-key quotas are rejected up front
+    try:
+        admission_controller.admit(analysis_id, tenant=tenant, mode=mode)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    analysis_status[analysis_id] = "processing"
+    analysis_timestamps[analysis_id] = datetime.now()
+    analysis_tokens[analysis_id] = CancellationToken(idle_timeout=ANALYSIS_IDLE_TIMEOUT)
+    return analysis_id
+
+def forget_analysis(analysis_id: str):
+    for store in (analysis_results, analysis_status, analysis_timestamps, analysis_completed_at, analysis_tokens,
+                  analysis_profiles):
+        store.pop(analysis_id, None)
+
+def requested_profile(request: Request) -> Optional[ProfileSession]:
+    """Profile session asked for with the X-Profile header, when PROFILING_ENABLED allows it."""
+    try:
+        return ProfileSession.from_header(request.headers.get("x-profile"))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @app.post("/analyze")
 async def submit_code(
     code_submission: CodeSubmission,
     background_tasks: BackgroundTasks,
+    request: Request,
     api_key: str = Depends(get_api_key)
 ):
     logger.info("Received code analysis request")
-    analysis_id = str(uuid.uuid4())
-    analysis_status[analysis_id] = "processing"
-    analysis_timestamps[analysis_id] = datetime.now()
+    profile = requested_profile(request)
+    tenant = tenant_of(request)
+    analysis_id = register_analysis(tenant, code_submission.mode)
     
     # Process the code directly without creating a temporary file
     background_tasks.add_task(
@@ -101,7 +246,11 @@ async def submit_code(
         analysis_id, 
         code_submission.code,
         code_submission.mode,
-        code_submission.language
+        code_submission.language,
+        code_submission.latency_budget_ms,
+        code_submission.refine,
+        profile=profile,
+        tenant=tenant
     )
     
     return {
@@ -110,22 +259,151 @@ async def submit_code(
         "message": "Analysis started"
     }
 
+@app.post("/analyze/upload")
+async def upload_code(
+    request: Request,
+    language: str = Query("python", description="Programming language of the code"),
+    mode: str = Query("full", description="Analysis mode: 'full', 'quick', or 'deep'"),
+    api_key: str = Depends(get_api_key)
+):
+    """Analyze a large file sent as the raw request body.
+
+    The body is chunked while it is being received and analysis of the first
+    chunks starts before the upload has finished. The body is only read once
+    the analysis has been given an admission slot. Uploads over MAX_UPLOAD_MB
+    are rejected with 413.
+    """
+    content_length = request.headers.get("content-length")
+    if content_length is not None and content_length.isdigit() and int(content_length) > MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {MAX_UPLOAD_BYTES} bytes")
+
+    logger.info("Received streaming code upload")
+    profile = requested_profile(request)
+    tenant = tenant_of(request)
+    analysis_id = register_analysis(tenant, mode)
+    upload = UploadStream()
+    admitted = asyncio.Event()
+    task = asyncio.ensure_future(run_analysis_direct(analysis_id, upload, mode, language, is_code_stream=True,
+                                                     profile=profile, tenant=tenant, admitted=admitted))
+    upload_tasks.add(task)
+    task.add_done_callback(upload_tasks.discard)
+
+    # Nothing reads the body while the analysis is queued, and feeding it then would park a
+    # worker thread per queued upload; the client is held back by the transport instead
+    if not await wait_until_admitted(analysis_id, admitted, task):
+        return {
+            "analysis_id": analysis_id,
+            "status": analysis_status.get(analysis_id, "cancelled"),
+            "bytes_received": 0,
+            "message": "Analysis ended before the upload was read"
+        }
+
+    try:
+        async for data in request.stream():
+            if upload.bytes_received + len(data) > MAX_UPLOAD_BYTES:
+                raise HTTPException(status_code=413, detail=f"Upload exceeds {MAX_UPLOAD_BYTES} bytes")
+            analysis_tokens[analysis_id].touch()
+            # Blocks while the chunker is behind, which throttles the upload
+            if data and not await run_in_threadpool(upload.feed, data):
+                break  # The analysis stopped reading; its status says why
+        await run_in_threadpool(upload.close)
+    except Exception as e:
+        # The analysis stops at the next line it reads; the client never got its ID
+        analysis_tokens[analysis_id].cancel('upload_failed')
+        await run_in_threadpool(upload.close, e)
+        forget_analysis(analysis_id)
+        if isinstance(e, HTTPException):
+            raise
+        logger.error(f"Upload for analysis {analysis_id} failed: {str(e)}")
+        raise HTTPException(status_code=400, detail="Upload failed")
+
+    return {
+        "analysis_id": analysis_id,
+        "status": "processing",
+        "bytes_received": upload.bytes_received,
+        "message": "Analysis started"
+    }
+
+
+async def wait_until_admitted(analysis_id: str, admitted: asyncio.Event, task: asyncio.Future,
+                              poll_interval: float = 1.0) -> bool:
+    """Wait until an upload's analysis holds an admission slot.
+
+    The sender is still there while it waits, so the idle timeout is held off.
+
+    Returns:
+        False if the analysis ended, e.g. was cancelled, while it was still queued.
+    """
+    waiter = asyncio.ensure_future(admitted.wait())
+    try:
+        while not admitted.is_set() and not task.done():
+            touch_analysis(analysis_id)
+            await asyncio.wait({waiter, task}, timeout=poll_interval, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        waiter.cancel()
+    return admitted.is_set()
+
 
 # New method that processes code strings directly
-async def run_analysis_direct(analysis_id: str, code_string: str, mode: str, language: str = 'python'):
+async def run_analysis_direct(analysis_id: str, code: Union[str, Iterable[str]], mode: str, language: str = 'python',
+                              latency_budget_ms: Optional[int] = None, refine: bool = True,
+                              is_code_stream: bool = False, profile: Optional[ProfileSession] = None,
+                              tenant: str = '', admitted: Optional[asyncio.Event] = None):
+    cancel_token = analysis_tokens[analysis_id]
     try:
+        if not await admission_controller.wait_for_slot(analysis_id, cancel_token):
+            logger.info(f"Analysis {analysis_id} cancelled while queued ({cancel_token.reason})")
+            if analysis_id in analysis_status:
+                analysis_status[analysis_id] = "cancelled"
+                analysis_results[analysis_id] = {"error": f"Analysis cancelled ({cancel_token.reason})",
+                                                 "error_type": "cancelled"}
+            return
+        if admitted is not None:
+            admitted.set()
+
         logger.info(f"Starting direct analysis for ID: {analysis_id} with language: {language}")
         
-        # Process the code string directly with language parameter
-        results = analyze_code(code_string, mode=mode, is_code_string=True, language=language)
+        latency_budget = None
+        if latency_budget_ms is not None:
+            # The budget runs from submission, not from when the background task starts
+            elapsed = (datetime.now() - analysis_timestamps[analysis_id]).total_seconds()
+            latency_budget = max(0.0, latency_budget_ms / 1000 - elapsed)
+
+        def store_refined_results(refined_results):
+            # Refinement can outlive the analysis: a cancelled or evicted one must not come back
+            if cancel_token.cancel_requested or analysis_tokens.get(analysis_id) is not cancel_token:
+                return
+            store_results(analysis_id, refined_results)
+            logger.info(f"Analysis {analysis_id} refined to complete results")
+
+        # Process the code string directly with language parameter, off the event
+        # loop so status polls and cancellations are served while it runs
+        results = await run_in_threadpool(
+            analyze_code,
+            code, mode=mode, is_code_string=not is_code_stream, is_code_stream=is_code_stream, language=language,
+            latency_budget=latency_budget, on_refined=store_refined_results if refine else None,
+            cancel_token=cancel_token, profile=profile, reuse_scope=tenant
+        )
+        if profile is not None and analysis_id in analysis_status:
+            analysis_profiles[analysis_id] = profile.report
         
-        if 'error' in results:
+        if analysis_id not in analysis_status:
+            logger.info(f"Analysis {analysis_id} was forgotten while running")
+        elif cancel_token.cancel_requested:
+            logger.info(f"Analysis {analysis_id} cancelled ({cancel_token.reason})")
+            analysis_status[analysis_id] = "cancelled"
+            analysis_results[analysis_id] = {"error": f"Analysis cancelled ({cancel_token.reason})",
+                                             "error_type": "cancelled"}
+        elif 'error' in results:
             logger.error(f"Analysis {analysis_id} failed: {results['error']}")
             analysis_status[analysis_id] = "failed"
-            analysis_results[analysis_id] = {"error": results['error']}
+            analysis_results[analysis_id] = {
+                key: results[key] for key in ('error', 'error_type', 'retry_after') if key in results
+            }
         else:
-            # Save the results
-            analysis_results[analysis_id] = results
+            # Save the results, unless background refinement already replaced them
+            if analysis_id not in analysis_results:
+                store_results(analysis_id, results)
             analysis_status[analysis_id] = "completed"
             logger.info(f"Analysis {analysis_id} completed successfully")
         
@@ -133,6 +411,10 @@ async def run_analysis_direct(analysis_id: str, code_string: str, mode: str, lan
         logger.error(f"Analysis {analysis_id} failed with exception: {str(e)}")
         analysis_status[analysis_id] = "failed"
         analysis_results[analysis_id] = {"error": str(e)}
+    finally:
+        admission_controller.release(analysis_id)
+        if is_code_stream:
+            code.abandon()
 
 @app.get("/status/{analysis_id}")
 async def get_status(
@@ -144,12 +426,13 @@ async def get_status(
     if analysis_id not in analysis_status:
         logger.error(f"Analysis ID not found: {analysis_id}")
         raise HTTPException(status_code=404, detail="Analysis ID not found")
+    touch_analysis(analysis_id)
     
     # Get current step based on analysis status
     current_step = "submitting"
     if analysis_status[analysis_id] == "processing":
         # Check which sections have been completed
-        if analysis_id in analysis_results:
+        if isinstance(analysis_results.get(analysis_id), dict):
             results = analysis_results[analysis_id]
             if "correctness_analysis" in results and results["correctness_analysis"]:
                 current_step = "correctness"
@@ -159,39 +442,168 @@ async def get_status(
                 current_step = "semantic"
             elif "test_cases" in results and results["test_cases"]:
                 current_step = "test_cases"
-    elif analysis_status[analysis_id] == "completed":
-        current_step = "completed"
+    elif analysis_status[analysis_id] in ("completed", "cancelled"):
+        current_step = analysis_status[analysis_id]
     
     # Return detailed status
     logger.info(f"Current step for {analysis_id}: {current_step}")
     
-    return {
+    status = {
         "status": analysis_status[analysis_id],
         "current_step": current_step,
         "progress": get_progress_percentage(current_step),
         "submitted_at": analysis_timestamps[analysis_id].isoformat() if analysis_id in analysis_timestamps else None
     }
+    if analysis_id in analysis_profiles:
+        status["profile_formats"] = analysis_profiles[analysis_id].formats()
+    if analysis_status[analysis_id] in ("failed", "cancelled"):
+        failure = analysis_results.get(analysis_id, {})
+        status["error"] = failure.get("error")
+        if "retry_after" in failure:
+            status["retry_after"] = failure["retry_after"]
+    return status
 
 def get_progress_percentage(current_step: str) -> int:
+    if current_step == "completed":
+        return 100
     steps = ["submitting", "correctness", "edge_cases", "semantic", "test_cases"]
+    if current_step not in steps:
+        return 0
     current_index = steps.index(current_step)
     return int((current_index / (len(steps) - 1)) * 100)
 
+def touch_analysis(analysis_id: str):
+    """Note that a client is still polling, which keeps the idle timeout from abandoning the analysis."""
+    token = analysis_tokens.get(analysis_id)
+    if token is not None:
+        token.touch()
+
+@app.delete("/analysis/{analysis_id}")
+async def cancel_analysis(
+    analysis_id: str,
+    api_key: str = Depends(get_api_key)
+):
+    """Cancel a running analysis, or forget a finished one and its results."""
+    if analysis_id not in analysis_status:
+        raise HTTPException(status_code=404, detail="Analysis ID not found")
+
+    if analysis_status[analysis_id] == "processing":
+        # Pending chunk x stage calls are skipped; calls already in flight finish first
+        analysis_tokens[analysis_id].cancel('client')
+        analysis_status[analysis_id] = "cancelled"
+        analysis_results[analysis_id] = {"error": "Analysis cancelled (client)", "error_type": "cancelled"}
+        logger.info(f"Analysis {analysis_id} cancelled by client")
+        return {"analysis_id": analysis_id, "status": "cancelled"}
+
+    token = analysis_tokens.get(analysis_id)
+    if token is not None and getattr(analysis_results.get(analysis_id), 'partial', False):
+        token.cancel('client')  # Stops background refinement of the partial results
+    forget_analysis(analysis_id)
+    logger.info(f"Analysis {analysis_id} deleted")
+    return {"analysis_id": analysis_id, "status": "deleted"}
+
+@app.get("/profile/{analysis_id}")
+async def get_profile(
+    analysis_id: str,
+    format: str = Query("pstats", pattern="^(pstats|collapsed|memory)$",
+                        description="'pstats' for cProfile data, 'collapsed' for flamegraph input, "
+                                    "'memory' for tracemalloc statistics"),
+    api_key: str = Depends(get_api_key)
+):
+    """Download the profile of an analysis submitted with an X-Profile header."""
+    if analysis_id not in analysis_status:
+        raise HTTPException(status_code=404, detail="Analysis ID not found")
+    if analysis_status[analysis_id] == "processing":
+        raise HTTPException(status_code=409, detail="Analysis is still running")
+    report = analysis_profiles.get(analysis_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Analysis was not profiled")
+    if format not in report.formats():
+        raise HTTPException(status_code=404, detail=f"No {format} data; available: {', '.join(report.formats())}")
+
+    if format == "memory":
+        return {"analysis_id": analysis_id, "duration_seconds": report.duration, **report.memory}
+    if format == "pstats":
+        # Load with pstats.Stats(path) or open in snakeviz
+        return Response(content=report.pstats, media_type="application/octet-stream",
+                        headers={"Content-Disposition": f'attachment; filename="{analysis_id}.pstats"'})
+    # Feed to flamegraph.pl, speedscope or inferno
+    return Response(content=report.collapsed, media_type="text/plain",
+                    headers={"Content-Disposition": f'attachment; filename="{analysis_id}.collapsed"'})
+
+def encode_body(body: bytes, accept_encoding: str):
+    """Compress a response body with the best encoding the client accepts."""
+    if len(body) < MIN_COMPRESS_BYTES:
+        return body, None
+    accepted = {token.split(';')[0].strip() for token in accept_encoding.lower().split(',')}
+    if brotli is not None and 'br' in accepted:
+        return brotli.compress(body, quality=5), 'br'
+    if 'gzip' in accepted:
+        return gzip.compress(body, compresslevel=6), 'gzip'
+    return body, None
+
+def render_results(analysis_id: str, compact: CompactResult, completed_at: Optional[datetime], view: str,
+                   sections: Optional[List[str]], chunk_offset: int, chunk_limit: Optional[int],
+                   accept_encoding: str):
+    """Build the encoded /results body; returns (body, content encoding or None)."""
+    result = compact.load()
+    payload = {
+        "analysis_id": analysis_id,
+        "partial": compact.partial,
+        "refining": compact.partial and result.metadata.get("refining", False),
+        "completed_at": completed_at.isoformat() if completed_at else None
+    }
+    if view == "chunks":
+        end = compact.chunk_count if chunk_limit is None else chunk_offset + chunk_limit
+        payload["chunks"] = [chunk.to_dict(sections) for chunk in result.chunks[chunk_offset:end]]
+        payload["total_chunks"] = compact.chunk_count
+        payload["next_offset"] = end if end < compact.chunk_count else None
+    else:
+        payload["results"] = result.to_sections(sections)
+    return encode_body(json.dumps(payload).encode("utf-8"), accept_encoding)
+
 @app.get("/results/{analysis_id}")
 async def get_results(
     analysis_id: str,
+    request: Request,
+    view: str = Query("sections", pattern="^(sections|chunks)$",
+                      description="'sections' for one joined text per section, 'chunks' for per-chunk results"),
+    section: Optional[str] = Query(None, description="Comma-separated sections to include"),
+    chunk_offset: int = Query(0, ge=0, description="First chunk to return when view=chunks"),
+    chunk_limit: Optional[int] = Query(None, ge=1, description="Maximum chunks to return when view=chunks"),
     api_key: str = Depends(get_api_key)
 ):
     if analysis_id not in analysis_results:
         raise HTTPException(status_code=404, detail="Results not found")
+    touch_analysis(analysis_id)
     if analysis_status[analysis_id] != "completed":
         raise HTTPException(status_code=400, detail="Analysis not completed")
     
-    return {
-        "analysis_id": analysis_id,
-        "results": analysis_results[analysis_id],
-        "completed_at": datetime.now().isoformat()
-    }
+    sections = None
+    if section:
+        sections = [name.strip() for name in section.split(',')]
+        unknown = [name for name in sections if name not in SECTIONS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown sections: {', '.join(unknown)}")
+
+    compact = analysis_results[analysis_id]
+    # The ETag covers the stored results and the requested slice of them
+    etag = '"' + hashlib.blake2b(f"{compact.etag}?{request.url.query}".encode(), digest_size=12).hexdigest() + '"'
+    if_none_match = request.headers.get("if-none-match", "")
+    client_tags = [tag.strip() for tag in if_none_match.split(",")]
+    if etag in [tag[2:] if tag.startswith("W/") else tag for tag in client_tags]:
+        return Response(status_code=304, headers={"ETag": etag, "Vary": "Accept-Encoding"})
+
+    completed_at = analysis_completed_at.get(analysis_id)
+    # Decompressing, serializing and compressing large results would stall the event loop
+    body, encoding = await run_in_threadpool(
+        render_results, analysis_id, compact, completed_at, view, sections, chunk_offset, chunk_limit,
+        request.headers.get("accept-encoding", "")
+    )
+    headers = {"ETag": etag, "Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 # Custom OpenAPI schema
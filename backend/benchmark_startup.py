@@ -0,0 +1,112 @@
+"""Startup-time benchmark for the API.
+
+Measures, in fresh interpreters, how long ``import api`` takes and how long
+a uvicorn server takes to answer /health and to report /ready. Exits with
+status 1 when a median exceeds its limit or when importing the API loads
+the model SDK, so it can guard cold start in CI:
+
+    python benchmark_startup.py --runs 5 --max-import 1.0 --max-ready 5.0
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import statistics
+import subprocess
+import urllib.request
+import urllib.error
+from typing import Dict, List, Any, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+HEAVY_MODULES = ['google.genai']  # Must only be imported by warm-up or the first analysis
+
+IMPORT_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import api
+print(json.dumps({'seconds': time.perf_counter() - start,
+                  'loaded': [name for name in %r if name in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+def measure_import() -> Dict[str, Any]:
+    output = subprocess.run([sys.executable, '-c', IMPORT_PROBE], cwd=BACKEND_DIR, capture_output=True,
+                            text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def _wait_for(url: str, deadline: float, server: subprocess.Popen) -> Optional[float]:
+    while time.monotonic() < deadline and server.poll() is None:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return time.monotonic()
+        except (urllib.error.URLError, ConnectionError, OSError):
+            pass
+        time.sleep(0.02)
+    return None
+
+def measure_server(timeout: float) -> Dict[str, Optional[float]]:
+    """Seconds from process start until /health answers and until /ready answers 200."""
+    port = _free_port()
+    start = time.monotonic()
+    server = subprocess.Popen([sys.executable, '-m', 'uvicorn', 'api:app', '--port', str(port)],
+                              cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = start + timeout
+        healthy = _wait_for(f"http://127.0.0.1:{port}/health", deadline, server)
+        ready = _wait_for(f"http://127.0.0.1:{port}/ready", deadline, server)
+        return {
+            'health': healthy - start if healthy else None,
+            'ready': ready - start if ready else None,
+        }
+    finally:
+        server.terminate()
+        server.wait()
+
+def _median(values: List[Optional[float]]) -> Optional[float]:
+    if any(value is None for value in values):
+        return None
+    return statistics.median(values)
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--max-import', type=float, default=None, help="Limit for the median import time (s)")
+    parser.add_argument('--max-ready', type=float, default=None, help="Limit for the median time to ready (s)")
+    parser.add_argument('--timeout', type=float, default=60.0, help="Give up on a server after this long (s)")
+    parser.add_argument('--skip-server', action='store_true', help="Only measure the import")
+    args = parser.parse_args()
+
+    imports = [measure_import() for _ in range(args.runs)]
+    results = {
+        'import_seconds': statistics.median(run['seconds'] for run in imports),
+        'heavy_modules_loaded': sorted({name for run in imports for name in run['loaded']}),
+    }
+    if not args.skip_server:
+        servers = [measure_server(args.timeout) for _ in range(args.runs)]
+        results['health_seconds'] = _median([run['health'] for run in servers])
+        results['ready_seconds'] = _median([run['ready'] for run in servers])
+    print(json.dumps(results, indent=2))
+
+    failures = []
+    if results['heavy_modules_loaded']:
+        failures.append(f"importing api loads {', '.join(results['heavy_modules_loaded'])}")
+    if args.max_import is not None and results['import_seconds'] > args.max_import:
+        failures.append(f"import took {results['import_seconds']:.3f}s (limit {args.max_import}s)")
+    if not args.skip_server:
+        if results['ready_seconds'] is None:
+            failures.append(f"server was not ready within {args.timeout}s")
+        elif args.max_ready is not None and results['ready_seconds'] > args.max_ready:
+            failures.append(f"ready after {results['ready_seconds']:.3f}s (limit {args.max_ready}s)")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
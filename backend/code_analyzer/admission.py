@@ -0,0 +1,215 @@
+import os
+import math
+import time
+import heapq
+import asyncio
+import itertools
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Lower numbers run first; unknown modes are treated like 'full'
+MODE_PRIORITIES = {'quick': 0, 'full': 1, 'deep': 2}
+# Fraction of the queue each mode may fill, so expensive low-priority modes are shed first
+SHED_THRESHOLDS = {'quick': 1.0, 'full': 0.75, 'deep': 0.5}
+DRAIN_WINDOW = 60.0  # seconds of completions used to estimate the drain rate
+
+class AdmissionRejected(Exception):
+    """Raised when an analysis cannot be admitted right now.
+
+    ``status_code`` is 503 when the service as a whole is overloaded and 429
+    when the tenant is over its own quota.
+    """
+    def __init__(self, message: str, status_code: int, retry_after: float):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+@dataclass
+class _Ticket:
+    analysis_id: str
+    tenant: str
+    mode: str
+    priority: int
+    enqueued_at: float = field(default_factory=time.monotonic)
+    started_at: Optional[float] = None
+    slot: Optional[asyncio.Future] = None
+    cancel_token: Any = None
+    withdrawn: bool = False
+
+
+class AdmissionController:
+    """Bounded admission queue in front of the analysis pipeline.
+
+    At most ``max_running`` analyses run at once; up to ``max_queued`` more
+    wait for a slot, highest priority mode first. Beyond that, or beyond a
+    mode's share of the queue, submissions are rejected straight away with a
+    Retry-After estimated from how fast the queue is currently draining.
+
+    All methods are called from the event loop thread, so no locking is needed.
+    """
+    def __init__(self, max_running: int = 8, max_queued: int = 64, tenant_max_active: int = 16,
+                 default_duration: float = 30.0):
+        self.max_running = max_running
+        self.max_queued = max_queued
+        self.tenant_max_active = tenant_max_active
+        self._tickets: Dict[str, _Ticket] = {}
+        self._queue: List[Any] = []  # heap of (priority, sequence, ticket)
+        self._sequence = itertools.count()
+        self._running = 0
+        self._queued = 0
+        self._tenant_active: Dict[str, int] = {}
+        self._completions = deque()
+        self.average_duration = default_duration  # EWMA of analysis run time
+        self.average_wait = 0.0  # EWMA of time spent queued
+        self.stats = {'admitted': 0, 'rejected_overload': 0, 'rejected_quota': 0, 'withdrawn': 0,
+                      'shed_by_mode': {}}
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        return cls(
+            max_running=int(os.getenv('ADMISSION_MAX_RUNNING', 8)),
+            max_queued=int(os.getenv('ADMISSION_MAX_QUEUED', 64)),
+            tenant_max_active=int(os.getenv('ADMISSION_TENANT_MAX_ACTIVE', 16)),
+        )
+
+    def _drain_rate(self) -> float:
+        """Analyses finished per second, recently, or as estimated from run times."""
+        now = time.monotonic()
+        while self._completions and now - self._completions[0] > DRAIN_WINDOW:
+            self._completions.popleft()
+        if self._completions:
+            observed = len(self._completions) / DRAIN_WINDOW
+            return max(observed, 1.0 / DRAIN_WINDOW)
+        return self.max_running / max(self.average_duration, 1.0)
+
+    def retry_after(self, positions: int) -> int:
+        """Seconds until ``positions`` queued analyses have drained."""
+        return max(1, min(300, math.ceil(positions / self._drain_rate())))
+
+    def admit(self, analysis_id: str, tenant: str, mode: str) -> None:
+        """Admit an analysis into the queue.
+
+        Raises:
+            AdmissionRejected: If the tenant is over quota or the queue has no
+                room for this mode.
+        """
+        active = self._tenant_active.get(tenant, 0)
+        if active >= self.tenant_max_active:
+            self.stats['rejected_quota'] += 1
+            raise AdmissionRejected(
+                f"Too many active analyses ({active}) for this client",
+                status_code=429, retry_after=self.retry_after(active - self.tenant_max_active + 1)
+            )
+
+        capacity = int(self.max_queued * SHED_THRESHOLDS.get(mode, SHED_THRESHOLDS['full']))
+        # Queued analyses that a free slot is about to pick up do not count as backlog
+        backlog = max(0, self._queued - (self.max_running - self._running))
+        if backlog >= capacity:
+            self.stats['rejected_overload'] += 1
+            self.stats['shed_by_mode'][mode] = self.stats['shed_by_mode'].get(mode, 0) + 1
+            logger.warning(f"Shedding {mode} analysis: {self._queued} queued, {self._running} running")
+            raise AdmissionRejected(
+                "Server is busy. Please retry later.",
+                status_code=503, retry_after=self.retry_after(backlog - capacity + 1)
+            )
+
+        ticket = _Ticket(analysis_id=analysis_id, tenant=tenant, mode=mode,
+                         priority=MODE_PRIORITIES.get(mode, MODE_PRIORITIES['full']))
+        self._tickets[analysis_id] = ticket
+        self._tenant_active[tenant] = active + 1
+        self._queued += 1
+        heapq.heappush(self._queue, (ticket.priority, next(self._sequence), ticket))
+        self.stats['admitted'] += 1
+
+    async def wait_for_slot(self, analysis_id: str, cancel_token=None, poll_interval: float = 1.0) -> bool:
+        """Wait until the analysis may run.
+
+        Returns:
+            True once a slot is held, False if the analysis was cancelled
+            while it was still queued.
+        """
+        ticket = self._tickets[analysis_id]
+        ticket.slot = asyncio.get_running_loop().create_future()
+        ticket.cancel_token = cancel_token
+        self._dispatch()
+        while not ticket.slot.done():
+            await asyncio.wait({ticket.slot}, timeout=poll_interval)
+            if not ticket.slot.done() and cancel_token is not None and cancel_token.cancelled:
+                self._withdraw(ticket)
+        return ticket.slot.result()
+
+    def _withdraw(self, ticket: _Ticket) -> None:
+        ticket.withdrawn = True
+        self._queued -= 1
+        self._forget(ticket)
+        self.stats['withdrawn'] += 1
+        ticket.slot.set_result(False)
+
+    def _forget(self, ticket: _Ticket) -> None:
+        self._tickets.pop(ticket.analysis_id, None)
+        remaining = self._tenant_active.get(ticket.tenant, 1) - 1
+        if remaining > 0:
+            self._tenant_active[ticket.tenant] = remaining
+        else:
+            self._tenant_active.pop(ticket.tenant, None)
+
+    def _dispatch(self) -> None:
+        """Hand free slots to the highest-priority tickets that are waiting for one."""
+        deferred = []
+        while self._running < self.max_running and self._queue:
+            entry = heapq.heappop(self._queue)
+            ticket = entry[2]
+            if ticket.withdrawn:
+                continue
+            if ticket.slot is None:
+                deferred.append(entry)  # Admitted, but its task has not started waiting yet
+                continue
+            if ticket.cancel_token is not None and ticket.cancel_token.cancelled:
+                self._withdraw(ticket)
+                continue
+            self._queued -= 1
+            self._running += 1
+            ticket.started_at = time.monotonic()
+            wait = ticket.started_at - ticket.enqueued_at
+            self.average_wait = 0.8 * self.average_wait + 0.2 * wait
+            ticket.slot.set_result(True)
+        for entry in deferred:
+            heapq.heappush(self._queue, entry)
+
+    def release(self, analysis_id: str) -> None:
+        """Give up the slot held by a finished analysis."""
+        ticket = self._tickets.get(analysis_id)
+        if ticket is None or ticket.started_at is None:
+            return
+        now = time.monotonic()
+        self._running -= 1
+        self._completions.append(now)
+        self.average_duration = 0.8 * self.average_duration + 0.2 * (now - ticket.started_at)
+        self._forget(ticket)
+        self._dispatch()
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        waiting = [entry[2] for entry in self._queue if not entry[2].withdrawn]
+        return {
+            'running': self._running,
+            'queued': self._queued,
+            'max_running': self.max_running,
+            'max_queued': self.max_queued,
+            'queue_utilization': self._queued / self.max_queued if self.max_queued else 0,
+            'oldest_wait_seconds': max((now - ticket.enqueued_at for ticket in waiting), default=0.0),
+            'average_wait_seconds': self.average_wait,
+            'average_duration_seconds': self.average_duration,
+            'drain_rate_per_second': self._drain_rate(),
+            'active_tenants': len(self._tenant_active),
+            **self.stats,
+        }
+
+
+# Shared by all requests handled by this process
+admission_controller = AdmissionController.from_env()
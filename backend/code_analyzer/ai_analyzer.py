@@ -1,34 +1,97 @@
 import os
 import time
-from typing import Dict, List, Any
-from google import genai
-from dotenv import load_dotenv
+import random
+import threading
+from typing import Dict, Any, Optional
 import logging
+from .concurrency import (
+    BackendUnavailableError,
+    classify_error,
+    model_circuit_breaker,
+    model_limiter,
+)
+
+from .batcher import MICRO_BATCH_ENABLED, MICRO_BATCH_SMALL_CHUNK_CHARS, get_batcher
+from .router import model_router
+from .cancellation import AnalysisCancelledError
+from .languages import get_language
+from .cassette import CassetteMissError, get_cassette
 
 logger = logging.getLogger(__name__)
 
+PROMPT_PREAMBLE = "You are an expert code analyzer specializing in correctness assessment and semantic understanding."
+
+_client_lock = threading.Lock()
+_shared_client = None  # What analyzers call: the genai client, possibly behind the cassette
+_backend_client = None  # The genai client itself; None when replaying a cassette
+
+def get_model_client():
+    """Return the process-wide model client, creating it on first use.
+
+    The genai SDK (and .env) is only loaded here, so importing the pipeline
+    stays cheap, and all analyzers share one client and its connection pool.
+    """
+    global _shared_client, _backend_client
+    with _client_lock:
+        if _shared_client is None:
+            cassette = get_cassette()
+            if cassette is not None and cassette.replaying:
+                _shared_client = cassette.wrap()  # Recorded responses only, no network
+            else:
+                from dotenv import load_dotenv
+                from google import genai
+                load_dotenv()
+                _backend_client = genai.Client(api_key=os.getenv('GEMINI_API_KEY'))
+                _shared_client = cassette.wrap(_backend_client) if cassette is not None else _backend_client
+        return _shared_client
+
+def open_model_connection(model: str) -> None:
+    """Open the shared client's connection to the backend with a cheap metadata call."""
+    get_model_client()
+    if _backend_client is not None:
+        _backend_client.models.get(model=model)
+
 class AIAnalyzer:
-    def __init__(self):
-        load_dotenv()
-        self.client = genai.Client(api_key=os.getenv('GEMINI_API_KEY'))
-        self.model = "gemini-2.0-flash"  # Using the latest model
+    def __init__(self, mode: str = 'full'):
+        self.client = get_model_client()
+        self.mode = mode
+        self.model = model_router.tier_model('standard')  # Used when no route is given
+        self.max_tier = None  # Caps routed models, e.g. 'fast' under a tight latency budget
+        self.cancel_token = None  # CancellationToken of the analysis this analyzer works for
+        self.scope = ''  # Tenant of the analysis; its prompts are only micro-batched with the same tenant's
         self.max_retries = 3
         self.initial_retry_delay = 1  # seconds
-        self.chat = None  # Will be initialized for multi-turn conversations
+        self.acquire_timeout = float(os.getenv('MODEL_ACQUIRE_TIMEOUT', 60))  # seconds
+        self.chats = {}  # Chat session per model, initialized for multi-turn conversations
 
-    def _create_prompt(self, code: str, context: Dict[str, Any], analysis_type: str) -> str:
-        """Create a specialized prompt for the LLM based on analysis type."""
+    def _create_prompt(self, code: str, context: Dict[str, Any], analysis_type: str,
+                       static_findings: Optional[str] = None, include_preamble: bool = True) -> str:
+        """Create a specialized prompt for the LLM based on analysis type.
+
+        ``include_preamble=False`` leaves out the role statement, for prompts
+        that are sent inside a micro-batch sharing a single preamble.
+        """
         # Determine the language from the context
-        language = context.get('language', 'python').lower()
+        language = get_language(context.get('language', 'python'))
         
+        preamble = PROMPT_PREAMBLE if include_preamble else ""
         base_prompt = f"""
-        You are an expert code analyzer specializing in correctness assessment and semantic understanding.
-        Analyze the following {language} code and provide a detailed assessment.
+        {preamble}
+        Analyze the following {language.display_name} code and provide a detailed assessment.
         
         Code context: {context}
         Code:
         {code}
         """
+        if language.prompt_hints:
+            base_prompt += f"""
+        {language.prompt_hints}
+        """
+        if static_findings:
+            base_prompt += f"""
+        Local static analysis (already verified, build on it rather than repeating it):
+        {static_findings}
+        """
 
         if analysis_type == "semantic_understanding":
             return f"""
@@ -70,88 +133,170 @@ class AIAnalyzer:
             List all potential edge cases and explain how the code handles them.
             """
         elif analysis_type == "test_cases":
-            # Customize test cases based on language
-            if language == "javascript":
-                return f"""
-                {base_prompt}
-                
-                Generate comprehensive JavaScript test cases:
-                1. Normal use cases with typical inputs
-                2. Edge cases and boundary conditions
-                3. Error conditions and invalid inputs
-                4. Performance test cases
-                5. Security test cases
-                
-                Format the tests as JavaScript code using a modern testing framework like Jest or Mocha.
-                """
-            else:  # python or other languages
-                return f"""
-                {base_prompt}
-                
-                Generate comprehensive test cases:
-                1. Normal use cases with typical inputs
-                2. Edge cases and boundary conditions
-                3. Error conditions and invalid inputs
-                4. Performance test cases
-                5. Security test cases
-                
-                Format the tests appropriately for the {language} language.
-                """
+            # The test framework comes from the language registry
+            return f"""
+            {base_prompt}
+            
+            Generate comprehensive {language.display_name} test cases:
+            1. Normal use cases with typical inputs
+            2. Edge cases and boundary conditions
+            3. Error conditions and invalid inputs
+            4. Performance test cases
+            5. Security test cases
+            
+            Format the tests as {language.display_name} code using {language.test_framework}.
+            """
         else:
             raise ValueError(f"Unknown analysis type: {analysis_type}")
 
-    def _make_api_call(self, prompt: str, retry_count: int = 0) -> Dict[str, Any]:
-        """Make API call with retry logic."""
+    def _make_api_call(self, prompt: str, retry_count: int = 0, model: Optional[str] = None,
+                       stateless: bool = False) -> Dict[str, Any]:
+        """Make API call with retry logic.
+
+        Every attempt goes through the shared circuit breaker and adaptive
+        concurrency limit, so overload is handled once for the whole process
+        rather than by each thread on its own.
+
+        Args:
+            prompt: The prompt to send
+            retry_count: Attempts made so far
+            model: Model to call; defaults to ``self.model``
+            stateless: Send a one-off request instead of using the chat session,
+                as micro-batches shared between analyses must
+
+        Raises:
+            BackendUnavailableError: If the circuit is open or no concurrency
+                slot becomes available.
+            CassetteMissError: If a replayed cassette has no recording of
+                the prompt; misses are never retried.
+        """
+        model = model or self.model
+        model_circuit_breaker.before_call()
+        try:
+            model_limiter.acquire(timeout=self.acquire_timeout)
+        except BaseException:
+            # Nothing reached the backend, so a half-open probe slot must not stay taken
+            model_circuit_breaker.cancel_call()
+            raise
+        start_time = time.monotonic()
         try:
+            if stateless:
+                response = self.client.models.generate_content(model=model, contents=prompt)
+                model_limiter.release(time.monotonic() - start_time, 'success', model)
+                model_circuit_breaker.record_success()
+                return {
+                    'success': True,
+                    'content': response.text
+                }
+
             # Initialize chat if not already done
-            if self.chat is None:
-                logger.debug("Initializing new chat session with Gemini.")
+            chat = self.chats.get(model)
+            if chat is None:
+                logger.debug(f"Initializing new chat session with Gemini model {model}.")
                 # REMOVE the timeout argument from this call
-                self.chat = self.client.chats.create(
-                    model=self.model
+                chat = self.chats[model] = self.client.chats.create(
+                    model=model
                     # No 'timeout=...' here
                 )
                 logger.debug("Chat session initialized.")
 
             logger.debug(f"Sending prompt to Gemini (attempt {retry_count + 1}):\n{prompt[:200]}...") # Log truncated prompt
             # Also ensure timeout is not used here if the library doesn't support it for send_message
-            response = self.chat.send_message(
+            response = chat.send_message(
                 prompt
                 # No 'timeout=...' here either, unless the specific method supports it
             )
             logger.debug("Received response from Gemini.")
+            model_limiter.release(time.monotonic() - start_time, 'success', model)
+            model_circuit_breaker.record_success()
 
             return {
                 'success': True,
                 'content': response.text
             }
         except Exception as e:
-            logger.warning(f"API call failed (attempt {retry_count + 1}/{self.max_retries}): {str(e)}")
-            if retry_count < self.max_retries:
+            outcome = classify_error(e)
+            model_limiter.release(time.monotonic() - start_time, outcome, model)
+            if outcome == 'client_error':
+                model_circuit_breaker.record_success()
+            else:
+                model_circuit_breaker.record_failure()
+            if isinstance(e, CassetteMissError):
+                raise
+
+            logger.warning(f"API call failed (attempt {retry_count + 1}/{self.max_retries}, {outcome}): {str(e)}")
+            # Reset chat object to force re-initialization on next attempt if create failed
+            if "Chats.create()" in str(e):
+                self.chats.pop(model, None)
+            # Client errors (bad requests, unknown models) fail the same way when retried
+            if outcome != 'client_error' and retry_count < self.max_retries:
                 delay = self.initial_retry_delay * (2 ** retry_count)
-                logger.warning(f"Retrying in {delay} seconds...")
-                time.sleep(delay)
-                # Reset chat object to force re-initialization on next attempt if create failed
-                if "Chats.create()" in str(e):
-                    self.chat = None
-                return self._make_api_call(prompt, retry_count + 1)
+                # Jitter spreads retries from concurrent threads apart
+                delay *= random.uniform(0.5, 1.5)
+                logger.warning(f"Retrying in {delay:.2f} seconds...")
+                if self.cancel_token is not None and not stateless:
+                    # Stop backing off as soon as the analysis is cancelled
+                    self.cancel_token.wait(delay)
+                    self.cancel_token.raise_if_cancelled()
+                else:
+                    time.sleep(delay)
+                return self._make_api_call(prompt, retry_count + 1, model, stateless)
+            elif outcome == 'client_error':
+                logger.error(f"Model call rejected, not retrying: {str(e)}")
+                return {
+                    'success': False,
+                    'error': f"Model call failed: {str(e)}"
+                }
             else:
                 logger.error(f"Max retries reached. Final error: {str(e)}")
-                # Ensure self.chat is reset if the error occurred during creation
-                if "Chats.create()" in str(e):
-                    self.chat = None
                 return {
                     'success': False,
                     'error': f"Max retries reached: {str(e)}" # Include the error message
                 }
 
+    def _make_batched_call(self, prompt: str, code_chunk: Dict[str, Any], analysis_type: str,
+                           model: str) -> Dict[str, Any]:
+        """Send a small chunk's prompt through the shared micro-batcher.
+
+        Falls back to an individual call when the batched response has no
+        answer for this prompt.
+        """
+        item_prompt = self._create_prompt(code_chunk['code'], code_chunk['context'], analysis_type,
+                                          code_chunk.get('static_findings'), include_preamble=False)
+        start_time = time.monotonic()
+        result = get_batcher(call_model_stateless).submit(prompt, item_prompt, model, self.scope).result()
+        if result is None:
+            logger.info(f"No batched answer for {analysis_type}, falling back to an individual call")
+            return self._make_api_call(prompt, model=model)
+        cassette = get_cassette()
+        if cassette is not None and result['success']:
+            # Replay sends prompts one by one, so it needs each prompt's own answer
+            cassette.record_batch_item(model, prompt, result['content'], time.monotonic() - start_time)
+        return result
+
+    @staticmethod
+    def _batching_enabled() -> bool:
+        # Batches depend on timing, so a replay would rarely compose the recorded ones again
+        cassette = get_cassette()
+        return MICRO_BATCH_ENABLED and not (cassette is not None and cassette.replaying)
+
     def analyze_code(self, code_chunk: Dict[str, Any], analysis_type: str) -> Dict[str, Any]:
         """Analyze a code chunk using the specified analysis type."""
-        prompt = self._create_prompt(code_chunk['code'], code_chunk['context'], analysis_type)
+        if self.cancel_token is not None:
+            self.cancel_token.raise_if_cancelled()
+        prompt = self._create_prompt(code_chunk['code'], code_chunk['context'], analysis_type,
+                                     code_chunk.get('static_findings'))
         
         try:
-            logger.info(f"Making API call for {analysis_type} analysis")
-            result = self._make_api_call(prompt)
+            model = model_router.route(code_chunk, analysis_type, self.mode, self.max_tier)
+            logger.info(f"Making API call for {analysis_type} analysis with {model}")
+            start_time = time.monotonic()
+            if self._batching_enabled() and len(code_chunk['code']) <= MICRO_BATCH_SMALL_CHUNK_CHARS:
+                result = self._make_batched_call(prompt, code_chunk, analysis_type, model)
+            else:
+                result = self._make_api_call(prompt, model=model)
+            model_router.record(model, analysis_type, time.monotonic() - start_time, prompt,
+                                result.get('content'), result['success'])
             
             if result['success']:
                 return {
@@ -165,6 +310,8 @@ class AIAnalyzer:
                     'code_context': code_chunk['context'],
                     'error': result['error']
                 }
+        except (BackendUnavailableError, AnalysisCancelledError):
+            raise
         except Exception as e:
             logger.error(f"Analysis failed: {str(e)}")
             return {
@@ -187,4 +334,9 @@ class AIAnalyzer:
 
     def generate_test_cases(self, code_chunk: Dict[str, Any]) -> Dict[str, Any]:
         """Generate comprehensive test cases for the code."""
-        return self.analyze_code(code_chunk, "test_cases")
\ No newline at end of file
+        return self.analyze_code(code_chunk, "test_cases")
+
+
+def call_model_stateless(prompt: str, model: str) -> Dict[str, Any]:
+    """One-off model call that belongs to no analysis, as the shared micro-batcher makes."""
+    return AIAnalyzer()._make_api_call(prompt, model=model, stateless=True)
@@ -0,0 +1,211 @@
+import os
+import re
+import time
+import secrets
+import threading
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Any, Callable, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+BATCH_PREAMBLE = """
+You are an expert code analyzer specializing in correctness assessment and semantic understanding.
+You will receive {count} independent analysis tasks, each marked "=== TASK <id> ===".
+Answer every task separately and completely, as if it were the only one.
+Start each answer with the line "=== ANSWER <id> ===" using the task's id, and write nothing before the first answer.
+"""
+ANSWER_PATTERN = re.compile(r"^=== ANSWER (\w+) ===[ \t]*$", re.MULTILINE)
+
+@dataclass
+class BatchJob:
+    full_prompt: str  # Sent as-is when the job ends up alone in its batch
+    item_prompt: str  # Task-specific part, without the shared preamble
+    model: str
+    tokens: int
+    scope: str = ''  # Tenant the prompt belongs to; tenants never share a batch
+    future: Future = field(default_factory=Future)
+    enqueued_at: float = field(default_factory=time.monotonic)
+    job_id: str = ''  # Random task id, assigned when the job is sent in a batch
+
+
+class MicroBatcher:
+    """Collects small prompts from concurrent analyses into shared model calls.
+
+    Jobs for the same tenant scope and model are held for up to ``max_wait`` seconds (or until
+    the batch reaches its token or item budget), sent as one prompt with
+    ID-tagged sections, and the response is split back per job. Task ids
+    are random for every batch, so submitted code cannot name another
+    task's id. A job whose answer is missing from the response resolves to
+    None so the caller can fall back to an individual call; so does every
+    job of a response with duplicate or unknown answer markers, since its
+    answers cannot be told apart safely.
+
+    ``call_model(prompt, model)`` must return a dict like
+    ``AIAnalyzer._make_api_call`` does, and must not depend on any one
+    analysis, since the batcher is shared by all of them.
+    """
+    def __init__(self, call_model: Callable[[str, str], Dict[str, Any]], max_wait: float = 0.02,
+                 max_batch_tokens: int = 8000, max_batch_items: int = 8, dispatch_workers: int = 16):
+        self.call_model = call_model
+        self.max_wait = max_wait
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_items = max_batch_items
+        self._pending: List[BatchJob] = []
+        self._condition = threading.Condition()
+        self._dispatcher = ThreadPoolExecutor(max_workers=dispatch_workers, thread_name_prefix='micro-batch')
+        self.stats = {'jobs': 0, 'batches': 0, 'batched_jobs': 0, 'single_calls': 0, 'fallbacks': 0}
+        threading.Thread(target=self._collect_loop, name='micro-batch-collector', daemon=True).start()
+
+    @classmethod
+    def from_env(cls, call_model: Callable[[str, str], Dict[str, Any]]) -> "MicroBatcher":
+        return cls(
+            call_model,
+            max_wait=float(os.getenv('MICRO_BATCH_MAX_WAIT_MS', 20)) / 1000,
+            max_batch_tokens=int(os.getenv('MICRO_BATCH_MAX_TOKENS', 8000)),
+            max_batch_items=int(os.getenv('MICRO_BATCH_MAX_ITEMS', 8)),
+        )
+
+    def submit(self, full_prompt: str, item_prompt: str, model: str, scope: str = '') -> Future:
+        """Queue a prompt; the future resolves to the call result dict or None.
+
+        Only prompts with the same ``scope`` are batched together.
+        """
+        job = BatchJob(full_prompt=full_prompt, item_prompt=item_prompt, model=model,
+                       tokens=len(item_prompt) // 4 + 1, scope=scope)
+        with self._condition:
+            self._pending.append(job)
+            self.stats['jobs'] += 1
+            self._condition.notify()
+        return job.future
+
+    @staticmethod
+    def _batch_key(job: BatchJob) -> Tuple[str, str]:
+        return job.scope, job.model
+
+    def _ready_batch(self) -> List[BatchJob]:
+        """Jobs that share the oldest job's scope and model, within the batch budget."""
+        key = self._batch_key(self._pending[0])
+        batch, tokens = [], 0
+        for job in self._pending:
+            if self._batch_key(job) != key:
+                continue
+            if batch and (tokens + job.tokens > self.max_batch_tokens or len(batch) >= self.max_batch_items):
+                break
+            batch.append(job)
+            tokens += job.tokens
+        return batch
+
+    def _is_full(self, batch: List[BatchJob]) -> bool:
+        tokens = sum(job.tokens for job in batch)
+        return len(batch) >= self.max_batch_items or tokens >= self.max_batch_tokens or \
+            len(batch) < len([job for job in self._pending if self._batch_key(job) == self._batch_key(batch[0])])
+
+    def _collect_loop(self) -> None:
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                deadline = self._pending[0].enqueued_at + self.max_wait
+                while not self._is_full(self._ready_batch()):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                batch = self._ready_batch()
+                taken = set(id(job) for job in batch)
+                self._pending = [job for job in self._pending if id(job) not in taken]
+            self._dispatcher.submit(self._dispatch, batch)
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self._condition:
+            self.stats[key] += amount
+
+    def _dispatch(self, batch: List[BatchJob]) -> None:
+        try:
+            if len(batch) == 1:
+                self._count('single_calls')
+                batch[0].future.set_result(self.call_model(batch[0].full_prompt, batch[0].model))
+                return
+
+            self._count('batches')
+            self._count('batched_jobs', len(batch))
+            task_ids = set()
+            while len(task_ids) < len(batch):
+                task_ids.add(secrets.token_hex(6))
+            for job, task_id in zip(batch, task_ids):
+                job.job_id = task_id
+            prompt = BATCH_PREAMBLE.format(count=len(batch)) + "".join(
+                f"\n=== TASK {job.job_id} ===\n{job.item_prompt}\n" for job in batch
+            )
+            logger.info(f"Sending micro-batch of {len(batch)} tasks")
+            result = self.call_model(prompt, batch[0].model)
+            if not result['success']:
+                for job in batch:
+                    job.future.set_result(result)
+                return
+
+            answers = self.split_answers(result['content'], task_ids)
+            if answers is None:
+                logger.warning(f"Micro-batch response has duplicate or unknown task ids, "
+                               f"falling back for all {len(batch)} tasks")
+                answers = {}
+            for job in batch:
+                answer = answers.get(job.job_id)
+                if answer:
+                    job.future.set_result({'success': True, 'content': answer})
+                else:
+                    self._count('fallbacks')
+                    job.future.set_result(None)
+        except Exception as e:
+            for job in batch:
+                if not job.future.done():
+                    job.future.set_exception(e)
+
+    @staticmethod
+    def split_answers(content: str, task_ids: Set[str]) -> Optional[Dict[str, str]]:
+        """De-multiplex a batched response into answers keyed by task id.
+
+        Returns:
+            The answers, or None if a marker names a task id twice or one
+            that is not in ``task_ids``, as when an answer echoes a marker.
+        """
+        markers = list(ANSWER_PATTERN.finditer(content))
+        answers = {}
+        for index, marker in enumerate(markers):
+            task_id = marker.group(1)
+            if task_id not in task_ids or task_id in answers:
+                return None
+            end = markers[index + 1].start() if index + 1 < len(markers) else len(content)
+            answers[task_id] = content[marker.end():end].strip()
+        return answers
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._condition:
+            stats = dict(self.stats)
+            stats['pending'] = len(self._pending)
+        stats['calls_saved'] = stats['batched_jobs'] - stats['batches']
+        stats['average_batch_size'] = (stats['batched_jobs'] / stats['batches']) if stats['batches'] else 0
+        return stats
+
+
+MICRO_BATCH_ENABLED = os.getenv('MICRO_BATCH_ENABLED', 'true').lower() == 'true'
+# Only chunks at most this many characters long are worth batching
+MICRO_BATCH_SMALL_CHUNK_CHARS = int(os.getenv('MICRO_BATCH_SMALL_CHUNK_CHARS', 2000))
+
+_batcher_lock = threading.Lock()
+_shared_batcher: Optional[MicroBatcher] = None
+
+def get_batcher(call_model: Callable[[str, str], Dict[str, Any]]) -> MicroBatcher:
+    """Return the process-wide batcher, creating it with ``call_model`` on first use."""
+    global _shared_batcher
+    with _batcher_lock:
+        if _shared_batcher is None:
+            _shared_batcher = MicroBatcher.from_env(call_model)
+        return _shared_batcher
+
+def get_batcher_metrics() -> Dict[str, Any]:
+    if _shared_batcher is None:
+        return {'enabled': MICRO_BATCH_ENABLED, 'jobs': 0}
+    return {'enabled': MICRO_BATCH_ENABLED, **_shared_batcher.snapshot()}
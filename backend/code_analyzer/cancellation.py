@@ -0,0 +1,93 @@
+import os
+import time
+import threading
+import logging
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Analyses nobody has polled for this long are abandoned; 0 disables the check
+ANALYSIS_IDLE_TIMEOUT = float(os.getenv('ANALYSIS_IDLE_TIMEOUT', 120))  # seconds
+
+class AnalysisCancelledError(Exception):
+    """Raised inside an analysis once it has been cancelled."""
+
+    def __init__(self, reason: str):
+        super().__init__(f"Analysis cancelled ({reason})")
+        self.reason = reason
+
+
+class CancellationToken:
+    """Cooperative cancellation flag shared by all work of one analysis.
+
+    The pipeline checks the token before every chunk x stage call, so a
+    cancelled analysis stops issuing model calls and its executor tasks
+    finish immediately. With an ``idle_timeout`` the token also cancels
+    itself once ``touch()`` has not been called for that long, which is how
+    analyses whose client stopped polling get abandoned.
+    """
+    def __init__(self, idle_timeout: Optional[float] = None):
+        self.idle_timeout = idle_timeout or None
+        self.reason: Optional[str] = None
+        self._event = threading.Event()
+        self._last_seen = time.monotonic()
+
+    def touch(self) -> None:
+        """Record that the client is still interested in the analysis."""
+        self._last_seen = time.monotonic()
+
+    def cancel(self, reason: str = 'client') -> bool:
+        """Cancel the analysis; returns False if it already was cancelled."""
+        if self._event.is_set():
+            return False
+        self.reason = reason
+        self._event.set()
+        record_cancellation(reason)
+        logger.info(f"Analysis cancelled ({reason})")
+        return True
+
+    @property
+    def cancelled(self) -> bool:
+        if not self._event.is_set() and self.idle_timeout is not None \
+                and time.monotonic() - self._last_seen > self.idle_timeout:
+            self.cancel('idle')
+        return self._event.is_set()
+
+    @property
+    def cancel_requested(self) -> bool:
+        """Whether the token has been cancelled, without applying the idle timeout.
+
+        For checks made after the work has finished, where an idle client must
+        not turn completed results into a cancellation.
+        """
+        return self._event.is_set()
+
+    def raise_if_cancelled(self) -> None:
+        if self.cancelled:
+            raise AnalysisCancelledError(self.reason)
+
+    def wait(self, timeout: float) -> bool:
+        """Sleep for up to ``timeout`` seconds, waking early on explicit cancellation."""
+        return self._event.wait(timeout)
+
+
+_stats_lock = threading.Lock()
+cancellation_stats = {
+    'cancelled_by_client': 0,
+    'cancelled_idle': 0,
+    'model_calls_avoided': 0,
+}
+
+def record_cancellation(reason: str) -> None:
+    with _stats_lock:
+        key = 'cancelled_idle' if reason == 'idle' else 'cancelled_by_client'
+        cancellation_stats[key] += 1
+
+def record_cancelled_calls(count: int) -> None:
+    """Count chunk x stage model calls that were never made because of a cancellation."""
+    with _stats_lock:
+        cancellation_stats['model_calls_avoided'] += count
+
+def get_cancellation_metrics() -> Dict[str, Any]:
+    with _stats_lock:
+        return {'idle_timeout_seconds': ANALYSIS_IDLE_TIMEOUT, **cancellation_stats}
@@ -0,0 +1,252 @@
+import os
+import re
+import time
+import zlib
+import atexit
+import hashlib
+import sqlite3
+import threading
+import logging
+from types import SimpleNamespace
+from typing import Dict, List, Any, Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 'record' writes every model call to the cassette, 'replay' serves calls from it; unset is off
+CASSETTE_MODE = os.getenv('MODEL_CASSETTE_MODE', '').lower()
+CASSETTE_PATH = os.getenv('MODEL_CASSETTE_PATH', 'model_calls.cassette')
+# Replayed calls take their recorded latency times this; 0 replays instantly
+CASSETTE_LATENCY_SCALE = float(os.getenv('MODEL_CASSETTE_LATENCY_SCALE', 1.0))
+COMMIT_EVERY = 50  # recorded calls per transaction
+
+# Micro-batch task ids are random for every batch, so they are replaced by their
+# position in the prompt before prompts are matched
+TASK_MARKER = re.compile(r"^=== (TASK|ANSWER) (\w+) ===", re.MULTILINE)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS prompts (
+    key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    model TEXT NOT NULL,
+    prompt BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS calls (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL,
+    response BLOB,
+    error_type TEXT,
+    error_message TEXT,
+    error_code INTEGER,
+    latency REAL NOT NULL,
+    recorded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS calls_by_key ON calls (key, id);
+"""
+
+class CassetteMissError(Exception):
+    """Raised on replay for a call the cassette has no recording of."""
+    code = 404  # A client error to classify_error, so it does not trip the circuit breaker
+
+
+class ReplayedModelError(Exception):
+    """A recorded model backend error, raised again on replay."""
+
+    def __init__(self, message: str, error_type: str, code: Optional[int] = None):
+        super().__init__(message)
+        self.error_type = error_type
+        self.code = code
+
+
+def canonical_prompt(prompt: str) -> Tuple[str, List[str]]:
+    """Replace micro-batch task ids by their positions; returns the prompt and the ids in order."""
+    ids: List[str] = []
+
+    def replace(match):
+        if match.group(2) not in ids:
+            ids.append(match.group(2))
+        return f"=== {match.group(1)} _{ids.index(match.group(2))} ==="
+    return TASK_MARKER.sub(replace, prompt), ids
+
+
+def _swap_task_ids(text: str, mapping: Dict[str, str]) -> str:
+    return TASK_MARKER.sub(lambda match: f"=== {match.group(1)} {mapping.get(match.group(2), match.group(2))} ===",
+                           text)
+
+
+class Cassette:
+    """Records model calls to, or replays them from, an indexed cassette file.
+
+    The cassette is a SQLite file: each distinct prompt is stored once,
+    compressed, and every call made with it is a row holding the compressed
+    response or the error, and the latency. Replay looks calls up by
+    (kind, model, prompt) and serves the recordings of a prompt in the order
+    they were made, cycling once they run out, so retries and flaky
+    responses are reproduced. Replayed calls wait their recorded latency
+    times ``latency_scale`` and never touch the network.
+
+    Micro-batched prompts are also recorded one by one, as ``batch_item``
+    calls holding the prompt's own answer, because batches are composed by
+    timing and rarely come together the same way twice. Replay sends every
+    prompt on its own and falls back to these recordings.
+    """
+    def __init__(self, path: str, mode: str, latency_scale: float = 1.0):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.latency_scale = latency_scale
+        self._lock = threading.Lock()
+        self._occurrences: Dict[str, int] = {}
+        self._uncommitted = 0
+        self.stats = {'recorded': 0, 'replayed': 0, 'replayed_errors': 0, 'misses': 0}
+        if mode == 'replay':
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Cassette not found: {path}")
+            self._db = sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.executescript(SCHEMA)
+        logger.info(f"Model cassette {path} opened for {mode}")
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == 'replay'
+
+    def wrap(self, client: Any = None) -> Any:
+        """Return an object with the ``models`` and ``chats`` interface of a genai client.
+
+        When recording, calls are passed on to ``client``; when replaying no
+        client is needed.
+        """
+        cassette = self
+
+        class Chat:
+            def __init__(self, model: str):
+                self.model = model
+                self.chat = client.chats.create(model=model) if client is not None else None
+
+            def send_message(self, prompt: str):
+                send = (lambda: self.chat.send_message(prompt).text) if self.chat is not None else None
+                return SimpleNamespace(text=cassette.call('chat', self.model, prompt, send))
+
+        class Chats:
+            def create(self, model: str):
+                return Chat(model)
+
+        class Models:
+            def generate_content(self, model: str, contents: str, **kwargs):
+                send = None
+                if client is not None:
+                    send = lambda: client.models.generate_content(model=model, contents=contents, **kwargs).text
+                return SimpleNamespace(text=cassette.call('generate', model, contents, send))
+
+        return SimpleNamespace(models=Models(), chats=Chats())
+
+    @staticmethod
+    def _key(kind: str, model: str, canonical: str) -> str:
+        return hashlib.blake2b(f"{kind}\0{model}\0{canonical}".encode(), digest_size=16).hexdigest()
+
+    def call(self, kind: str, model: str, prompt: str, send: Optional[Callable[[], str]]) -> str:
+        """Make (when recording) or replay one model call and return its response text."""
+        canonical, task_ids = canonical_prompt(prompt)
+        key = self._key(kind, model, canonical)
+        if self.replaying:
+            return self._replay([key, self._key('batch_item', model, canonical)], task_ids)
+
+        start = time.monotonic()
+        try:
+            text = send()
+        except Exception as e:
+            self._record(key, kind, model, canonical, time.monotonic() - start, error=e)
+            raise
+        positions = {task_id: f"_{index}" for index, task_id in enumerate(task_ids)}
+        self._record(key, kind, model, canonical, time.monotonic() - start, text=_swap_task_ids(text, positions))
+        return text
+
+    def record_batch_item(self, model: str, prompt: str, text: str, latency: float) -> None:
+        """Record the answer a micro-batch gave for one prompt, as if the prompt had been sent alone."""
+        if self.replaying:
+            return
+        canonical, _ = canonical_prompt(prompt)
+        self._record(self._key('batch_item', model, canonical), 'batch_item', model, canonical, latency, text=text)
+
+    def _record(self, key: str, kind: str, model: str, canonical: str, latency: float,
+                text: Optional[str] = None, error: Optional[Exception] = None) -> None:
+        code = None
+        if error is not None:
+            code = getattr(error, 'code', None) or getattr(error, 'status_code', None)
+        with self._lock:
+            self._db.execute("INSERT OR IGNORE INTO prompts VALUES (?, ?, ?, ?)",
+                             (key, kind, model, zlib.compress(canonical.encode())))
+            self._db.execute(
+                "INSERT INTO calls (key, response, error_type, error_message, error_code, latency, recorded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, zlib.compress(text.encode()) if text is not None else None,
+                 type(error).__name__ if error is not None else None,
+                 str(error) if error is not None else None,
+                 code if isinstance(code, int) else None, latency, time.time())
+            )
+            self.stats['recorded'] += 1
+            self._uncommitted += 1
+            if self._uncommitted >= COMMIT_EVERY:
+                self._db.commit()
+                self._uncommitted = 0
+
+    def _replay(self, keys: List[str], task_ids: List[str]) -> str:
+        """Replay the next recording under the first of ``keys`` that has any."""
+        with self._lock:
+            for key in keys:
+                count = self._db.execute("SELECT COUNT(*) FROM calls WHERE key = ?", (key,)).fetchone()[0]
+                if count:
+                    break
+            if not count:
+                self.stats['misses'] += 1
+                row = None
+            else:
+                occurrence = self._occurrences.get(key, 0)
+                self._occurrences[key] = occurrence + 1
+                row = self._db.execute(
+                    "SELECT response, error_type, error_message, error_code, latency FROM calls "
+                    "WHERE key = ? ORDER BY id LIMIT 1 OFFSET ?", (key, occurrence % count)
+                ).fetchone()
+                self.stats['replayed_errors' if row[0] is None else 'replayed'] += 1
+        if row is None:
+            raise CassetteMissError(f"No recorded model call for prompt {keys[0]}")
+
+        response, error_type, error_message, error_code, latency = row
+        if self.latency_scale > 0:
+            time.sleep(latency * self.latency_scale)
+        if response is None:
+            raise ReplayedModelError(error_message, error_type, error_code)
+        positions = {f"_{index}": task_id for index, task_id in enumerate(task_ids)}
+        return _swap_task_ids(zlib.decompress(response).decode(), positions)
+
+    def close(self) -> None:
+        with self._lock:
+            if not self.replaying:
+                self._db.commit()
+            self._db.close()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'mode': self.mode, 'path': self.path, 'latency_scale': self.latency_scale, **self.stats}
+
+
+_cassette_lock = threading.Lock()
+_shared_cassette: Optional[Cassette] = None
+
+def get_cassette() -> Optional[Cassette]:
+    """Return the process-wide cassette, or None when MODEL_CASSETTE_MODE is unset."""
+    global _shared_cassette
+    if not CASSETTE_MODE:
+        return None
+    with _cassette_lock:
+        if _shared_cassette is None:
+            _shared_cassette = Cassette(CASSETTE_PATH, CASSETTE_MODE, CASSETTE_LATENCY_SCALE)
+            atexit.register(_shared_cassette.close)
+        return _shared_cassette
+
+def get_cassette_metrics() -> Dict[str, Any]:
+    if _shared_cassette is None:
+        return {'mode': CASSETTE_MODE or 'off'}
+    return _shared_cassette.snapshot()
@@ -1,10 +1,21 @@
 import ast
-import re
 import logging
-from typing import List, Dict, Any, Optional
+import threading
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+from .languages import CLOSERS, OPENERS, Language, get_language
 
 logger = logging.getLogger(__name__)
 
+# ast.parse is not safe to run in several threads at once on some CPython 3.11
+# releases ("AST constructor recursion depth mismatch"), and chunks are analyzed
+# in parallel. Parsing holds the GIL anyway, so serializing it costs nothing.
+_parse_lock = threading.Lock()
+
+def parse_python(code: str) -> ast.AST:
+    """Thread-safe ``ast.parse``."""
+    with _parse_lock:
+        return ast.parse(code)
+
 class CodeProcessor:
     def __init__(self, max_chunk_size: int = 8000):
         # Using character count instead of tokens
@@ -20,194 +31,117 @@ class CodeProcessor:
         
         Args:
             code_string: The code string to process
-            language: The programming language of the code ('python' or 'javascript')
+            language: The programming language of the code, any name known to the
+                language registry ('python', 'javascript', 'typescript', 'go', 'java', ...)
         """
         logger.info(f"Processing {language} code string of length {len(code_string)}")
         
-        # Sanitize and chunk the code based on language
-        sanitized_code = self.sanitize_code(code_string, language)
-        
-        if language.lower() == 'javascript':
-            # Use language-specific chunking for JavaScript
-            return self.chunk_javascript_code(sanitized_code)
-        else:
-            # Default to Python chunking for Python and other languages
-            try:
-                return self.chunk_python_code(sanitized_code)
-            except Exception as e:
-                logger.warning(f"Python AST parsing failed: {str(e)}. Falling back to simple chunking.")
-                return self.chunk_code_simple(sanitized_code, language)
+        # Chunk the original lines, so line numbers refer to the submitted code
+        chunks = list(self.iter_code_chunks(code_string.splitlines(keepends=True), language))
+        return chunks or [self.create_single_chunk(self.sanitize_code(code_string, language), language)]
 
     def sanitize_code(self, code: str, language: str = 'python') -> str:
         """Sanitize code by removing unnecessary whitespace and comments based on language."""
-        if language.lower() == 'javascript':
-            # JavaScript-specific sanitization
-            # Remove single-line comments
-            code = re.sub(r'\/\/.*$', '', code, flags=re.MULTILINE)
-            # Remove multi-line comments
-            code = re.sub(r'\/\*[\s\S]*?\*\/', '', code, flags=re.DOTALL)
-        else:
-            # Python-specific sanitization
-            # Remove single-line comments
-            code = re.sub(r'#.*$', '', code, flags=re.MULTILINE)
-            # Remove docstrings
-            code = re.sub(r'""".*?"""', '', code, flags=re.DOTALL)
-            code = re.sub(r"'''.*?'''", '', code, flags=re.DOTALL)
-        
-        # Common sanitization for all languages
-        # Remove extra whitespace
-        code = re.sub(r'\n\s*\n', '\n', code)
-        return code.strip()
+        return get_language(language).sanitize(code)
 
-    def parse_ast(self, code: str) -> ast.AST:
-        """Parse Python code into an AST."""
-        try:
-            return ast.parse(code)
-        except SyntaxError as e:
-            raise Exception(f"Syntax error in Python code: {str(e)}")
+    def iter_code_chunks(self, lines: Iterable[str], language: str = 'python') -> Iterator[Dict[str, Any]]:
+        """Chunk code read line by line, yielding each chunk as soon as it is complete.
 
-    def get_node_context(self, node: ast.AST) -> Dict[str, Any]:
-        """Extract context information from an AST node."""
-        context = {
-            'type': type(node).__name__,
-            'lineno': getattr(node, 'lineno', None),
-            'end_lineno': getattr(node, 'end_lineno', None),
-        }
-        
-        if isinstance(node, ast.FunctionDef):
-            context['name'] = node.name
-            context['args'] = [arg.arg for arg in node.args.args]
-            context['returns'] = ast.unparse(node.returns) if node.returns else None
-        elif isinstance(node, ast.ClassDef):
-            context['name'] = node.name
-            context['bases'] = [ast.unparse(base) for base in node.bases]
-        
-        return context
+        Lines are consumed lazily (e.g. from an upload that is still arriving)
+        and grouped into chunks of the language's complete top-level units, up
+        to ``max_chunk_size`` characters each. Units larger than that are
+        split into their members (methods of a class, say), and only then at
+        line boundaries. Each chunk is sanitized on its own, so its
+        ``start_line`` and ``total_lines`` refer to the original code; chunks
+        of nothing but comments and blank lines are left out.
 
-    def chunk_python_code(self, code: str) -> List[Dict[str, Any]]:
-        """Split Python code into logical chunks using AST parsing."""
-        logger.info("Chunking Python code using AST")
-        tree = self.parse_ast(code)
-        chunks = []
-        current_chunk = []
-        current_size = 0
-
-        for node in ast.walk(tree):
-            if isinstance(node, (ast.FunctionDef, ast.ClassDef)):
-                node_code = ast.unparse(node)
-                node_size = len(node_code)  # Using character count instead of token count
-                
-                if current_size + node_size > self.max_chunk_size and current_chunk:
-                    chunks.append({
-                        'code': '\n'.join(current_chunk),
-                        'context': {
-                            'file_name': 'unnamed_code.py',
-                            'total_lines': len('\n'.join(current_chunk).split('\n')),
-                            'language': 'python'
-                        }
-                    })
-                    current_chunk = []
-                    current_size = 0
-                
-                current_chunk.append(node_code)
-                current_size += node_size
-
-        if current_chunk:
-            chunks.append({
-                'code': '\n'.join(current_chunk),
-                'context': {
-                    'file_name': 'unnamed_code.py',
-                    'total_lines': len('\n'.join(current_chunk).split('\n')),
-                    'language': 'python'
-                }
-            })
+        Args:
+            lines: The code, one line (with its line ending) at a time
+            language: The programming language of the code
+        """
+        spec = get_language(language)
+        parts = []
+        size = 0
+        start_line = 1
+        for unit_start, unit in spec.iter_units(lines, 0):
+            for piece_start, piece in self._split_oversized(spec, unit_start, unit):
+                if parts and size + len(piece) > self.max_chunk_size:
+                    chunk = self._make_chunk(parts, start_line, spec)
+                    if chunk is not None:
+                        yield chunk
+                    parts, size = [], 0
+                if not parts:
+                    start_line = piece_start
+                parts.append(piece)
+                size += len(piece)
+        chunk = self._make_chunk(parts, start_line, spec) if parts else None
+        if chunk is not None:
+            yield chunk
 
-        return chunks or [self.create_single_chunk(code, 'python')]
+    def _members(self, spec: Language, unit: str) -> List[Tuple[int, str]]:
+        """Members of a unit, with its header (``class A:``, ``class A {``) kept with the first
+        member and a closing line (``}``) with the last."""
+        members = list(spec.iter_units(unit.splitlines(keepends=True), 1))
+        if len(members) <= 1:
+            return [(1, unit)]
+        if len(members) > 2 and not members[-1][1].strip().strip(CLOSERS + ';'):
+            members[-2:] = [(members[-2][0], members[-2][1] + members[-1][1])]
+        header_start, header = members.pop(0)
+        members[0] = (header_start, header + members[0][1])
+        return members
 
-    def chunk_javascript_code(self, code: str) -> List[Dict[str, Any]]:
-        """Chunk JavaScript code using regex patterns for functions and classes."""
-        logger.info("Chunking JavaScript code using regex patterns")
-        
-        # Define regex patterns for JavaScript functions and classes
-        function_pattern = r'(function\s+\w+\s*\([^)]*\)\s*\{[\s\S]*?\})'
-        arrow_function_pattern = r'(const\s+\w+\s*=\s*(\([^)]*\)|[^=]+)\s*=>\s*(\{[\s\S]*?\}|[^;]+))'
-        class_pattern = r'(class\s+\w+(\s+extends\s+\w+)?\s*\{[\s\S]*?\})'
-        method_pattern = r'(\w+\s*\([^)]*\)\s*\{[\s\S]*?\})'
-        
-        # Combined pattern
-        combined_pattern = f"{function_pattern}|{arrow_function_pattern}|{class_pattern}"
-        
-        # Find all blocks
-        blocks = re.finditer(combined_pattern, code)
-        chunks = []
-        
-        # Process each block
-        for block in blocks:
-            block_code = block.group(0)
-            block_size = len(block_code)
-            
-            # If this block is bigger than max size, we could split it further
-            # but for simplicity, we'll treat it as a single chunk
-            chunks.append({
-                'code': block_code,
-                'context': {
-                    'file_name': 'unnamed_code.js',
-                    'total_lines': len(block_code.split('\n')),
-                    'language': 'javascript'
-                }
-            })
-        
-        # If no chunks were found or recognition failed, treat whole code as one chunk
-        return chunks or [self.create_single_chunk(code, 'javascript')]
+    def _split_oversized(self, spec: Language, start_line: int, unit: str) -> Iterator[Tuple[int, str]]:
+        """Split a unit longer than max_chunk_size into its members, then at line boundaries."""
+        if len(unit) <= self.max_chunk_size:
+            yield start_line, unit
+            return
+        for member_start, member in self._members(spec, unit):
+            member_start += start_line - 1
+            if len(member) <= self.max_chunk_size:
+                yield member_start, member
+                continue
+            piece = []
+            size = 0
+            piece_start = member_start
+            has_body = False
+            for offset, line in enumerate(member.splitlines(keepends=True)):
+                # Never cut between a header line (``def f(x):``, ``if (x) {``) and the first line of its body
+                if has_body and size + len(line) > self.max_chunk_size:
+                    yield piece_start, ''.join(piece)
+                    piece, size, has_body = [], 0, False
+                    piece_start = member_start + offset
+                piece.append(line)
+                size += len(line)
+                stripped = spec.sanitize(line).strip()
+                has_body = has_body or bool(stripped) and not stripped.endswith((':',) + tuple(OPENERS))
+            if piece:
+                yield piece_start, ''.join(piece)
 
-    def chunk_code_simple(self, code: str, language: str) -> List[Dict[str, Any]]:
-        """Simple chunking strategy that splits code by size without caring about syntax."""
-        logger.info(f"Using simple chunking for {language} code")
-        
-        # Determine appropriate extension
-        file_ext = '.js' if language.lower() == 'javascript' else '.py'
-        
-        # Split into lines
-        lines = code.split('\n')
-        chunks = []
-        current_chunk = []
-        current_size = 0
-        
-        for line in lines:
-            line_size = len(line) + 1  # +1 for the newline
-            
-            if current_size + line_size > self.max_chunk_size and current_chunk:
-                chunk_code = '\n'.join(current_chunk)
-                chunks.append({
-                    'code': chunk_code,
-                    'context': {
-                        'file_name': f'unnamed_code{file_ext}',
-                        'total_lines': len(current_chunk),
-                        'language': language
-                    }
-                })
-                current_chunk = []
-                current_size = 0
-            
-            current_chunk.append(line)
-            current_size += line_size
-        
-        if current_chunk:
-            chunk_code = '\n'.join(current_chunk)
-            chunks.append({
-                'code': chunk_code,
-                'context': {
-                    'file_name': f'unnamed_code{file_ext}',
-                    'total_lines': len(current_chunk),
-                    'language': language
-                }
-            })
-        
-        return chunks
+    @staticmethod
+    def _make_chunk(parts: List[str], start_line: int, spec: Language) -> Optional[Dict[str, Any]]:
+        """Sanitize a chunk; None if nothing but comments and blank lines is left."""
+        code = spec.sanitize(''.join(parts))
+        if not code.strip():
+            return None
+        lines = ''.join(parts).splitlines()
+        # Line numbers count from the chunk's first and last line of code, not the comments around it
+        code_lines = code.splitlines()
+        first, last = code_lines[0].strip(), code_lines[-1].strip()
+        leading = next((index for index, line in enumerate(lines) if first in line), 0)
+        trailing = next((index for index, line in enumerate(reversed(lines[leading:])) if last in line), 0)
+        return {
+            'code': code,
+            'context': {
+                'file_name': f'unnamed_code{spec.file_extension}',
+                'start_line': start_line + leading,
+                'total_lines': len(lines) - leading - trailing,
+                'language': spec.name
+            }
+        }
 
     def create_single_chunk(self, code: str, language: str) -> Dict[str, Any]:
         """Create a single chunk containing all code when other chunking methods fail."""
-        file_ext = '.js' if language.lower() == 'javascript' else '.py'
+        file_ext = get_language(language).file_extension
         return {
             'code': code,
             'context': {
@@ -221,4 +155,4 @@ class CodeProcessor:
     def chunk_code(self, code: str) -> List[Dict[str, Any]]:
         """Legacy method that defaults to Python chunking."""
         logger.warning("Using legacy chunk_code method - consider updating to process_code_string")
-        return self.chunk_python_code(code)
\ No newline at end of file
+        return self.process_code_string(code, 'python')
\ No newline at end of file
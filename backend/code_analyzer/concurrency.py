@@ -0,0 +1,291 @@
+import os
+import time
+import threading
+import logging
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BackendUnavailableError(Exception):
+    """Raised when the model backend is known to be unhealthy or saturated.
+
+    Carries a ``retry_after`` hint (in seconds) so callers can tell clients
+    when it is worth trying again instead of retrying blindly.
+    """
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = max(1, int(round(retry_after)))
+
+
+def classify_error(error: Exception) -> str:
+    """Classify a model backend exception.
+
+    Returns:
+        'throttled' for rate limiting (429), 'server_error' for 5xx and
+        transport failures, and 'client_error' for everything else.
+    """
+    status = getattr(error, 'code', None) or getattr(error, 'status_code', None)
+    if isinstance(status, int):
+        if status == 429:
+            return 'throttled'
+        if status >= 500:
+            return 'server_error'
+        return 'client_error'
+
+    message = str(error).upper()
+    if '429' in message or 'RESOURCE_EXHAUSTED' in message or 'RATE LIMIT' in message:
+        return 'throttled'
+    if any(marker in message for marker in ('500', '502', '503', '504', 'UNAVAILABLE',
+                                             'INTERNAL', 'DEADLINE_EXCEEDED', 'TIMEOUT',
+                                             'CONNECTION')):
+        return 'server_error'
+    return 'client_error'
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD concurrency limit shared by every call to the model backend.
+
+    The limit grows additively (by roughly one slot per limit's worth of
+    successful calls) and shrinks multiplicatively on throttling or when
+    latency rises well above its recent norm. Latency is tracked per route
+    (the model called), since tiers and prompt sizes differ by far more
+    than a healthy backend varies. A route counts as slowing down when its
+    short-term average exceeds ``latency_tolerance`` times its long-term
+    average, so steady but variable latency never shrinks the limit, while
+    a permanent shift is absorbed once the long-term average catches up.
+    """
+    SHORT_TERM_WEIGHT = 0.2  # EWMA weight of the latest call, about the last 5 calls
+    LONG_TERM_WEIGHT = 0.02  # About the last 50 calls
+    WARM_UP_CALLS = 10  # Calls per route before its latency can shrink the limit
+
+    def __init__(self, initial_limit: int = 8, min_limit: int = 1, max_limit: int = 64,
+                 backoff_ratio: float = 0.5, latency_tolerance: float = 2.0):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_ratio = backoff_ratio
+        self.latency_tolerance = latency_tolerance
+        self.limit = float(min(max(initial_limit, min_limit), max_limit))
+        self.in_flight = 0
+        self.smoothed_latency = None  # EWMA of observed latency over all routes, for planning
+        self.route_latency: Dict[str, Dict[str, float]] = {}  # route -> calls, short_term, long_term
+        self.total_acquired = 0
+        self.total_rejected = 0
+        self.total_decreases = 0
+        self._condition = threading.Condition()
+
+    @classmethod
+    def from_env(cls) -> "AdaptiveConcurrencyLimiter":
+        return cls(
+            initial_limit=int(os.getenv('MODEL_CONCURRENCY_INITIAL', 8)),
+            min_limit=int(os.getenv('MODEL_CONCURRENCY_MIN', 1)),
+            max_limit=int(os.getenv('MODEL_CONCURRENCY_MAX', 64)),
+            backoff_ratio=float(os.getenv('MODEL_CONCURRENCY_BACKOFF', 0.5)),
+            latency_tolerance=float(os.getenv('MODEL_LATENCY_TOLERANCE', 2.0)),
+        )
+
+    def acquire(self, timeout: Optional[float] = None) -> None:
+        """Wait for a free slot under the current limit.
+
+        Raises:
+            BackendUnavailableError: If no slot frees up within ``timeout``.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self.total_rejected += 1
+                    raise BackendUnavailableError(
+                        "Model backend is saturated; no concurrency slot available",
+                        retry_after=self.smoothed_latency or 1.0
+                    )
+                self._condition.wait(remaining)
+            self.in_flight += 1
+            self.total_acquired += 1
+
+    def release(self, latency: float, outcome: str = 'success', route: str = '') -> None:
+        """Return a slot and adjust the limit based on how the call went.
+
+        Args:
+            latency: Seconds the call took
+            outcome: 'success' or a ``classify_error`` outcome
+            route: What was called, usually the model; latency is only
+                compared with earlier calls of the same route
+        """
+        with self._condition:
+            self.in_flight = max(0, self.in_flight - 1)
+
+            if outcome in ('throttled', 'server_error'):
+                self._decrease()
+            elif outcome == 'success':
+                if self._observe_latency(latency, route):
+                    self._decrease(route)
+                else:
+                    self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+            self._condition.notify_all()
+
+    def _observe_latency(self, latency: float, route: str) -> bool:
+        """Record a call's latency; returns whether its route is slowing down."""
+        if self.smoothed_latency is None:
+            self.smoothed_latency = latency
+        self.smoothed_latency += self.SHORT_TERM_WEIGHT * (latency - self.smoothed_latency)
+
+        stats = self.route_latency.get(route)
+        if stats is None:
+            self.route_latency[route] = {'calls': 1, 'short_term': latency, 'long_term': latency}
+            return False
+        stats['calls'] += 1
+        stats['short_term'] += self.SHORT_TERM_WEIGHT * (latency - stats['short_term'])
+        stats['long_term'] += self.LONG_TERM_WEIGHT * (latency - stats['long_term'])
+        return stats['calls'] > self.WARM_UP_CALLS and \
+            stats['short_term'] > stats['long_term'] * self.latency_tolerance
+
+    def _decrease(self, route: Optional[str] = None) -> None:
+        self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+        self.total_decreases += 1
+        if route is not None:
+            # Reset the short-term latency so one slow spell does not keep shrinking the limit
+            stats = self.route_latency[route]
+            stats['short_term'] = stats['long_term']
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                'limit': int(self.limit),
+                'in_flight': self.in_flight,
+                'smoothed_latency_seconds': self.smoothed_latency,
+                'latency_by_route': {
+                    route: {'short_term_seconds': stats['short_term'], 'long_term_seconds': stats['long_term']}
+                    for route, stats in self.route_latency.items()
+                },
+                'total_acquired': self.total_acquired,
+                'total_rejected': self.total_rejected,
+                'total_decreases': self.total_decreases,
+            }
+
+
+class CircuitBreaker:
+    """Circuit breaker that fails fast while the model backend is unhealthy.
+
+    ``closed``: calls flow normally. After ``failure_threshold`` consecutive
+    throttling/server failures the breaker moves to ``open`` and rejects every
+    call for ``reset_timeout`` seconds. It then lets ``half_open_max_calls``
+    probe calls through; one success closes it, one failure re-opens it.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 half_open_max_calls: int = 1):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.half_open_calls = 0
+        self.total_opens = 0
+        self.total_rejected = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "CircuitBreaker":
+        return cls(
+            failure_threshold=int(os.getenv('MODEL_BREAKER_FAILURE_THRESHOLD', 5)),
+            reset_timeout=float(os.getenv('MODEL_BREAKER_RESET_TIMEOUT', 30)),
+            half_open_max_calls=int(os.getenv('MODEL_BREAKER_HALF_OPEN_CALLS', 1)),
+        )
+
+    def retry_after(self) -> float:
+        """Seconds until the breaker will let a probe call through."""
+        with self._lock:
+            return self._retry_after()
+
+    def _retry_after(self) -> float:
+        if self.state != self.OPEN or self.opened_at is None:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def is_open(self) -> bool:
+        with self._lock:
+            return self.state == self.OPEN and self._retry_after() > 0
+
+    def before_call(self) -> None:
+        """Check whether a call may proceed.
+
+        Raises:
+            BackendUnavailableError: If the breaker is open, or half-open with
+                all probe slots taken.
+        """
+        with self._lock:
+            if self.state == self.OPEN:
+                if self._retry_after() > 0:
+                    self.total_rejected += 1
+                    raise BackendUnavailableError(
+                        "Model backend is unavailable (circuit open)",
+                        retry_after=self._retry_after()
+                    )
+                logger.info("Circuit breaker half-open, allowing probe calls")
+                self.state = self.HALF_OPEN
+                self.half_open_calls = 0
+
+            if self.state == self.HALF_OPEN:
+                if self.half_open_calls >= self.half_open_max_calls:
+                    self.total_rejected += 1
+                    raise BackendUnavailableError(
+                        "Model backend is recovering (circuit half-open)",
+                        retry_after=1.0
+                    )
+                self.half_open_calls += 1
+
+    def cancel_call(self) -> None:
+        """Give back the probe slot taken by ``before_call`` for a call that was never made."""
+        with self._lock:
+            if self.state == self.HALF_OPEN and self.half_open_calls > 0:
+                self.half_open_calls -= 1
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("Circuit breaker closed after successful probe")
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self.half_open_calls = 0
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"Circuit breaker opened after {self.consecutive_failures} failures")
+                    self.total_opens += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self.half_open_calls = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.consecutive_failures,
+                'retry_after_seconds': round(self._retry_after(), 1),
+                'total_opens': self.total_opens,
+                'total_rejected': self.total_rejected,
+            }
+
+
+# Shared across every AIAnalyzer instance so that all concurrent analyses
+# back off together instead of retrying independently.
+model_limiter = AdaptiveConcurrencyLimiter.from_env()
+model_circuit_breaker = CircuitBreaker.from_env()
+
+
+def get_backend_metrics() -> Dict[str, Any]:
+    """Return a snapshot of the model backend concurrency state."""
+    return {
+        'concurrency': model_limiter.snapshot(),
+        'circuit_breaker': model_circuit_breaker.snapshot(),
+    }
@@ -0,0 +1,372 @@
+import ast
+import os
+import re
+import json
+import zlib
+import hashlib
+import builtins
+import threading
+import logging
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Any, Optional, Tuple
+from .code_processor import parse_python
+
+logger = logging.getLogger(__name__)
+
+BUILTIN_NAMES = frozenset(dir(builtins)) | {'self', 'cls'}
+HASH_MASK = (1 << 32) - 1
+EMPTY_BIN = HASH_MASK + 1  # Above any bin value
+DENSIFY_OFFSET = 0x9E3779B1  # Odd constant separating values borrowed from different distances
+# Identifiers are only renamed inside inline code and code blocks, never in prose
+CODE_SPAN_PATTERN = re.compile(r"```.*?```|`[^`\n]+`", re.DOTALL)
+
+@dataclass
+class Fingerprint:
+    """Structural identity of a chunk of code.
+
+    ``structural_hash`` is equal for code that only differs in whitespace,
+    comments, the names of identifiers it binds itself or non-string literal
+    values; string literals, imports and free names are part of the
+    structure. ``literals_hash`` covers the abstracted literal values, so
+    matches that differ only in constants can be told apart.
+    ``externals_hash`` covers the imports and free names, which near
+    matches must share. ``signature`` is a MinHash of the normalized token
+    stream, used to find near matches. ``names`` maps each canonical
+    identifier (v0, v1, ...) back to the original name.
+    """
+    structural_hash: str
+    signature: array
+    names: List[str]
+    literals_hash: str = ''
+    externals_hash: str = ''
+
+
+class _Normalizer(ast.NodeVisitor):
+    """Turns an AST into an alpha-renamed, literal-abstracted token stream.
+
+    Only names the chunk binds itself (definitions, arguments, assignment
+    targets) are renamed. Free names, imported names and module names are
+    kept, since ``pickle.loads`` and ``json.loads`` behave very differently.
+    String literals are kept (as digests), since they often carry the
+    meaning, or the secrets, of the code; other literals are abstracted and
+    collected in ``literals``.
+    """
+
+    def __init__(self, tree: ast.AST):
+        self.tokens = []
+        self.names = []
+        self.literals = []
+        self.externals = set()  # Imports and free names
+        self._canonical = {}
+        self._bound = self._bound_names(tree)
+
+    @staticmethod
+    def _bound_names(tree: ast.AST) -> frozenset:
+        """Names bound inside the chunk, other than by imports."""
+        bound, imported = set(), set()
+        for node in ast.walk(tree):
+            node_type = type(node)
+            if node_type is ast.Name and type(node.ctx) is not ast.Load:
+                bound.add(node.id)
+            elif node_type in (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef):
+                bound.add(node.name)
+            elif node_type is ast.arg:
+                bound.add(node.arg)
+            elif node_type is ast.ExceptHandler and node.name:
+                bound.add(node.name)
+            elif node_type is ast.alias:
+                imported.add((node.asname or node.name).split('.')[0])
+            elif node_type in (ast.Global, ast.Nonlocal):
+                imported.update(node.names)  # Bound outside the chunk
+        return frozenset(bound - imported)
+
+    def _rename(self, name: str) -> str:
+        if name in BUILTIN_NAMES:
+            return name
+        if name not in self._bound:
+            self.externals.add(name)
+            return name
+        if name not in self._canonical:
+            self._canonical[name] = f"v{len(self.names)}"
+            self.names.append(name)
+        return self._canonical[name]
+
+    def generic_visit(self, node: ast.AST) -> None:
+        node_type = type(node)
+        if node_type is ast.Name:
+            self.tokens.append(self._rename(node.id))
+            return
+        if node_type is ast.Constant:
+            if isinstance(node.value, str):
+                digest = hashlib.blake2b(node.value.encode('utf-8', 'surrogatepass'), digest_size=8).hexdigest()
+                self.tokens.append(f"<str:{digest}>")
+            else:
+                self.tokens.append(f"<{type(node.value).__name__}>")
+                self.literals.append(repr(node.value))
+            return
+        if node_type is ast.Expr and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str):
+            return  # Docstrings do not change behaviour
+        self.tokens.append(node_type.__name__)
+        if node_type in (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef):
+            self.tokens.append(self._rename(node.name))
+        elif node_type is ast.arg:
+            self.tokens.append(self._rename(node.arg))
+        elif node_type is ast.ExceptHandler and node.name:
+            self.tokens.append(self._rename(node.name))
+        elif node_type is ast.Attribute:
+            self.tokens.append(node.attr)
+        elif node_type is ast.alias:
+            self.tokens.extend((node.name, node.asname or ''))
+            self.externals.add(node.name)
+        elif node_type is ast.ImportFrom:
+            self.tokens.extend((node.module or '', str(node.level)))
+            self.externals.add(f"{'.' * node.level}{node.module or ''}")
+        elif node_type in (ast.Global, ast.Nonlocal):
+            self.tokens.extend(node.names)
+        super().generic_visit(node)
+
+
+class Fingerprinter:
+    """Computes structural hashes and MinHash signatures for Python chunks."""
+
+    def __init__(self, num_perm: int = 64, shingle_size: int = 5, seed: int = 1):
+        self.num_perm = num_perm  # Signature length; one bin of the one-permutation MinHash each
+        self.shingle_size = shingle_size
+        self._hash_key = seed.to_bytes(8, 'big')
+
+    def fingerprint(self, code: str, language: str = 'python',
+                    tree: Optional[ast.AST] = None) -> Optional[Fingerprint]:
+        """Fingerprint a chunk, or return None if it cannot be parsed.
+
+        ``tree`` is the chunk's already parsed syntax tree, to avoid parsing
+        it again.
+        """
+        if language.lower() != 'python':
+            return None
+        if tree is None:
+            try:
+                tree = parse_python(code)
+            except (SyntaxError, ValueError):
+                return None
+
+        normalizer = _Normalizer(tree)
+        normalizer.visit(tree)
+        tokens = normalizer.tokens
+        structural_hash = hashlib.blake2b(" ".join(tokens).encode(), digest_size=16).hexdigest()
+        literals_hash = hashlib.blake2b("\0".join(normalizer.literals).encode(), digest_size=16).hexdigest()
+        externals_hash = hashlib.blake2b("\0".join(sorted(normalizer.externals)).encode(),
+                                         digest_size=16).hexdigest()
+        return Fingerprint(structural_hash=structural_hash, signature=self._minhash(tokens),
+                           names=normalizer.names, literals_hash=literals_hash, externals_hash=externals_hash)
+
+    def _minhash(self, tokens: List[str]) -> array:
+        """One-permutation MinHash of the token shingles.
+
+        Each shingle is hashed once; the hash picks one of ``num_perm`` bins
+        and the bin keeps its smallest value. That costs one hash per shingle
+        rather than one per shingle and permutation. Empty bins take the
+        value of the next filled bin plus an offset for the distance
+        (rotation densification), so equal bins still estimate Jaccard
+        similarity.
+        """
+        size, bin_count = self.shingle_size, self.num_perm
+        bins = [EMPTY_BIN] * bin_count
+        for i in range(max(1, len(tokens) - size + 1)):
+            digest = hashlib.blake2b(" ".join(tokens[i:i + size]).encode(), digest_size=8, key=self._hash_key).digest()
+            value = int.from_bytes(digest, 'big')
+            index, value = value % bin_count, (value // bin_count) & HASH_MASK
+            if value < bins[index]:
+                bins[index] = value
+        signature = array('I', bytes(4 * bin_count))
+        for index in range(bin_count):
+            distance = 0
+            while bins[(index + distance) % bin_count] == EMPTY_BIN:
+                distance += 1
+            signature[index] = (bins[(index + distance) % bin_count] + distance * DENSIFY_OFFSET) & HASH_MASK
+        return signature
+
+    @staticmethod
+    def similarity(left: array, right: array) -> float:
+        """Estimated Jaccard similarity of two signatures."""
+        return sum(1 for x, y in zip(left, right) if x == y) / len(left)
+
+
+@dataclass
+class _Entry:
+    key: str  # Reuse scope and structural hash
+    signature: array
+    names: List[str]
+    literals_hash: str
+    externals_hash: str
+    results: bytes  # zlib-compressed JSON of stage texts
+    stage_names: frozenset
+    size: int
+
+
+class FingerprintIndex:
+    """Memory-bounded store of earlier chunk analyses keyed by fingerprint.
+
+    Exact structural matches are found through a dict; near matches through
+    LSH over MinHash bands, so lookups stay O(bands) regardless of size.
+    Results are only reused within the ``scope`` they were stored under
+    (the tenant), so one tenant's code and results never reach another.
+    Entries are evicted least-recently-used once ``max_entries`` or
+    ``max_bytes`` is exceeded.
+    """
+    def __init__(self, fingerprinter: Fingerprinter, bands: int = 16, threshold: float = 0.9,
+                 max_entries: int = 1_000_000, max_bytes: int = 512 * 1024 * 1024, max_candidates: int = 32):
+        self.fingerprinter = fingerprinter
+        self.bands = bands
+        self.rows = fingerprinter.num_perm // bands
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_candidates = max_candidates
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._buckets: List[Dict[int, List[str]]] = [dict() for _ in range(bands)]
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {'exact_hits': 0, 'near_hits': 0, 'misses': 0, 'evictions': 0}
+
+    @classmethod
+    def from_env(cls) -> "FingerprintIndex":
+        return cls(
+            Fingerprinter(),
+            threshold=float(os.getenv('FINGERPRINT_SIMILARITY_THRESHOLD', 0.9)),
+            max_entries=int(os.getenv('FINGERPRINT_MAX_ENTRIES', 1_000_000)),
+            max_bytes=int(os.getenv('FINGERPRINT_MAX_MB', 512)) * 1024 * 1024,
+        )
+
+    def _band_keys(self, signature: array, scope: str) -> List[int]:
+        return [hash((scope, tuple(signature[band * self.rows:(band + 1) * self.rows])))
+                for band in range(self.bands)]
+
+    def lookup(self, fingerprint: Fingerprint, stages: List[str],
+               scope: str = '') -> Optional[Tuple[str, float, Dict[str, str]]]:
+        """Find earlier results covering ``stages`` for this fingerprint.
+
+        Returns:
+            (match type, similarity, stage texts) where the match type is
+            'exact' or 'near', or None if nothing similar enough is stored.
+        """
+        with self._lock:
+            key = f"{scope}\0{fingerprint.structural_hash}"
+            entry = self._entries.get(key)
+            if entry is not None and self._covers(entry, stages):
+                self._entries.move_to_end(key)
+                self.stats['exact_hits'] += 1
+                return 'exact', 1.0, self._adapt(entry, fingerprint)
+
+            best, best_similarity = None, 0.0
+            candidates = 0
+            for band, band_key in enumerate(self._band_keys(fingerprint.signature, scope)):
+                for entry_key in self._buckets[band].get(band_key, ()):
+                    if not entry_key.startswith(key[:len(scope) + 1]):
+                        continue  # Band key collision with another scope
+                    candidate = self._entries[entry_key]
+                    similarity = Fingerprinter.similarity(candidate.signature, fingerprint.signature)
+                    # Different imports or outside names, e.g. pickle instead of json, never match
+                    if similarity > best_similarity and self._covers(candidate, stages) \
+                            and candidate.externals_hash == fingerprint.externals_hash:
+                        best, best_similarity = candidate, similarity
+                    candidates += 1
+                    if candidates >= self.max_candidates:
+                        break
+                if candidates >= self.max_candidates:
+                    break
+
+            if best is not None and best_similarity >= self.threshold:
+                self._entries.move_to_end(best.key)
+                self.stats['near_hits'] += 1
+                results = json.loads(zlib.decompress(best.results))
+                note = (f"[Reused from an earlier analysis of structurally similar code "
+                        f"(similarity {best_similarity:.2f}); identifiers may differ.]\n")
+                return 'near', best_similarity, {stage: note + text for stage, text in results.items()}
+
+            self.stats['misses'] += 1
+            return None
+
+    @staticmethod
+    def _covers(entry: _Entry, stages: List[str]) -> bool:
+        return all(stage in entry.stage_names for stage in stages)
+
+    def _adapt(self, entry: _Entry, fingerprint: Fingerprint) -> Dict[str, str]:
+        """Rewrite the stored code's identifiers to the new code's, noting what may still differ."""
+        results = json.loads(zlib.decompress(entry.results))
+        caveats = []
+        if entry.names != fingerprint.names:
+            caveats.append("identifiers in code were renamed to match, prose may use the original names")
+        if entry.literals_hash != fingerprint.literals_hash:
+            caveats.append("constant values differ, so statements about specific values may not apply")
+        if not caveats:
+            return results
+        note = (f"[Reused from an earlier analysis of structurally identical code; "
+                f"{'; '.join(caveats)}.]\n")
+        return {stage: note + text
+                for stage, text in self._rename_results(results, entry.names, fingerprint.names).items()}
+
+    def add(self, fingerprint: Fingerprint, stage_results: Dict[str, str], scope: str = '') -> None:
+        """Store (or extend) the results for a fingerprint."""
+        with self._lock:
+            key = f"{scope}\0{fingerprint.structural_hash}"
+            existing = self._entries.pop(key, None)
+            if existing is not None:
+                self._bytes -= existing.size
+            if existing is not None and existing.literals_hash == fingerprint.literals_hash:
+                merged = json.loads(zlib.decompress(existing.results))
+                # Keep the stored identifiers consistent with the stored texts
+                merged.update(self._rename_results(stage_results, fingerprint.names, existing.names))
+                names = existing.names
+            else:
+                # Results for other constant values are replaced rather than mixed in
+                merged = dict(stage_results)
+                names = fingerprint.names
+                if existing is None:
+                    for band, band_key in enumerate(self._band_keys(fingerprint.signature, scope)):
+                        self._buckets[band].setdefault(band_key, []).append(key)
+
+            data = zlib.compress(json.dumps(merged, separators=(',', ':')).encode('utf-8'))
+            size = len(data) + len(fingerprint.signature) * fingerprint.signature.itemsize + 64 * self.bands
+            entry = _Entry(key=key, signature=fingerprint.signature, names=names,
+                           literals_hash=fingerprint.literals_hash, externals_hash=fingerprint.externals_hash,
+                           results=data,
+                           stage_names=frozenset(merged), size=size)
+            self._entries[key] = entry
+            self._bytes += size
+            self._evict()
+
+    @staticmethod
+    def _rename_results(results: Dict[str, str], from_names: List[str], to_names: List[str]) -> Dict[str, str]:
+        renames = {old: new for old, new in zip(from_names, to_names) if old != new}
+        if not renames:
+            return results
+        pattern = re.compile(r"\b(" + "|".join(re.escape(name) for name in renames) + r")\b")
+
+        def rename_code(span):
+            return pattern.sub(lambda match: renames[match.group(0)], span.group(0))
+        return {stage: CODE_SPAN_PATTERN.sub(rename_code, text) for stage, text in results.items()}
+
+    def _evict(self) -> None:
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            key, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.size
+            scope = key.split('\0', 1)[0]
+            for band, band_key in enumerate(self._band_keys(entry.signature, scope)):
+                bucket = self._buckets[band].get(band_key)
+                if bucket is not None:
+                    bucket.remove(key)
+                    if not bucket:
+                        del self._buckets[band][band_key]
+            self.stats['evictions'] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._bytes, **self.stats}
+
+
+FINGERPRINT_REUSE_ENABLED = os.getenv('FINGERPRINT_REUSE_ENABLED', 'true').lower() == 'true'
+
+# Shared by every analysis in the process
+fingerprint_index = FingerprintIndex.from_env()
@@ -0,0 +1,237 @@
+import io
+import re
+import tokenize
+import itertools
+import logging
+from dataclasses import dataclass, field, replace
+from functools import partial
+from typing import Dict, List, Callable, Iterable, Iterator, Optional, Pattern, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Top-level keywords that continue the previous statement rather than start a new one
+CONTINUATION_KEYWORDS = frozenset(['else', 'elif', 'except', 'finally'])
+OPENERS = '{[('
+CLOSERS = '}])'
+
+# String literal patterns, so comments and brackets inside strings are left alone
+C_STRINGS = r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\''
+JS_STRINGS = C_STRINGS + r'|`(?:\\.|[^`\\])*`'
+GO_STRINGS = C_STRINGS + r'|`[^`]*`'
+JAVA_STRINGS = r'"""[\s\S]*?"""|' + C_STRINGS
+
+Units = Iterator[Tuple[int, str]]
+
+@dataclass
+class Language:
+    """How one programming language is sanitized, chunked and prompted for.
+
+    ``iter_units(lines, level)`` yields (first line number, source) for each
+    structural unit (statement, declaration, block) that ends at nesting
+    ``level``; level 0 gives top-level units, level 1 the members of a
+    single oversized unit. It reads ``lines`` lazily so it also works on
+    streamed uploads.
+    """
+    name: str
+    display_name: str
+    file_extension: str
+    sanitize: Callable[[str], str]
+    iter_units: Callable[[Iterable[str], int], Units]
+    test_framework: str
+    prompt_hints: str = ''
+    aliases: Tuple[str, ...] = field(default_factory=tuple)
+
+
+def strip_blank_lines(code: str) -> str:
+    # Leading blank lines go, but not the first line's indentation, which chunks of members need
+    return re.sub(r'\A\s*\n', '', re.sub(r'\n\s*\n', '\n', code)).rstrip()
+
+
+def sanitize_python(code: str) -> str:
+    """Remove comments and blank lines, using the tokenizer so strings are never touched."""
+    cuts = {}
+    protected = set()
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(code).readline):
+            if token.type == tokenize.COMMENT:
+                cuts[token.start[0]] = token.start[1]
+            elif token.end[0] > token.start[0] and token.type not in (tokenize.NEWLINE, tokenize.NL):
+                # Lines inside multi-line strings are kept verbatim
+                protected.update(range(token.start[0] + 1, token.end[0] + 1))
+    except (tokenize.TokenError, SyntaxError):
+        return strip_blank_lines(code)
+
+    kept = []
+    for row, line in enumerate(code.splitlines(keepends=True), start=1):
+        if row not in protected:
+            if row in cuts:
+                line = line[:cuts[row]].rstrip() + '\n'
+            if not line.strip():
+                continue
+        kept.append(line)
+    return ''.join(kept).rstrip()
+
+
+def sanitize_c_family(code: str, strings: Pattern) -> str:
+    """Remove // and /* */ comments outside string literals, then blank lines."""
+    code = strings.sub(lambda match: match.group(1) or '', code)
+    return strip_blank_lines(code)
+
+
+def python_units(lines: Iterable[str], level: int = 0) -> Units:
+    """Yield Python statements that start at indentation ``level``.
+
+    Boundaries come from ``tokenize``, which reads one line at a time, so a
+    statement is yielded as soon as the next one starts. Decorators stay with
+    what they decorate. If the code cannot be tokenized, the rest is split
+    into bracket-balanced blocks instead.
+    """
+    line_iter = iter(lines)
+    pending = []  # Lines read but not yet yielded
+    pending_start = 1
+
+    def readline() -> str:
+        line = next(line_iter, '')
+        if line:
+            pending.append(line)
+        return line
+
+    depth = 0
+    at_boundary = True
+    decorated = False
+    try:
+        for token in tokenize.generate_tokens(readline):
+            if token.type == tokenize.INDENT:
+                depth += 1
+                continue
+            if token.type == tokenize.DEDENT:
+                depth -= 1
+                at_boundary = at_boundary or depth <= level
+                continue
+            if token.type == tokenize.NEWLINE:
+                at_boundary = at_boundary or depth <= level
+                continue
+            if token.type in (tokenize.NL, tokenize.COMMENT, tokenize.ENDMARKER) or not at_boundary:
+                continue
+
+            at_boundary = False
+            row = token.start[0]
+            starts_statement = depth <= level and not decorated and token.string not in CONTINUATION_KEYWORDS
+            if starts_statement and row > pending_start:
+                count = row - pending_start
+                yield pending_start, ''.join(pending[:count])
+                del pending[:count]
+                pending_start = row
+            decorated = depth <= level and token.string == '@'
+    except (tokenize.TokenError, SyntaxError) as e:
+        logger.warning(f"Python tokenizing failed: {str(e)}. Falling back to block chunking.")
+        for block_start, block in bracket_units(itertools.chain(pending, line_iter), level):
+            yield pending_start + block_start - 1, block
+        return
+
+    if pending:
+        yield pending_start, ''.join(pending)
+
+
+def bracket_units(lines: Iterable[str], level: int = 0, strings: Optional[Pattern] = None) -> Units:
+    """Yield blocks of lines that end with bracket nesting back at ``level``.
+
+    Used for C-family languages, where a declaration ends once its braces
+    (and any parentheses it opened) are closed. Annotation and decorator
+    lines stay with the declaration that follows them.
+    """
+    block = []
+    start_line = 1
+    depth = 0
+    for line_number, line in enumerate(lines, start=1):
+        if not block:
+            start_line = line_number
+        block.append(line)
+        code = strings.sub('', line) if strings is not None else line
+        depth = max(0, depth + sum(code.count(c) for c in OPENERS) - sum(code.count(c) for c in CLOSERS))
+        stripped = code.strip()
+        if depth <= level and stripped and not stripped.startswith('@'):
+            yield start_line, ''.join(block)
+            block = []
+    if block:
+        yield start_line, ''.join(block)
+
+
+_registry: Dict[str, Language] = {}
+
+def register_language(language: Language) -> None:
+    """Add (or replace) a language, under its name and aliases."""
+    for name in (language.name,) + language.aliases:
+        _registry[name.lower()] = language
+
+
+def get_language(name: Optional[str]) -> Language:
+    """Look up a language; unknown languages get generic bracket-based handling."""
+    name = (name or 'python').lower()
+    language = _registry.get(name)
+    if language is None:
+        return replace(GENERIC_LANGUAGE, name=name, display_name=name)
+    return language
+
+
+def supported_languages() -> List[str]:
+    return sorted({language.name for language in _registry.values()})
+
+
+def _c_family(name: str, display_name: str, file_extension: str, strings: str, test_framework: str,
+              prompt_hints: str, aliases: Tuple[str, ...] = ()) -> Language:
+    string_pattern = re.compile(strings)
+    comment_pattern = re.compile(f"({strings})" + r'|//[^\n]*|/\*[\s\S]*?\*/')
+    return Language(
+        name=name,
+        display_name=display_name,
+        file_extension=file_extension,
+        sanitize=partial(sanitize_c_family, strings=comment_pattern),
+        iter_units=partial(bracket_units, strings=string_pattern),
+        test_framework=test_framework,
+        prompt_hints=prompt_hints,
+        aliases=aliases,
+    )
+
+
+GENERIC_LANGUAGE = Language(
+    name='text',
+    display_name='text',
+    file_extension='.txt',
+    sanitize=strip_blank_lines,
+    iter_units=bracket_units,
+    test_framework='the idiomatic testing framework for the language',
+)
+
+register_language(Language(
+    name='python',
+    display_name='Python',
+    file_extension='.py',
+    sanitize=sanitize_python,
+    iter_units=python_units,
+    test_framework='pytest-style test functions in a ```python code block',
+    aliases=('py',),
+))
+register_language(_c_family(
+    'javascript', 'JavaScript', '.js', JS_STRINGS,
+    test_framework='a modern testing framework like Jest or Mocha',
+    prompt_hints='Pay attention to async/await and promise handling, == versus ===, and null versus undefined.',
+    aliases=('js', 'jsx'),
+))
+register_language(_c_family(
+    'typescript', 'TypeScript', '.ts', JS_STRINGS,
+    test_framework='Jest with ts-jest',
+    prompt_hints='Pay attention to unsafe type assertions, any, optional properties and promise handling.',
+    aliases=('ts', 'tsx'),
+))
+register_language(_c_family(
+    'go', 'Go', '.go', GO_STRINGS,
+    test_framework='the standard testing package with table-driven tests',
+    prompt_hints='Pay attention to ignored errors, nil pointers and maps, goroutine leaks and channel use.',
+    aliases=('golang',),
+))
+register_language(_c_family(
+    'java', 'Java', '.java', JAVA_STRINGS,
+    test_framework='JUnit 5',
+    prompt_hints='Pay attention to null handling, unclosed resources, equals/hashCode and exception handling.',
+))
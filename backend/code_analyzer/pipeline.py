@@ -1,8 +1,19 @@
-from typing import Dict, List, Any
-from concurrent.futures import ThreadPoolExecutor
-import asyncio
-from .code_processor import CodeProcessor
+from typing import Dict, List, Any, Optional, Callable, Iterable, Union
+from concurrent.futures import ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from dataclasses import dataclass
+import math
+import threading
+import time
+from .code_processor import CodeProcessor, parse_python
 from .ai_analyzer import AIAnalyzer
+from .concurrency import BackendUnavailableError, model_limiter
+from .static_analyzer import StaticAnalyzer, record_static_pass, record_calls_avoided
+from .test_runner import TestRunner, get_test_runner
+from .fingerprint import FINGERPRINT_REUSE_ENABLED, fingerprint_index
+from .cancellation import AnalysisCancelledError, CancellationToken, record_cancelled_calls
+from .languages import get_language
+from .profiling import ProfileSession
 import logging
 import os
 
@@ -10,26 +21,88 @@ import os
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def analyze_code(file_path_or_code: str, mode: str = 'full', is_code_string: bool = False, language: str = 'python') -> Dict[str, Any]:
+# Analysis stages as (result key, AIAnalyzer method, fallback text), ordered by
+# how valuable each stage is when there is not enough time to run them all.
+ANALYSIS_STAGES = [
+    ('correctness_analysis', 'assess_correctness', "No correctness analysis available."),
+    ('semantic_analysis', 'analyze_semantics', "No semantic analysis available."),
+    ('edge_cases', 'identify_edge_cases', "No edge case analysis available."),
+    ('test_cases', 'generate_test_cases', "No test cases available."),
+]
+RESULT_KEYS = ['semantic_analysis', 'correctness_analysis', 'edge_cases', 'test_cases']
+
+# Latency planning defaults, used until the limiter has observed real calls
+DEFAULT_CALL_LATENCY = float(os.getenv('DEFAULT_MODEL_CALL_LATENCY', 8.0))  # seconds
+FAST_MODEL_SPEEDUP = 0.5  # Fraction of the standard tier's latency
+COARSE_CHUNK_BUDGET = 60.0  # Budgets below this use coarser chunks to cut call count
+
+# Generated tests run the submitted code, so executing them is opt-in (see TestRunner)
+EXECUTE_GENERATED_TESTS = os.getenv('EXECUTE_GENERATED_TESTS', 'false').lower() == 'true'
+
+@dataclass
+class AnalysisPlan:
+    """What the pipeline will compute to fit inside a latency budget."""
+    stages: List[str]
+    max_chunk_size: int
+    max_tier: Optional[str] = None  # Caps the model tier the router may pick
+    deadline: Optional[float] = None  # time.monotonic() deadline, None when unbounded
+
+def analyze_code(file_path_or_code: Union[str, Iterable[str]], mode: str = 'full', is_code_string: bool = False,
+                 language: str = 'python', is_code_stream: bool = False, latency_budget: Optional[float] = None,
+                 on_refined: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 cancel_token: Optional[CancellationToken] = None,
+                 profile: Optional[ProfileSession] = None, reuse_scope: str = '') -> Dict[str, Any]:
     """Analyze code using the analysis pipeline.
     
     Args:
-        file_path_or_code: Path to the code file OR the code string itself
+        file_path_or_code: Path to the code file OR the code string itself OR an
+            iterable of code lines
         mode: Analysis mode ('full', 'quick', or 'deep')
         is_code_string: If True, treat the first parameter as the code string, not a file path
         language: Programming language of the code ('python', 'javascript', etc.)
+        is_code_stream: If True, treat the first parameter as lines that may still be
+            arriving; chunks are analyzed as soon as they are read
+        latency_budget: Seconds the caller is willing to wait. When set, results are
+            returned by the deadline and marked partial if some stages did not finish.
+        on_refined: Called with the complete results once background refinement of a
+            partial result has finished. Refinement only runs when this is provided.
+        cancel_token: Stops the analysis, and any refinement, once cancelled
+        profile: Profiles the analysis until it returns; the report is left in
+            ``profile.report``
+        reuse_scope: Results of earlier chunks are only reused within the same
+            scope, normally the tenant that submitted the code
     """
+    if profile is not None:
+        profile.start()
     try:
         logger.info(f"Starting code analysis with mode: {mode}, language: {language}")
-        pipeline = AnalysisPipeline(mode=mode, language=language)
+        pipeline = AnalysisPipeline(mode=mode, language=language, latency_budget=latency_budget,
+                                    on_refined=on_refined, cancel_token=cancel_token, profile=profile,
+                                    reuse_scope=reuse_scope)
         
-        if is_code_string:
-            results = pipeline.run_analysis_from_string(file_path_or_code)
-        else:
-            results = pipeline.run_analysis(file_path_or_code)
+        with pipeline.profiling():
+            if is_code_stream:
+                results = pipeline.run_analysis_from_stream(file_path_or_code)
+            elif is_code_string:
+                results = pipeline.run_analysis_from_string(file_path_or_code)
+            else:
+                results = pipeline.run_analysis(file_path_or_code)
             
         logger.info("Analysis completed successfully")
         return results
+    except BackendUnavailableError as e:
+        logger.error(f"Analysis aborted, model backend unavailable: {str(e)}")
+        return {
+            'error': str(e),
+            'error_type': 'backend_unavailable',
+            'retry_after': e.retry_after
+        }
+    except AnalysisCancelledError as e:
+        logger.info(f"Analysis stopped: {str(e)}")
+        return {
+            'error': str(e),
+            'error_type': 'cancelled'
+        }
     except Exception as e:
         logger.error(f"Analysis failed with error: {str(e)}")
         return {
@@ -39,62 +112,313 @@ def analyze_code(file_path_or_code: str, mode: str = 'full', is_code_string: boo
             'edge_cases': "Failed to identify edge cases.",
             'test_cases': "Failed to generate test cases."
         }
+    finally:
+        if profile is not None:
+            profile.stop()
 
 class AnalysisPipeline:
-    def __init__(self, mode: str = "full", language: str = 'python'):
+    def __init__(self, mode: str = "full", language: str = 'python', latency_budget: Optional[float] = None,
+                 on_refined: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 cancel_token: Optional[CancellationToken] = None,
+                 profile: Optional[ProfileSession] = None, reuse_scope: str = ''):
         self.mode = mode
         self.language = language
-        self.analyzer = AIAnalyzer()
+        self.latency_budget = latency_budget
+        self.on_refined = on_refined
+        self.started_at = time.monotonic()
+        self.plan = None
+        self.source_code = None  # Full original code, which generated tests run against
+        self.execute_tests = EXECUTE_GENERATED_TESTS and language.lower() == 'python'
+        self.cancel_token = cancel_token
+        self.analyzer = AIAnalyzer(mode=mode)
+        self.analyzer.cancel_token = cancel_token
+        self.analyzer.scope = reuse_scope
+        self.profile = profile
+        self.reuse_scope = reuse_scope
         self.code_processor = CodeProcessor()
-        logger.info(f"Initializing AnalysisPipeline with mode: {mode}, language: {language}")
+        self.static_analyzer = StaticAnalyzer()
+        logger.info(f"Initializing AnalysisPipeline with mode: {mode}, language: {language}, "
+                    f"latency budget: {latency_budget}")
+
+    def plan_analysis(self, code_length: int) -> AnalysisPlan:
+        """Decide which stages, chunk size and model fit the latency budget.
+
+        Stages are added in order of value while the estimated number of call
+        rounds (calls divided by the current concurrency limit) still fits the
+        budget. At least the correctness stage is always planned.
+        """
+        all_stages = [key for key, _, _ in ANALYSIS_STAGES]
+        if self.latency_budget is None:
+            return AnalysisPlan(stages=all_stages, max_chunk_size=self.code_processor.max_chunk_size)
+
+        budget = self.latency_budget
+        call_latency = model_limiter.smoothed_latency or DEFAULT_CALL_LATENCY
+        max_tier = None
+        if budget < call_latency * 2:
+            max_tier = 'fast'
+            call_latency *= FAST_MODEL_SPEEDUP
+
+        max_chunk_size = self.code_processor.max_chunk_size
+        if budget < COARSE_CHUNK_BUDGET:
+            max_chunk_size *= 2
+
+        estimated_chunks = max(1, math.ceil(code_length / max_chunk_size))
+        slots = max(1, int(model_limiter.limit))
+        stage_count = 1
+        for count in range(1, len(all_stages) + 1):
+            rounds = math.ceil(estimated_chunks * count / slots)
+            if rounds * call_latency <= budget:
+                stage_count = count
+
+        plan = AnalysisPlan(stages=all_stages[:stage_count], max_chunk_size=max_chunk_size,
+                            max_tier=max_tier, deadline=self.started_at + budget)
+        logger.info(f"Planned {stage_count} stages with model tier cap {max_tier} and chunk size "
+                    f"{max_chunk_size} for a {budget:.1f}s budget")
+        return plan
+
+    def _apply_plan(self, plan: AnalysisPlan) -> None:
+        self.plan = plan
+        self.analyzer.max_tier = plan.max_tier
+        self.code_processor.max_chunk_size = plan.max_chunk_size
+
+    @staticmethod
+    def _response_text(result: Dict[str, Any], fallback: str) -> str:
+        """Return the model response, or say why it is missing instead of hiding the error."""
+        if 'response' in result:
+            return result['response']
+        if result.get('error'):
+            return f"{fallback[:-1]} ({result['error']})."
+        return fallback
+
+    def _parse(self, chunk: Dict[str, Any]):
+        """Parse a Python chunk for the local passes; None if it is not Python or does not parse."""
+        if self.language.lower() != 'python':
+            return None
+        try:
+            return parse_python(chunk['code'])
+        except (SyntaxError, ValueError):
+            return None
+
+    def _static_pass(self, chunk: Dict[str, Any]):
+        """Run the local static pass once per chunk and attach findings for the prompt.
 
-    def analyze_chunk(self, chunk: Dict[str, Any]) -> Dict[str, Any]:
-        """Analyze a single code chunk."""
+        Non-trivial chunks are fingerprinted from the same syntax tree, since
+        parsing is most of the cost of both passes.
+        """
+        if 'static_analysis' not in chunk:
+            tree = self._parse(chunk)
+            analysis = self.static_analyzer.analyze(chunk['code'], self.language, tree) if tree is not None else None
+            if analysis is None or not analysis.is_trivial:
+                chunk['fingerprint'] = (fingerprint_index.fingerprinter.fingerprint(chunk['code'], self.language, tree)
+                                        if FINGERPRINT_REUSE_ENABLED and tree is not None else None)
+            chunk['static_analysis'] = analysis
+            if analysis is not None:
+                record_static_pass(analysis.is_trivial)
+                chunk['static_findings'] = analysis.summary()
+        return chunk['static_analysis']
+
+    def _fingerprint(self, chunk: Dict[str, Any]):
+        """Fingerprint a chunk once for result reuse."""
+        if 'fingerprint' not in chunk:
+            chunk['fingerprint'] = (fingerprint_index.fingerprinter.fingerprint(chunk['code'], self.language)
+                                    if FINGERPRINT_REUSE_ENABLED else None)
+        return chunk['fingerprint']
+
+    def _raise_if_cancelled(self, remaining: List[str]) -> None:
+        """Stop a chunk task once the analysis is cancelled, counting the calls it skips."""
+        if self.cancel_token is not None and self.cancel_token.cancelled:
+            record_cancelled_calls(len(remaining))
+            raise AnalysisCancelledError(self.cancel_token.reason)
+
+    def _run_generated_tests(self, chunk: Dict[str, Any], test_cases_response: str):
+        if self.cancel_token is not None and self.cancel_token.cancelled:
+            return []
+        return get_test_runner().run_generated_tests(self.source_code or chunk['code'], test_cases_response)
+
+    def profiling(self):
+        """Context in which the current thread's work is profiled, if this analysis is."""
+        if self.profile is None:
+            return nullcontext()
+        return self.profile.track()
+
+    def _chunk_task(self, chunk: Dict[str, Any], stages: Optional[List[str]] = None) -> Dict[str, Any]:
+        """``analyze_chunk`` as run on executor threads, joining the profile when there is one."""
+        if self.profile is None:
+            return self.analyze_chunk(chunk, stages)
+        with self.profile.track():
+            return self.analyze_chunk(chunk, stages)
+
+    def analyze_chunk(self, chunk: Dict[str, Any], stages: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Analyze a single code chunk.
+
+        Trivial chunks are answered from the static pass without calling the
+        model; other chunks carry the static findings into their prompts.
+        Chunks structurally identical or near-identical to earlier ones reuse
+        those results instead.
+
+        Args:
+            chunk: The code chunk with its context
+            stages: Result keys of the stages to run; all stages when omitted
+        """
         try:
+            requested = [key for key, _, _ in ANALYSIS_STAGES if stages is None or key in stages]
+            self._raise_if_cancelled(requested)
+
             # Ensure the language is included in the chunk context
             if 'context' in chunk and isinstance(chunk['context'], dict):
                 chunk['context']['language'] = self.language
                 
             logger.info(f"Starting chunk analysis for {self.language} code")
-            
-            # Semantic understanding
-            logger.info("Analyzing code semantics")
-            semantic_analysis = self.analyzer.analyze_semantics(chunk)
-            
-            # Correctness assessment
-            logger.info("Assessing code correctness")
-            correctness_analysis = self.analyzer.assess_correctness(chunk)
-            
-            # Edge case identification
-            logger.info("Identifying edge cases")
-            edge_cases = self.analyzer.identify_edge_cases(chunk)
-            
-            # Test case generation
-            logger.info("Generating test cases")
-            test_cases = self.analyzer.generate_test_cases(chunk)
+            static_analysis = self._static_pass(chunk)
+            if static_analysis is not None and static_analysis.is_trivial:
+                local_results = self.static_analyzer.local_results(static_analysis)
+                results = {key: text for key, text in local_results.items() if stages is None or key in stages}
+                record_calls_avoided(len(results))
+                logger.info("Trivial chunk answered by the static pass")
+                return results
+
+            fingerprint = self._fingerprint(chunk)
+            match = fingerprint_index.lookup(fingerprint, requested, self.reuse_scope) if fingerprint is not None else None
+            if match is not None:
+                match_type, similarity, reused = match
+                logger.info(f"Reusing {match_type} match (similarity {similarity:.2f}) for {requested}")
+                record_calls_avoided(len(requested))
+                results = {key: reused[key] for key in requested}
+                if 'test_cases' in results and self.execute_tests:
+                    results['test_execution'] = self._run_generated_tests(chunk, results['test_cases'])
+                return results
             
             # Return raw responses for simplified processing
-            return {
-                'semantic_analysis': semantic_analysis.get('response', "No semantic analysis available."),
-                'correctness_analysis': correctness_analysis.get('response', "No correctness analysis available."),
-                'edge_cases': edge_cases.get('response', "No edge case analysis available."),
-                'test_cases': test_cases.get('response', "No test cases available.")
-            }
+            results = {}
+            succeeded = {}
+            for key, method_name, fallback in ANALYSIS_STAGES:
+                if key not in requested:
+                    continue
+                self._raise_if_cancelled(requested[requested.index(key):])
+                logger.info(f"Running {key} stage")
+                stage_result = getattr(self.analyzer, method_name)(chunk)
+                results[key] = self._response_text(stage_result, fallback)
+                if 'response' in stage_result:
+                    succeeded[key] = stage_result['response']
+                if key == 'test_cases' and self.execute_tests and 'response' in stage_result:
+                    results['test_execution'] = self._run_generated_tests(chunk, stage_result['response'])
+
+            # Only successful model answers are worth reusing
+            if fingerprint is not None and succeeded:
+                fingerprint_index.add(fingerprint, succeeded, self.reuse_scope)
+            return results
+        except (BackendUnavailableError, AnalysisCancelledError):
+            raise
         except Exception as e:
             logger.error(f"Chunk analysis failed with error: {str(e)}")
             raise
 
+    @staticmethod
+    def _combine_results(results: List[Dict[str, Any]], chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Combine per-chunk results into one text per section, keeping the per-chunk breakdown."""
+        combined_results = {key: "\n\n".join([r[key] for r in results]) for key in RESULT_KEYS}
+        combined_results['chunks'] = [
+            {'context': chunk.get('context', {}), **{key: r[key] for key in RESULT_KEYS}}
+            for chunk, r in zip(chunks, results)
+        ]
+        suites = [suite for r in results for suite in r.get('test_execution', [])]
+        if suites:
+            combined_results['test_execution'] = {
+                'summary': TestRunner.get_test_summary(suites),
+                'suites': [suite.to_dict() for suite in suites]
+            }
+        return combined_results
+
+    def _analyze_chunks(self, chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Analyze chunks in parallel, honouring the plan's deadline if there is one."""
+        plan = self.plan
+        if plan is None or plan.deadline is None:
+            logger.info("Starting parallel chunk analysis")
+            with ThreadPoolExecutor() as executor:
+                results = list(executor.map(self._chunk_task, chunks))
+            logger.info("Aggregating results")
+            return self._combine_results(results, chunks)
+
+        logger.info(f"Starting budgeted chunk analysis of stages {plan.stages}")
+        executor = ThreadPoolExecutor()
+        results = [dict() for _ in chunks]
+        futures = {
+            executor.submit(self._chunk_task, chunk, [key]): (index, key)
+            for index, chunk in enumerate(chunks)
+            for key in plan.stages
+        }
+        done, pending = wait(futures, timeout=max(0.0, plan.deadline - time.monotonic()))
+        if self.cancel_token is not None and self.cancel_token.cancelled:
+            # Calls that never started free their executor slots right away
+            record_cancelled_calls(sum(1 for future in pending if future.cancel()))
+            executor.shutdown(wait=False)
+            self.cancel_token.raise_if_cancelled()
+        for future in done:
+            index, key = futures[future]
+            results[index].update(future.result())
+
+        skipped = [key for key in RESULT_KEYS if key not in plan.stages]
+        incomplete = sorted({futures[future][1] for future in pending} | set(skipped))
+        partial_results = []
+        for chunk_results in results:
+            filled = dict(chunk_results)
+            for key in RESULT_KEYS:
+                if key not in filled:
+                    filled[key] = ("Skipped to meet the latency budget." if key in skipped
+                                   else "Not finished within the latency budget.")
+            partial_results.append(filled)
+        combined_results = self._combine_results(partial_results, chunks)
+        combined_results['partial'] = bool(incomplete)
+        combined_results['incomplete_sections'] = incomplete
+
+        if incomplete and self.on_refined is not None:
+            combined_results['refining'] = True
+            threading.Thread(
+                target=self._refine, args=(executor, chunks, results, futures, pending, skipped), daemon=True
+            ).start()
+        else:
+            for future in pending:
+                future.cancel()
+            executor.shutdown(wait=False)
+        return combined_results
+
+    def _refine(self, executor: ThreadPoolExecutor, chunks: List[Dict[str, Any]], results: List[Dict[str, str]],
+                futures: Dict[Any, Any], pending: set, skipped: List[str]) -> None:
+        """Finish pending and skipped stages after the deadline and report full results."""
+        try:
+            logger.info(f"Refining partial results: {len(pending)} pending calls, skipped stages {skipped}")
+            futures = dict(futures)
+            for index, chunk in enumerate(chunks):
+                for key in skipped:
+                    futures[executor.submit(self._chunk_task, chunk, [key])] = (index, key)
+            for future in list(pending) + [f for f in futures if futures[f][1] in skipped]:
+                index, key = futures[future]
+                results[index].update(future.result())
+
+            from .results_aggregator import ResultsAggregator
+            refined = ResultsAggregator().aggregate_results(self._combine_results(results, chunks))
+            refined['partial'] = False
+            self.on_refined(refined)
+            logger.info("Background refinement completed")
+        except AnalysisCancelledError as e:
+            logger.info(f"Background refinement stopped: {str(e)}")
+        except Exception as e:
+            logger.error(f"Background refinement failed: {str(e)}")
+        finally:
+            executor.shutdown(wait=False)
+
     def process_code_string(self, code: str) -> Dict[str, Any]:
         """Process a code string directly and analyze its contents."""
         try:
             # Choose appropriate file extension based on language
-            file_extension = ".js" if self.language == "javascript" else ".py"
-            file_name = f"unnamed_code{file_extension}"
+            file_name = f"unnamed_code{get_language(self.language).file_extension}"
             
             logger.info(f"Processing {self.language} code string directly")
+            self.source_code = code
+            self._apply_plan(self.plan_analysis(len(code)))
             
             # Use our code processor to chunk the code
-            chunks = self.code_processor.process_code_string(code)
+            chunks = self.code_processor.process_code_string(code, self.language)
             
             # If no chunks were created by the processor, create a basic chunk
             if not chunks:
@@ -108,33 +432,48 @@ class AnalysisPipeline:
                 }]
             
             logger.info(f"Code split into {len(chunks)} chunks")
-            
-            # Analyze chunks in parallel
-            logger.info("Starting parallel chunk analysis")
-            with ThreadPoolExecutor() as executor:
-                results = list(executor.map(self.analyze_chunk, chunks))
-            
-            # Simplify result aggregation - just combine results from all chunks
-            logger.info("Aggregating results")
-            
-            # Combine results from all chunks
-            combined_results = {
-                'semantic_analysis': "\n\n".join([r['semantic_analysis'] for r in results]),
-                'correctness_analysis': "\n\n".join([r['correctness_analysis'] for r in results]),
-                'edge_cases': "\n\n".join([r['edge_cases'] for r in results]),
-                'test_cases': "\n\n".join([r['test_cases'] for r in results])
-            }
-            
-            return combined_results
+            return self._analyze_chunks(chunks)
         except Exception as e:
             logger.error(f"Code string processing failed with error: {str(e)}")
             raise
 
+    def process_code_stream(self, lines: Iterable[str]) -> Dict[str, Any]:
+        """Analyze code while it is still being read.
+
+        Each chunk is submitted for analysis as soon as the chunker yields
+        it, so the model calls for the first chunks overlap with reading the
+        rest. The whole code is never held in one string; generated tests run
+        against the chunk they were generated for.
+        """
+        logger.info(f"Processing {self.language} code stream")
+        self._apply_plan(self.plan_analysis(0))
+        chunks = []
+        futures = []
+        executor = ThreadPoolExecutor()
+        try:
+            for chunk in self.code_processor.iter_code_chunks(lines, self.language):
+                if self.cancel_token is not None:
+                    self.cancel_token.raise_if_cancelled()
+                chunks.append(chunk)
+                futures.append(executor.submit(self._chunk_task, chunk))
+            logger.info(f"Code stream split into {len(chunks)} chunks")
+            results = [future.result() for future in futures]
+        except Exception as e:
+            logger.error(f"Code stream processing failed with error: {str(e)}")
+            for future in futures:
+                future.cancel()
+            raise
+        finally:
+            executor.shutdown(wait=False)
+        return self._combine_results(results, chunks)
+
     def process_code(self, code_file: str) -> Dict[str, Any]:
         """Process the code file and analyze its contents."""
         try:
             logger.info(f"Processing code file: {code_file}")
             
+            self._apply_plan(self.plan_analysis(os.path.getsize(code_file)))
+
             # Use the code processor to read and process the file
             chunks = self.code_processor.process_code_from_file(code_file)
             
@@ -153,24 +492,7 @@ class AnalysisPipeline:
                 }]
             
             logger.info(f"Code split into {len(chunks)} chunks")
-            
-            # Analyze chunks in parallel
-            logger.info("Starting parallel chunk analysis")
-            with ThreadPoolExecutor() as executor:
-                results = list(executor.map(self.analyze_chunk, chunks))
-            
-            # Simplify result aggregation - just combine results from all chunks
-            logger.info("Aggregating results")
-            
-            # Combine results from all chunks
-            combined_results = {
-                'semantic_analysis': "\n\n".join([r['semantic_analysis'] for r in results]),
-                'correctness_analysis': "\n\n".join([r['correctness_analysis'] for r in results]),
-                'edge_cases': "\n\n".join([r['edge_cases'] for r in results]),
-                'test_cases': "\n\n".join([r['test_cases'] for r in results])
-            }
-            
-            return combined_results
+            return self._analyze_chunks(chunks)
         except Exception as e:
             logger.error(f"Code processing failed with error: {str(e)}")
             raise
@@ -192,6 +514,21 @@ class AnalysisPipeline:
             logger.error(f"Analysis failed with error: {str(e)}")
             raise
             
+    def run_analysis_from_stream(self, lines: Iterable[str]) -> Dict[str, Any]:
+        """Run the complete analysis pipeline on code lines as they arrive."""
+        try:
+            logger.info("Starting analysis pipeline for code stream")
+            raw_results = self.process_code_stream(lines)
+
+            from .results_aggregator import ResultsAggregator
+            simplified_results = ResultsAggregator().aggregate_results(raw_results)
+
+            logger.info("Analysis pipeline completed with simplified results")
+            return simplified_results
+        except Exception as e:
+            logger.error(f"Analysis failed with error: {str(e)}")
+            raise
+
     def run_analysis_from_string(self, code_string: str) -> Dict[str, Any]:
         """Run the complete analysis pipeline directly from a code string."""
         try:
@@ -0,0 +1,199 @@
+import os
+import sys
+import time
+import marshal
+import pstats
+import cProfile
+import threading
+import tracemalloc
+import logging
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, List, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Profiling is only honoured when the deployment opts in
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'false').lower() == 'true'
+PROFILE_MODES = ('cprofile', 'sampling')
+MAX_STACK_DEPTH = 128
+TOP_ALLOCATIONS = 25
+# From Python 3.12 cProfile runs on sys.monitoring, which allows one active profiler
+# per process, so the per-thread profilers of cprofile mode cannot coexist
+CPROFILE_SUPPORTED = sys.version_info < (3, 12)
+
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+
+@dataclass
+class ProfileReport:
+    """What one profiled analysis recorded, kept with the analysis results."""
+    mode: str
+    duration: float
+    pstats: Optional[bytes] = None  # marshalled pstats data, as pstats.Stats.dump_stats writes
+    collapsed: Optional[str] = None  # "frame;frame;frame count" lines for flamegraph tools
+    memory: Optional[Dict[str, Any]] = None
+
+    def formats(self) -> List[str]:
+        return [name for name in ('pstats', 'collapsed', 'memory') if getattr(self, name) is not None]
+
+
+class ProfileSession:
+    """Profiles the threads working on one analysis.
+
+    Threads join the session for as long as they are inside ``track()``, so
+    only work done for this analysis is recorded, even though the thread
+    pools are shared. ``cprofile`` mode records every call with a
+    per-thread cProfile profiler; ``sampling`` mode samples the tracked
+    threads' stacks on a background thread, which is cheaper and yields
+    collapsed stacks. With ``memory`` the tracemalloc allocation growth
+    over the analysis is recorded as well; tracemalloc is process-wide, so
+    allocations of concurrent analyses are included.
+    """
+    def __init__(self, mode: str = 'sampling', memory: bool = False, sample_interval: float = 0.005):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode: {mode}")
+        if mode == 'cprofile' and not CPROFILE_SUPPORTED:
+            raise ValueError("Profile mode cprofile needs Python < 3.12 on the server, use sampling instead")
+        self.mode = mode
+        self.memory = memory
+        self.sample_interval = sample_interval
+        self.report: Optional[ProfileReport] = None
+        self._lock = threading.Lock()
+        self._depths: Dict[int, int] = {}  # Tracked thread ident -> track() nesting
+        self._profilers: Dict[int, cProfile.Profile] = {}
+        self._finished: List[cProfile.Profile] = []
+        self._stacks: Counter = Counter()
+        self._active = False
+        self._stopped = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._memory_start = None
+        self._started_at = 0.0
+
+    @classmethod
+    def from_header(cls, value: Optional[str]) -> Optional["ProfileSession"]:
+        """Build a session from an ``X-Profile`` header such as ``sampling,memory``.
+
+        Returns None when profiling is disabled or not requested.
+
+        Raises:
+            ValueError: If the header names an unknown mode, or cprofile on
+                Python 3.12 and later.
+        """
+        if not PROFILING_ENABLED or not value:
+            return None
+        options = [option.strip().lower() for option in value.split(',') if option.strip()]
+        modes = [option for option in options if option != 'memory']
+        return cls(
+            mode=modes[0] if modes else 'sampling',
+            memory='memory' in options,
+            sample_interval=float(os.getenv('PROFILE_SAMPLE_INTERVAL_MS', 5)) / 1000,
+        )
+
+    def start(self) -> None:
+        global _tracemalloc_users
+        self._started_at = time.perf_counter()
+        if self.memory:
+            with _tracemalloc_lock:
+                if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+                    tracemalloc.start(10)
+                _tracemalloc_users += 1
+            self._memory_start = tracemalloc.take_snapshot()
+        self._active = True
+        if self.mode == 'sampling':
+            self._sampler = threading.Thread(target=self._sample_loop, name='profile-sampler', daemon=True)
+            self._sampler.start()
+        logger.info(f"Profiling started ({self.mode}{', memory' if self.memory else ''})")
+
+    @contextmanager
+    def track(self):
+        """Profile the current thread while inside this block."""
+        ident = threading.get_ident()
+        with self._lock:
+            entered = self._active
+            outermost = entered and ident not in self._depths
+            if entered:
+                self._depths[ident] = self._depths.get(ident, 0) + 1
+        if outermost and self.mode == 'cprofile':
+            try:
+                profiler = cProfile.Profile()
+                profiler.enable()
+                self._profilers[ident] = profiler
+            except Exception as e:
+                # A profile missing this thread must not fail the work it wraps
+                logger.warning(f"Could not profile thread {ident}: {str(e)}")
+        try:
+            yield
+        finally:
+            if entered:
+                with self._lock:
+                    depth = self._depths.get(ident, 1) - 1
+                    if depth > 0:
+                        self._depths[ident] = depth
+                    else:
+                        self._depths.pop(ident, None)
+                        profiler = self._profilers.pop(ident, None)
+                        if profiler is not None:
+                            try:
+                                profiler.disable()
+                                self._finished.append(profiler)
+                            except Exception as e:
+                                logger.warning(f"Could not stop profiling thread {ident}: {str(e)}")
+
+    def _sample_loop(self) -> None:
+        while not self._stopped.wait(self.sample_interval):
+            with self._lock:
+                idents = list(self._depths)
+            frames = sys._current_frames()
+            for ident in idents:
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if stack:
+                    self._stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self) -> ProfileReport:
+        """Stop profiling and build the report; threads still tracked are left out."""
+        global _tracemalloc_users
+        with self._lock:
+            self._active = False
+            finished = list(self._finished)
+        self._stopped.set()
+        if self._sampler is not None:
+            self._sampler.join()
+
+        report = ProfileReport(mode=self.mode, duration=time.perf_counter() - self._started_at)
+        if self.mode == 'cprofile' and finished:
+            stats = pstats.Stats(finished[0])
+            for profiler in finished[1:]:
+                stats.add(profiler)
+            report.pstats = marshal.dumps(stats.stats)
+        elif self.mode == 'sampling':
+            report.collapsed = ''.join(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
+
+        if self.memory:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            with _tracemalloc_lock:
+                _tracemalloc_users -= 1
+                if _tracemalloc_users == 0:
+                    tracemalloc.stop()
+            growth = snapshot.compare_to(self._memory_start, 'lineno')
+            report.memory = {
+                'traced_current_bytes': current,
+                'traced_peak_bytes': peak,
+                'top_allocations': [
+                    {'location': str(stat.traceback), 'size_bytes': stat.size, 'size_diff_bytes': stat.size_diff,
+                     'count': stat.count, 'count_diff': stat.count_diff}
+                    for stat in growth[:TOP_ALLOCATIONS]
+                ],
+            }
+            self._memory_start = None
+
+        self.report = report
+        logger.info(f"Profiling finished after {report.duration:.2f}s")
+        return report
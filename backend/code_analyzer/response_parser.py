@@ -0,0 +1,109 @@
+import json
+import zlib
+import hashlib
+from typing import Dict, List, Any, Optional
+from dataclasses import dataclass, field
+
+SECTIONS = ['semantic_analysis', 'correctness_analysis', 'edge_cases', 'test_cases']
+
+@dataclass
+class StageResult:
+    """The model (or static pass) output for one stage of one chunk."""
+    stage: str
+    text: str
+
+@dataclass
+class ChunkResult:
+    """All stage results for one code chunk."""
+    index: int
+    context: Dict[str, Any]
+    stages: Dict[str, StageResult] = field(default_factory=dict)
+
+    def to_dict(self, sections: Optional[List[str]] = None) -> Dict[str, Any]:
+        return {
+            'index': self.index,
+            'context': self.context,
+            **{name: stage.text for name, stage in self.stages.items() if sections is None or name in sections}
+        }
+
+@dataclass
+class AnalysisResult:
+    """Structured per-chunk, per-stage result of an analysis."""
+    chunks: List[ChunkResult] = field(default_factory=list)
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+    def section_text(self, section: str) -> str:
+        """Join one section across chunks, as the flat results format expects."""
+        return "\n\n".join(chunk.stages[section].text for chunk in self.chunks if section in chunk.stages)
+
+    def to_sections(self, sections: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Render the flat, backwards-compatible results format.
+
+        Metadata such as executed test results is only included when no
+        section filter is given.
+        """
+        if sections is not None:
+            return {section: self.section_text(section) for section in SECTIONS if section in sections}
+        rendered = {section: self.section_text(section) for section in SECTIONS}
+        rendered.update(self.metadata)
+        return rendered
+
+    def compact(self) -> "CompactResult":
+        payload = {
+            'chunks': [[chunk.index, chunk.context, {name: stage.text for name, stage in chunk.stages.items()}]
+                       for chunk in self.chunks],
+            'metadata': self.metadata,
+        }
+        data = zlib.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'), 6)
+        return CompactResult(data=data, chunk_count=len(self.chunks),
+                             partial=bool(self.metadata.get('partial', False)))
+
+
+@dataclass
+class CompactResult:
+    """An AnalysisResult held as compressed JSON.
+
+    Model output is highly repetitive prose, so it compresses several times
+    over; the structured form is only rebuilt while a request needs it.
+    """
+    data: bytes
+    chunk_count: int
+    partial: bool = False
+
+    @property
+    def etag(self) -> str:
+        return hashlib.blake2b(self.data, digest_size=12).hexdigest()
+
+    def load(self) -> AnalysisResult:
+        payload = json.loads(zlib.decompress(self.data))
+        chunks = [
+            ChunkResult(index=index, context=context,
+                        stages={name: StageResult(stage=name, text=text) for name, text in stages.items()})
+            for index, context, stages in payload['chunks']
+        ]
+        return AnalysisResult(chunks=chunks, metadata=payload['metadata'])
+
+
+class ResponseParser:
+    """Builds the structured result model from the pipeline's output."""
+
+    def parse(self, results: Dict[str, Any]) -> AnalysisResult:
+        """Parse aggregated pipeline results.
+
+        Uses the per-chunk breakdown when the pipeline provides one, and
+        otherwise treats the flat sections as a single chunk.
+        """
+        metadata = {key: value for key, value in results.items() if key not in SECTIONS and key != 'chunks'}
+        raw_chunks = results.get('chunks') or [
+            {'context': {}, **{section: results[section] for section in SECTIONS if section in results}}
+        ]
+        chunks = [
+            ChunkResult(
+                index=index,
+                context=raw_chunk.get('context', {}),
+                stages={section: StageResult(stage=section, text=raw_chunk[section])
+                        for section in SECTIONS if section in raw_chunk}
+            )
+            for index, raw_chunk in enumerate(raw_chunks)
+        ]
+        return AnalysisResult(chunks=chunks, metadata=metadata)
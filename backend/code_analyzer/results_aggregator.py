@@ -19,9 +19,14 @@ class ResultsAggregator:
         Returns:
             The same results with minimal processing
         """
-        return {
+        aggregated = {
             'semantic_analysis': analysis_results['semantic_analysis'],
             'correctness_analysis': analysis_results['correctness_analysis'],
             'edge_cases': analysis_results['edge_cases'],
             'test_cases': analysis_results['test_cases']
-        }
\ No newline at end of file
+        }
+        # Keep the per-chunk breakdown, latency-budget metadata and executed test results
+        for key in ('chunks', 'partial', 'incomplete_sections', 'refining', 'test_execution'):
+            if key in analysis_results:
+                aggregated[key] = analysis_results[key]
+        return aggregated
\ No newline at end of file
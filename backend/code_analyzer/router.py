@@ -0,0 +1,157 @@
+import os
+import json
+import threading
+import logging
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Tiers map to models; rules are checked in order and the first match picks
+# the tier. A rule matches when every condition it lists holds:
+#   modes / stages: allowed values; min_/max_tokens and min_/max_complexity:
+#   inclusive bounds on the chunk's estimated tokens and cyclomatic complexity.
+# Complexity conditions never match chunks without a static analysis.
+# Costs are USD per 1k tokens and only feed the observed cost metrics.
+DEFAULT_ROUTING_TABLE = {
+    'tiers': {
+        'fast': 'gemini-2.0-flash-lite',
+        'standard': 'gemini-2.0-flash',
+        'heavy': 'gemini-2.5-pro',
+    },
+    'costs': {
+        'gemini-2.0-flash-lite': {'input': 0.000075, 'output': 0.0003},
+        'gemini-2.0-flash': {'input': 0.0001, 'output': 0.0004},
+        'gemini-2.5-pro': {'input': 0.00125, 'output': 0.01},
+    },
+    'rules': [
+        {'modes': ['quick'], 'tier': 'fast'},
+        {'max_tokens': 400, 'max_complexity': 3, 'tier': 'fast'},
+        {'stages': ['semantic_understanding', 'edge_cases'], 'max_complexity': 6, 'tier': 'fast'},
+        {'modes': ['deep'], 'stages': ['correctness_assessment', 'test_cases'], 'min_complexity': 10,
+         'tier': 'heavy'},
+        {'min_complexity': 25, 'stages': ['correctness_assessment'], 'tier': 'heavy'},
+    ],
+    'default_tier': 'standard',
+}
+TIER_ORDER = ['fast', 'standard', 'heavy']
+
+
+# Sections merged key by key with the defaults, so an override can name a single tier or model
+MERGED_SECTIONS = ('tiers', 'costs')
+
+
+def load_routing_table() -> Dict[str, Any]:
+    """Load the routing table from MODEL_ROUTING_TABLE (a JSON file path or inline JSON).
+
+    ``tiers`` and ``costs`` are merged per key with the defaults; other
+    entries, such as ``rules``, replace the default entirely.
+    """
+    source = os.getenv('MODEL_ROUTING_TABLE')
+    if not source:
+        return DEFAULT_ROUTING_TABLE
+    try:
+        if os.path.isfile(source):
+            with open(source) as f:
+                table = json.load(f)
+        else:
+            table = json.loads(source)
+        merged = {**DEFAULT_ROUTING_TABLE, **table}
+        for section in MERGED_SECTIONS:
+            merged[section] = {**DEFAULT_ROUTING_TABLE[section], **table.get(section, {})}
+        return merged
+    except (OSError, ValueError, TypeError, AttributeError) as e:
+        logger.error(f"Invalid MODEL_ROUTING_TABLE, using defaults: {str(e)}")
+        return DEFAULT_ROUTING_TABLE
+
+
+class ModelRouter:
+    """Picks a model per chunk x stage and records how each route performs."""
+
+    def __init__(self, table: Optional[Dict[str, Any]] = None):
+        self.table = table or DEFAULT_ROUTING_TABLE
+        self._lock = threading.Lock()
+        self._route_stats: Dict[str, Dict[str, Any]] = {}
+
+    def tier_model(self, tier: str) -> str:
+        return self.table['tiers'][tier]
+
+    @staticmethod
+    def chunk_features(code_chunk: Dict[str, Any]) -> Dict[str, Any]:
+        """Estimated token size and complexity of a chunk."""
+        static_analysis = code_chunk.get('static_analysis')
+        return {
+            'tokens': len(code_chunk['code']) // 4,
+            'complexity': static_analysis.max_function_complexity if static_analysis is not None else None,
+        }
+
+    def _matches(self, rule: Dict[str, Any], features: Dict[str, Any], stage: str, mode: str) -> bool:
+        if 'modes' in rule and mode not in rule['modes']:
+            return False
+        if 'stages' in rule and stage not in rule['stages']:
+            return False
+        tokens, complexity = features['tokens'], features['complexity']
+        if 'min_tokens' in rule and tokens < rule['min_tokens']:
+            return False
+        if 'max_tokens' in rule and tokens > rule['max_tokens']:
+            return False
+        if ('min_complexity' in rule or 'max_complexity' in rule) and complexity is None:
+            return False
+        if 'min_complexity' in rule and complexity < rule['min_complexity']:
+            return False
+        if 'max_complexity' in rule and complexity > rule['max_complexity']:
+            return False
+        return True
+
+    def route(self, code_chunk: Dict[str, Any], stage: str, mode: str = 'full',
+              max_tier: Optional[str] = None) -> str:
+        """Choose the model for one stage of one chunk.
+
+        Args:
+            code_chunk: The chunk, optionally carrying its static analysis
+            stage: Analysis type, e.g. 'test_cases'
+            mode: Requested analysis mode ('full', 'quick' or 'deep')
+            max_tier: Upper bound on the tier, e.g. 'fast' under a tight latency budget
+        """
+        features = self.chunk_features(code_chunk)
+        tier = self.table.get('default_tier', 'standard')
+        for rule in self.table.get('rules', []):
+            if self._matches(rule, features, stage, mode):
+                tier = rule['tier']
+                break
+        if max_tier is not None and TIER_ORDER.index(tier) > TIER_ORDER.index(max_tier):
+            tier = max_tier
+        return self.tier_model(tier)
+
+    def record(self, model: str, stage: str, latency: float, prompt: str, response: Optional[str],
+               success: bool) -> None:
+        """Record the observed latency and estimated cost of one call on a route."""
+        costs = self.table.get('costs', {}).get(model, {})
+        input_tokens = len(prompt) // 4
+        output_tokens = len(response) // 4 if response else 0
+        cost = input_tokens / 1000 * costs.get('input', 0) + output_tokens / 1000 * costs.get('output', 0)
+        key = f"{model}:{stage}"
+        with self._lock:
+            stats = self._route_stats.setdefault(key, {
+                'calls': 0, 'errors': 0, 'total_latency_seconds': 0.0,
+                'input_tokens': 0, 'output_tokens': 0, 'estimated_cost_usd': 0.0,
+            })
+            stats['calls'] += 1
+            stats['errors'] += 0 if success else 1
+            stats['total_latency_seconds'] += latency
+            stats['input_tokens'] += input_tokens
+            stats['output_tokens'] += output_tokens
+            stats['estimated_cost_usd'] += cost
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            routes = {}
+            for key, stats in self._route_stats.items():
+                routes[key] = {
+                    **stats,
+                    'average_latency_seconds': stats['total_latency_seconds'] / stats['calls'],
+                }
+        return {'tiers': self.table['tiers'], 'routes': routes}
+
+
+# Shared so every analysis contributes to the same route statistics
+model_router = ModelRouter(load_routing_table())
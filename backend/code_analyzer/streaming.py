@@ -0,0 +1,70 @@
+import os
+import queue
+import codecs
+import threading
+import logging
+from typing import Any, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+# Uploads larger than this are rejected with 413, even mid-stream
+MAX_UPLOAD_BYTES = int(float(os.getenv('MAX_UPLOAD_MB', 20)) * 1024 * 1024)
+
+class UploadStream:
+    """Hands an upload's bytes, as lines, from the request to an analysis thread.
+
+    The request handler calls ``feed()`` for every received piece and
+    ``close()`` at the end; the analysis thread iterates over the stream and
+    gets each line as soon as it is complete. The buffer between the two is
+    bounded, so a slow consumer slows the upload down instead of letting it
+    pile up in memory.
+    """
+    def __init__(self, max_pending: int = 64, encoding: str = 'utf-8'):
+        self._pieces: "queue.Queue" = queue.Queue(maxsize=max_pending)
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        self._abandoned = threading.Event()
+        self.bytes_received = 0
+
+    def feed(self, data: bytes) -> bool:
+        """Queue received bytes; blocks while the consumer is behind.
+
+        Returns:
+            False if the consumer has stopped reading, in which case the rest
+            of the upload need not be fed.
+        """
+        self.bytes_received += len(data)
+        return self._put(data)
+
+    def _put(self, item: Any) -> bool:
+        while not self._abandoned.is_set():
+            try:
+                self._pieces.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def abandon(self) -> None:
+        """Called by the consumer when it will read no further."""
+        self._abandoned.set()
+
+    def close(self, error: Optional[Exception] = None) -> None:
+        """Mark the end of the upload, or its failure, for the consumer."""
+        self._put(error or StopIteration())
+
+    def __iter__(self) -> Iterator[str]:
+        partial = ''
+        while True:
+            piece = self._pieces.get()
+            if isinstance(piece, StopIteration):
+                break
+            if isinstance(piece, Exception):
+                raise piece
+            text = partial + self._decoder.decode(piece)
+            lines = text.splitlines(keepends=True)
+            # The last line continues in the next piece unless it is terminated
+            partial = lines.pop() if lines and not lines[-1].endswith('\n') else ''
+            yield from lines
+        rest = partial + self._decoder.decode(b'', final=True)
+        if rest:
+            yield rest
@@ -0,0 +1,120 @@
+"""
+Harness executed in an isolated subprocess by TestRunner.
+
+Usage: python -I test_harness.py <test_file> [<limits_json>]
+
+Applies the given resource limits to itself first, then discovers ``test_*``
+functions and ``unittest.TestCase`` methods in the test file and runs each
+one with its own timing. The report is streamed as JSON
+lines over the original stdout pipe, which is moved to a private descriptor
+before any generated code is loaded; output of the code itself goes to
+stderr, and nothing is written to the work directory the code can reach.
+It only uses the standard library so it works in the bare sandbox interpreter.
+"""
+import importlib.util
+import inspect
+import json
+import os
+import sys
+import time
+import traceback
+import unittest
+
+
+def _load_module(test_file):
+    sys.path.insert(0, os.path.dirname(os.path.abspath(test_file)))
+    spec = importlib.util.spec_from_file_location("generated_tests", test_file)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _run_one(name, func):
+    start = time.perf_counter()
+    try:
+        func()
+        outcome, error = 'passed', None
+    except AssertionError as e:
+        outcome, error = 'failed', str(e) or 'AssertionError'
+    except unittest.SkipTest as e:
+        outcome, error = 'skipped', str(e)
+    except Exception:
+        outcome, error = 'error', traceback.format_exc(limit=3)
+    return {
+        'name': name,
+        'outcome': outcome,
+        'duration': time.perf_counter() - start,
+        'error': error,
+    }
+
+
+def _collect(module):
+    tests = []
+    for name, obj in vars(module).items():
+        if name.startswith('test') and inspect.isfunction(obj):
+            if inspect.signature(obj).parameters:
+                tests.append((name, None))  # Needs fixtures we cannot provide
+            else:
+                tests.append((name, obj))
+        elif inspect.isclass(obj) and issubclass(obj, unittest.TestCase):
+            for method_name in unittest.TestLoader().getTestCaseNames(obj):
+                tests.append((f"{name}.{method_name}", _unittest_callable(obj, method_name)))
+    return tests
+
+
+def _unittest_callable(case_class, method_name):
+    def run():
+        result = unittest.TestResult()
+        case_class(method_name).run(result)
+        problems = result.failures or result.errors
+        if result.skipped:
+            raise unittest.SkipTest(result.skipped[0][1])
+        if result.failures:
+            raise AssertionError(problems[0][1])
+        if result.errors:
+            raise RuntimeError(problems[0][1])
+    return run
+
+
+def _limit_resources(limits):
+    """Apply {'RLIMIT_CPU': value, ...} as both soft and hard limits."""
+    try:
+        import resource  # POSIX only
+    except ImportError:
+        return
+    for name, value in limits.items():
+        resource.setrlimit(getattr(resource, name), (value, value))
+
+
+def _open_report_channel():
+    """Take over stdout for the report and send everything else printed to stderr."""
+    sys.stdout.flush()
+    report_fd = os.dup(1)  # Not inheritable, so processes started by tests do not get it
+    os.dup2(2, 1)
+    return os.fdopen(report_fd, 'w')
+
+
+def _send(channel, record):
+    channel.write(json.dumps(record) + '\n')
+    channel.flush()  # Line by line, so a timeout still reports finished tests
+
+
+def main(test_file, limits=None):
+    # Before any generated code is loaded, so it cannot raise the limits again
+    _limit_resources(limits or {})
+    channel = _open_report_channel()
+    try:
+        module = _load_module(test_file)
+        for name, func in _collect(module):
+            if func is None:
+                _send(channel, {'test': {'name': name, 'outcome': 'error', 'duration': 0.0,
+                                         'error': 'Test requires fixtures, which are not supported'}})
+            else:
+                _send(channel, {'test': _run_one(name, func)})
+    except BaseException:
+        _send(channel, {'collection_error': traceback.format_exc(limit=3)})
+    _send(channel, {'done': True})
+
+
+if __name__ == '__main__':
+    main(sys.argv[1], json.loads(sys.argv[2]) if len(sys.argv) > 2 else None)
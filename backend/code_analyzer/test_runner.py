@@ -1,127 +1,311 @@
-# import importlib.util
-# import sys
-# from typing import Dict, List, Any, Optional
-# from dataclasses import dataclass
-# from .response_parser import TestCase
-
-# @dataclass
-# class TestResult:
-#     test_case: TestCase
-#     passed: bool
-#     actual_output: Any
-#     error: Optional[str] = None
-#     execution_time: Optional[float] = None
-
-# class TestRunner:
-#     def __init__(self, module_path: str):
-#         self.module_path = module_path
-#         self.module = self._load_module()
-
-#     def _load_module(self) -> Any:
-#         """Load the Python module to test."""
-#         spec = importlib.util.spec_from_file_location("module_to_test", self.module_path)
-#         if spec is None or spec.loader is None:
-#             raise ImportError(f"Could not load module from {self.module_path}")
-        
-#         module = importlib.util.module_from_spec(spec)
-#         sys.modules["module_to_test"] = module
-#         spec.loader.exec_module(module)
-#         return module
-
-#     def _execute_test(self, test_case: TestCase) -> TestResult:
-#         """Execute a single test case."""
-#         try:
-#             # Get the function to test
-#             func_name = test_case.input_data.get('function', '')
-#             if not func_name:
-#                 return TestResult(
-#                     test_case=test_case,
-#                     passed=False,
-#                     actual_output=None,
-#                     error="No function specified in test case"
-#                 )
-
-#             func = getattr(self.module, func_name, None)
-#             if func is None:
-#                 return TestResult(
-#                     test_case=test_case,
-#                     passed=False,
-#                     actual_output=None,
-#                     error=f"Function {func_name} not found in module"
-#                 )
-
-#             # Prepare input arguments
-#             args = []
-#             kwargs = {}
-#             for key, value in test_case.input_data.items():
-#                 if key != 'function':
-#                     if key.startswith('arg'):
-#                         args.append(eval(value))
-#                     else:
-#                         kwargs[key] = eval(value)
-
-#             # Execute the test
-#             import time
-#             start_time = time.time()
-#             actual_output = func(*args, **kwargs)
-#             execution_time = time.time() - start_time
-
-#             # Compare with expected output
-#             expected_output = eval(test_case.expected_output)
-#             passed = self._compare_outputs(actual_output, expected_output)
-
-#             return TestResult(
-#                 test_case=test_case,
-#                 passed=passed,
-#                 actual_output=actual_output,
-#                 execution_time=execution_time
-#             )
-
-#         except Exception as e:
-#             return TestResult(
-#                 test_case=test_case,
-#                 passed=False,
-#                 actual_output=None,
-#                 error=str(e)
-#             )
-
-#     def _compare_outputs(self, actual: Any, expected: Any) -> bool:
-#         """Compare actual and expected outputs."""
-#         if isinstance(expected, float):
-#             # Use relative tolerance for floating point comparison
-#             return abs(actual - expected) < 1e-9
-#         return actual == expected
-
-#     def run_tests(self, test_cases: List[TestCase]) -> List[TestResult]:
-#         """Run a list of test cases."""
-#         results = []
-#         for test_case in test_cases:
-#             result = self._execute_test(test_case)
-#             results.append(result)
-#         return results
-
-#     def get_test_summary(self, results: List[TestResult]) -> Dict[str, Any]:
-#         """Generate a summary of test results."""
-#         total = len(results)
-#         passed = sum(1 for r in results if r.passed)
-#         failed = total - passed
-        
-#         by_category = {
-#             'normal': {'total': 0, 'passed': 0},
-#             'edge': {'total': 0, 'passed': 0},
-#             'error': {'total': 0, 'passed': 0}
-#         }
-        
-#         for result in results:
-#             category = result.test_case.category
-#             by_category[category]['total'] += 1
-#             if result.passed:
-#                 by_category[category]['passed'] += 1
-        
-#         return {
-#             'total_tests': total,
-#             'passed_tests': passed,
-#             'failed_tests': failed,
-#             'pass_rate': (passed / total) * 100 if total > 0 else 0,
-#             'by_category': by_category
-#         } 
\ No newline at end of file
+import ast
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Any, Optional
+from .code_processor import parse_python
+
+logger = logging.getLogger(__name__)
+
+HARNESS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_harness.py')
+# Where the work directory and harness are mounted inside the sandbox
+SANDBOX_WORK_DIR = '/work'
+SANDBOX_HARNESS_PATH = '/harness/test_harness.py'
+NOBODY = 65534
+TEST_OUTCOMES = ('passed', 'failed', 'error', 'skipped')
+REPORT_TEST_FIELDS = {'name', 'outcome', 'duration', 'error'}
+CODE_BLOCK_PATTERN = re.compile(r"```(?:python|py)?[ \t]*\n(.*?)```", re.DOTALL)
+
+@dataclass
+class TestResult:
+    __test__ = False  # Not a pytest test class
+
+    name: str
+    passed: bool
+    outcome: str  # 'passed', 'failed', 'error' or 'skipped'
+    execution_time: float
+    error: Optional[str] = None
+
+@dataclass
+class TestSuiteResult:
+    __test__ = False
+
+    status: str  # 'passed', 'failed', 'error' or 'timeout'
+    tests: List[TestResult] = field(default_factory=list)
+    execution_time: float = 0.0
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def extract_test_code(response: str) -> List[str]:
+    """Extract the Python code blocks from a generated test case response."""
+    blocks = [block.strip() for block in CODE_BLOCK_PATTERN.findall(response or '')]
+    return [block for block in blocks if 'def test' in block or 'TestCase' in block]
+
+
+def _drop_self_imports(test_code: str, source_code: str) -> str:
+    """Remove imports of names the code under test already defines.
+
+    Generated tests usually import the code under test from a made-up module
+    (``from my_module import add``). Those names are provided by the
+    ``from solution import *`` preamble instead.
+    """
+    try:
+        source_names = {node.name for node in parse_python(source_code).body
+                        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))}
+        test_tree = parse_python(test_code)
+    except SyntaxError:
+        return test_code
+
+    lines = test_code.split('\n')
+    for node in test_tree.body:
+        if isinstance(node, ast.ImportFrom) and node.level == 0 and \
+                all(alias.name in source_names or alias.name == '*' for alias in node.names):
+            for line_number in range(node.lineno, node.end_lineno + 1):
+                lines[line_number - 1] = ''
+    return '\n'.join(lines)
+
+
+class TestRunner:
+    """Runs generated test suites in sandboxed subprocesses.
+
+    Generated tests import the submitted code, so a suite runs untrusted
+    code. With the ``bwrap`` sandbox (the default) every suite runs under
+    bubblewrap in its own user, PID, network, IPC and mount namespaces, as
+    uid ``nobody``, with read-only system directories and only its
+    throwaway work directory writable: no network, no view of the API's
+    files, environment or processes, and killing the sandbox kills
+    everything started in it. ``uid`` additionally starts the sandbox as
+    that user, which needs the API to run as root. The harness applies CPU,
+    memory, file-size and process-count limits before it loads the code.
+
+    The ``none`` sandbox only runs a scrubbed ``python -I``, which does not
+    protect the API process; use it only where the whole service is
+    already isolated, such as a throwaway container.
+    Suites run in parallel, bounded by ``max_workers``.
+    """
+    __test__ = False
+
+    def __init__(self, max_workers: Optional[int] = None, cpu_seconds: int = 10,
+                 memory_mb: int = 512, wall_timeout: float = 30.0, max_processes: int = 32,
+                 sandbox: str = 'bwrap', uid: Optional[int] = None):
+        if sandbox not in ('bwrap', 'none'):
+            raise ValueError(f"Unknown test sandbox: {sandbox}")
+        self.max_workers = max_workers or os.cpu_count() or 2
+        self.cpu_seconds = cpu_seconds
+        self.memory_mb = memory_mb
+        self.wall_timeout = wall_timeout
+        self.max_processes = max_processes
+        self.sandbox = sandbox
+        self.uid = uid
+        self.bwrap = shutil.which('bwrap') if sandbox == 'bwrap' else None
+        if sandbox == 'bwrap' and self.bwrap is None:
+            logger.error("bubblewrap (bwrap) is not installed; generated tests will not be run")
+        elif sandbox == 'none':
+            logger.warning("Generated tests run without a sandbox (TEST_SANDBOX=none)")
+        # Threads only wait on child processes; the work happens in the subprocesses
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='test-runner')
+
+    @classmethod
+    def from_env(cls) -> "TestRunner":
+        return cls(
+            max_workers=int(os.getenv('TEST_RUNNER_WORKERS', 0)) or None,
+            cpu_seconds=int(os.getenv('TEST_RUNNER_CPU_SECONDS', 10)),
+            memory_mb=int(os.getenv('TEST_RUNNER_MEMORY_MB', 512)),
+            wall_timeout=float(os.getenv('TEST_RUNNER_WALL_TIMEOUT', 30)),
+            max_processes=int(os.getenv('TEST_RUNNER_MAX_PROCESSES', 32)),
+            sandbox=os.getenv('TEST_SANDBOX', 'bwrap').lower(),
+            uid=int(os.environ['TEST_RUNNER_UID']) if os.getenv('TEST_RUNNER_UID') else None,
+        )
+
+    def _limits(self) -> Dict[str, int]:
+        """Resource limits the harness applies to itself before loading any generated code."""
+        return {
+            'RLIMIT_CPU': self.cpu_seconds,
+            'RLIMIT_AS': self.memory_mb * 1024 * 1024,
+            'RLIMIT_FSIZE': 10 * 1024 * 1024,
+            'RLIMIT_CORE': 0,
+            # Counted per uid, so with the API's own uid this mostly forbids forking
+            'RLIMIT_NPROC': self.max_processes,
+        }
+
+    def _command(self, work_dir: str) -> List[str]:
+        """The command line running the harness on the suite in ``work_dir``."""
+        limits = json.dumps(self._limits())
+        if self.sandbox == 'none':
+            return [sys.executable, '-I', HARNESS_PATH, os.path.join(work_dir, 'test_generated.py'), limits]
+
+        command = [self.bwrap, '--unshare-all', '--die-with-parent', '--new-session',
+                   '--uid', str(NOBODY), '--gid', str(NOBODY),
+                   '--ro-bind', '/usr', '/usr']
+        for path in ('/bin', '/lib', '/lib64'):
+            command += ['--ro-bind-try', path, path]
+        for prefix in sorted({sys.base_prefix, sys.prefix}):
+            if not prefix.startswith('/usr/'):
+                command += ['--ro-bind', prefix, prefix]
+        command += ['--ro-bind', HARNESS_PATH, SANDBOX_HARNESS_PATH,
+                    '--bind', work_dir, SANDBOX_WORK_DIR, '--chdir', SANDBOX_WORK_DIR,
+                    '--proc', '/proc', '--dev', '/dev', '--tmpfs', '/tmp',
+                    '--clearenv', '--setenv', 'PATH', '/usr/bin:/bin', '--setenv', 'PYTHONHASHSEED', '0',
+                    '--setenv', 'PYTHONDONTWRITEBYTECODE', '1', '--',
+                    sys.executable, '-I', SANDBOX_HARNESS_PATH, f"{SANDBOX_WORK_DIR}/test_generated.py", limits]
+        return command
+
+    @staticmethod
+    def _kill(process: subprocess.Popen) -> bytes:
+        """Kill the suite and anything it spawned; returns what it reported so far."""
+        try:
+            if hasattr(os, 'killpg'):
+                os.killpg(process.pid, 9)
+            else:
+                process.kill()
+        except ProcessLookupError:
+            pass
+        return process.communicate()[0]
+
+    @staticmethod
+    def _parse_report(output: bytes) -> Optional[Dict[str, Any]]:
+        """Validate the harness's JSON-lines report.
+
+        Returns:
+            {'tests': [...], 'collection_error': str or None, 'done': bool},
+            or None if any line is not a well-formed record.
+        """
+        report = {'tests': [], 'collection_error': None, 'done': False}
+        try:
+            # A killed suite may leave a partial last line, which is not part of the report
+            for line in output.decode().split('\n')[:-1]:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    return None
+                if record == {'done': True}:
+                    report['done'] = True
+                elif set(record) == {'collection_error'} and isinstance(record['collection_error'], str):
+                    report['collection_error'] = record['collection_error']
+                elif set(record) == {'test'} and isinstance(record['test'], dict):
+                    test = record['test']
+                    if set(test) != REPORT_TEST_FIELDS or not isinstance(test['name'], str) \
+                            or test['outcome'] not in TEST_OUTCOMES \
+                            or not isinstance(test['duration'], (int, float)) \
+                            or not isinstance(test['error'], (str, type(None))):
+                        return None
+                    report['tests'].append(test)
+                else:
+                    return None
+        except ValueError:  # Includes UnicodeDecodeError
+            return None
+        return report
+
+    def run_suite(self, source_code: str, test_code: str) -> TestSuiteResult:
+        """Run one test suite against the code under test."""
+        start_time = time.perf_counter()
+        if self.sandbox == 'bwrap' and self.bwrap is None:
+            return TestSuiteResult(status='error', error="No sandbox available (bubblewrap is not installed)")
+        with tempfile.TemporaryDirectory(prefix='generated_tests_') as work_dir:
+            if self.uid is not None:
+                os.chown(work_dir, self.uid, self.uid)
+            with open(os.path.join(work_dir, 'solution.py'), 'w') as f:
+                f.write(source_code)
+            test_file = os.path.join(work_dir, 'test_generated.py')
+            with open(test_file, 'w') as f:
+                f.write("from solution import *\n" + _drop_self_imports(test_code, source_code))
+
+            timed_out = False
+            # user/group are switched by Popen itself, so no preexec_fn runs in this threaded process
+            process = subprocess.Popen(
+                self._command(work_dir),
+                cwd=work_dir,
+                env={'PATH': os.environ.get('PATH', ''), 'PYTHONHASHSEED': '0',
+                     'PYTHONDONTWRITEBYTECODE': '1'},
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,  # The report channel, see test_harness
+                stderr=subprocess.PIPE,
+                start_new_session=True,
+                user=self.uid,
+                group=self.uid,
+                extra_groups=[] if self.uid is not None else None,
+            )
+            try:
+                output, stderr = process.communicate(timeout=self.wall_timeout)
+                stderr = stderr.decode(errors='replace')[-2000:]
+                if process.returncode < 0:
+                    stderr += f"\nTest suite killed by signal {-process.returncode} (resource limit exceeded)"
+            except subprocess.TimeoutExpired:
+                timed_out = True
+                output = self._kill(process)
+                stderr = f"Test suite exceeded the {self.wall_timeout}s wall-time limit"
+
+        execution_time = time.perf_counter() - start_time
+        report = self._parse_report(output)
+        if report is None:
+            return TestSuiteResult(status='error', execution_time=execution_time,
+                                   error="Test harness report is malformed; the code under test may have written to it")
+
+        tests = [
+            TestResult(name=test['name'], passed=test['outcome'] == 'passed', outcome=test['outcome'],
+                       execution_time=test['duration'], error=test['error'])
+            for test in report['tests']
+        ]
+        if timed_out or process.returncode < 0:
+            status, error = 'timeout', stderr.strip()
+        elif report['collection_error']:
+            status, error = 'error', report['collection_error']
+        elif not report['done'] or process.returncode != 0:
+            status = 'error'
+            error = stderr.strip() or f"Test harness exited early with status {process.returncode}"
+        else:
+            status = 'passed' if tests and all(t.passed or t.outcome == 'skipped' for t in tests) else 'failed'
+            error = None
+        return TestSuiteResult(status=status, tests=tests, execution_time=execution_time, error=error)
+
+    def run_suites(self, source_code: str, test_suites: List[str]) -> List[TestSuiteResult]:
+        """Run several suites in parallel against the same code."""
+        futures = [self._executor.submit(self.run_suite, source_code, suite) for suite in test_suites]
+        return [future.result() for future in futures]
+
+    def run_generated_tests(self, source_code: str, test_case_response: str) -> List[TestSuiteResult]:
+        """Extract the test suites from a model response and run them."""
+        suites = extract_test_code(test_case_response)
+        if not suites:
+            return []
+        logger.info(f"Running {len(suites)} generated test suites")
+        return self.run_suites(source_code, suites)
+
+    @staticmethod
+    def get_test_summary(results: List[TestSuiteResult]) -> Dict[str, Any]:
+        """Generate a summary of test results."""
+        tests = [test for suite in results for test in suite.tests]
+        total = len(tests)
+        passed = sum(1 for t in tests if t.passed)
+
+        return {
+            'total_suites': len(results),
+            'suite_errors': sum(1 for suite in results if suite.status in ('error', 'timeout')),
+            'total_tests': total,
+            'passed_tests': passed,
+            'failed_tests': total - passed,
+            'pass_rate': (passed / total) * 100 if total > 0 else 0,
+        }
+
+
+_runner_lock = threading.Lock()
+_shared_runner = None
+
+def get_test_runner() -> TestRunner:
+    """Return the process-wide runner so all analyses share one bounded pool."""
+    global _shared_runner
+    with _runner_lock:
+        if _shared_runner is None:
+            _shared_runner = TestRunner.from_env()
+        return _shared_runner
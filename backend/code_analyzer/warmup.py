@@ -0,0 +1,95 @@
+import os
+import time
+import threading
+import logging
+from datetime import datetime
+from typing import Dict, Any, Callable
+
+from .ai_analyzer import AIAnalyzer, call_model_stateless, get_model_client, open_model_connection
+from .batcher import get_batcher
+from .code_processor import CodeProcessor
+from .router import model_router
+from .static_analyzer import StaticAnalyzer
+
+logger = logging.getLogger(__name__)
+
+# With warm-up disabled the process reports ready as soon as it starts
+WARM_UP_ENABLED = os.getenv('WARM_UP_ENABLED', 'true').lower() == 'true'
+
+WARM_UP_SAMPLE = '''
+def fibonacci(n):
+    """Return the n-th Fibonacci number."""
+    a, b = 0, 1
+    for _ in range(n):
+        a, b = b, a + b
+    return a
+'''
+
+_state_lock = threading.Lock()
+readiness = {
+    'ready': False,
+    'started_at': None,
+    'finished_at': None,
+    'phases': {},  # phase -> seconds taken
+    'errors': {},  # phase -> error, for phases that failed
+}
+# Phases without which no analysis can run, so their failure keeps the process unready
+REQUIRED_PHASES = ('model_client',)
+
+def _run_phase(name: str, phase: Callable[[], Any]) -> None:
+    start = time.perf_counter()
+    try:
+        phase()
+    except Exception as e:
+        logger.warning(f"Warm-up phase {name} failed: {str(e)}")
+        with _state_lock:
+            readiness['errors'][name] = str(e)
+    with _state_lock:
+        readiness['phases'][name] = round(time.perf_counter() - start, 4)
+
+def _warm_pipeline() -> None:
+    # First use compiles regexes, imports tokenize/ast helpers and fills caches
+    processor = CodeProcessor()
+    static_analyzer = StaticAnalyzer()
+    for chunk in processor.process_code_string(WARM_UP_SAMPLE, 'python'):
+        static_analyzer.analyze(chunk['code'], 'python')
+
+def _start_batcher() -> None:
+    if AIAnalyzer._batching_enabled():
+        get_batcher(call_model_stateless)
+
+def warm_up() -> None:
+    """Prepare this process for traffic, then mark it ready.
+
+    Runs the chunker and static pass once, builds the shared model client
+    (importing the SDK), opens its connection to the backend and starts the
+    micro-batcher threads. A failed phase is logged and reported. Only a
+    failed model client, i.e. a missing SDK or bad configuration, keeps the
+    process unready: a backend that is down is the circuit breaker's
+    business, and holding every new worker back would not help.
+    """
+    with _state_lock:
+        readiness['started_at'] = datetime.now().isoformat()
+    start = time.perf_counter()
+    if WARM_UP_ENABLED:
+        _run_phase('pipeline', _warm_pipeline)
+        _run_phase('model_client', get_model_client)
+        _run_phase('model_connection', lambda: open_model_connection(model_router.tier_model('fast')))
+        _run_phase('micro_batcher', _start_batcher)
+    with _state_lock:
+        failed = [name for name in REQUIRED_PHASES if name in readiness['errors']]
+        readiness['ready'] = not failed
+        readiness['finished_at'] = datetime.now().isoformat()
+    if failed:
+        logger.error(f"Warm-up finished in {time.perf_counter() - start:.2f}s, not ready: {failed} failed")
+    else:
+        logger.info(f"Warm-up finished in {time.perf_counter() - start:.2f}s, ready for traffic")
+
+def get_readiness() -> Dict[str, Any]:
+    with _state_lock:
+        return {
+            **readiness,
+            'warm_up_enabled': WARM_UP_ENABLED,
+            'phases': dict(readiness['phases']),
+            'errors': dict(readiness['errors']),
+        }
@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from code_analyzer.admission import AdmissionController, AdmissionRejected
+
+
+def busy(**kwargs):
+    """A controller whose only slot is taken by the running analysis 'holder'."""
+    controller = AdmissionController(max_running=1, **kwargs)
+    controller.admit('holder', tenant='other', mode='quick')
+    assert asyncio.run(controller.wait_for_slot('holder'))
+    return controller
+
+
+def test_higher_priority_modes_run_first():
+    async def scenario():
+        controller = AdmissionController(max_running=1)
+        controller.admit('holder', tenant='other', mode='full')
+        await controller.wait_for_slot('holder')
+        started = []
+
+        async def run(analysis_id):
+            await controller.wait_for_slot(analysis_id)
+            started.append(analysis_id)
+            controller.release(analysis_id)
+
+        for analysis_id, mode in (('deep', 'deep'), ('full', 'full'), ('quick', 'quick')):
+            controller.admit(analysis_id, tenant=analysis_id, mode=mode)
+        tasks = [asyncio.ensure_future(run(analysis_id)) for analysis_id in ('deep', 'full', 'quick')]
+        await asyncio.sleep(0)
+        assert started == []
+        controller.release('holder')
+        await asyncio.gather(*tasks)
+        return started
+
+    assert asyncio.run(scenario()) == ['quick', 'full', 'deep']
+
+
+def test_tenant_over_quota_gets_429():
+    controller = AdmissionController(tenant_max_active=2)
+    controller.admit('a1', tenant='a', mode='quick')
+    controller.admit('a2', tenant='a', mode='quick')
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.admit('a3', tenant='a', mode='quick')
+    assert rejected.value.status_code == 429
+    controller.admit('b1', tenant='b', mode='quick')
+    assert controller.stats['rejected_quota'] == 1
+
+
+def test_full_queue_gets_503():
+    controller = busy(max_queued=4)
+    for index in range(4):
+        controller.admit(f'q{index}', tenant=f't{index}', mode='quick')
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.admit('q4', tenant='t4', mode='quick')
+    assert rejected.value.status_code == 503
+    assert controller.snapshot()['queued'] == 4
+
+
+def test_deep_and_full_are_shed_before_quick():
+    controller = busy(max_queued=4)
+    controller.admit('q0', tenant='t0', mode='quick')
+    controller.admit('q1', tenant='t1', mode='quick')
+
+    with pytest.raises(AdmissionRejected):
+        controller.admit('d', tenant='t2', mode='deep')
+    controller.admit('f', tenant='t3', mode='full')
+    with pytest.raises(AdmissionRejected):
+        controller.admit('f2', tenant='t4', mode='full')
+    controller.admit('q2', tenant='t5', mode='quick')
+    assert controller.stats['shed_by_mode'] == {'deep': 1, 'full': 1}
+
+
+def test_retry_after_follows_the_drain_rate():
+    controller = AdmissionController(max_running=2, default_duration=30.0)
+    # Before anything finished: 2 slots every 30s
+    assert controller.retry_after(4) == 60
+    assert controller.retry_after(1000) == 300
+    assert controller.retry_after(0) == 1
+
+    async def run_two():
+        for analysis_id in ('a', 'b'):
+            controller.admit(analysis_id, tenant=analysis_id, mode='quick')
+        assert all(await asyncio.gather(controller.wait_for_slot('a'), controller.wait_for_slot('b')))
+        controller.release('a')
+        controller.release('b')
+
+    asyncio.run(run_two())
+    # 2 finished in the last minute
+    assert controller.retry_after(3) == 90
+
+
+def test_rejection_carries_the_retry_after_estimate():
+    controller = busy(max_queued=1, default_duration=10.0)
+    controller.admit('q0', tenant='t0', mode='quick')
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        controller.admit('q1', tenant='t1', mode='quick')
+    assert rejected.value.retry_after == controller.retry_after(1)
@@ -0,0 +1,39 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import api
+
+
+def test_ttl_runs_from_completion(monkeypatch):
+    monkeypatch.setattr(api, 'RESULT_TTL_SECONDS', 60)
+    long_ago = datetime.now() - timedelta(hours=2)
+    for analysis_id, completed_at in (('slow', datetime.now()), ('stale', long_ago), ('failed', None)):
+        api.analysis_timestamps[analysis_id] = long_ago
+        api.analysis_status[analysis_id] = 'completed' if completed_at else 'failed'
+        if completed_at:
+            api.analysis_completed_at[analysis_id] = completed_at
+
+    api.evict_expired_analyses()
+
+    assert 'slow' in api.analysis_status
+    assert 'stale' not in api.analysis_status
+    assert 'failed' not in api.analysis_status
+    api.forget_analysis('slow')
+
+
+def test_refinement_after_eviction_is_dropped(monkeypatch):
+    refiners = []
+
+    def analyze_code(code, on_refined=None, **kwargs):
+        refiners.append(on_refined)
+        return {'chunks_analyzed': 1, 'results': [], 'partial': True}
+
+    monkeypatch.setattr(api, 'analyze_code', analyze_code)
+    analysis_id = api.register_analysis('tenant', 'full')
+    asyncio.run(api.run_analysis_direct(analysis_id, 'x = 1', 'full', latency_budget_ms=1000))
+    assert api.analysis_status[analysis_id] == 'completed'
+
+    api.forget_analysis(analysis_id)  # As evict_expired_analyses does once the TTL is over
+    refiners[0]({'chunks_analyzed': 1, 'results': []})
+    assert analysis_id not in api.analysis_results
+    assert analysis_id not in api.analysis_completed_at
@@ -0,0 +1,92 @@
+import threading
+import time
+
+import pytest
+
+from code_analyzer import ai_analyzer, pipeline
+from code_analyzer.cancellation import AnalysisCancelledError, CancellationToken, get_cancellation_metrics
+from code_analyzer.pipeline import AnalysisPipeline, AnalysisPlan
+
+
+class Analyzer:
+    """Stands in for AIAnalyzer, counting model calls; ``on_call`` runs inside each one."""
+    def __init__(self, on_call):
+        self.calls = 0
+        self.on_call = on_call
+        self._lock = threading.Lock()
+
+    def __getattr__(self, method_name):
+        def call(chunk):
+            with self._lock:
+                self.calls += 1
+            self.on_call()
+            return {'response': f"{method_name} of {chunk['code']}"}
+        return call
+
+
+@pytest.fixture
+def analysis(monkeypatch):
+    monkeypatch.setattr(ai_analyzer, 'get_model_client', lambda: None)
+    monkeypatch.setattr(pipeline, 'FINGERPRINT_REUSE_ENABLED', False)
+
+    def make(token, on_call, latency_budget=None):
+        # Not Python, so no chunk is answered by the static pass
+        result = AnalysisPipeline(language='javascript', cancel_token=token, latency_budget=latency_budget)
+        result.analyzer = Analyzer(on_call)
+        return result
+    return make
+
+
+def chunks(count):
+    return [{'code': f'f{index}()', 'context': {}} for index in range(count)]
+
+
+def metrics_delta(before):
+    return {key: value - before[key] for key, value in get_cancellation_metrics().items()}
+
+
+def test_cancelled_analysis_skips_its_remaining_stages(analysis):
+    token = CancellationToken()
+    run = analysis(token, lambda: token.cancel('client'))
+    before = get_cancellation_metrics()
+
+    with pytest.raises(AnalysisCancelledError):
+        run._analyze_chunks(chunks(1))
+
+    assert run.analyzer.calls == 1
+    delta = metrics_delta(before)
+    assert delta['cancelled_by_client'] == 1
+    assert delta['model_calls_avoided'] == 3
+
+
+def test_idle_analysis_is_abandoned(analysis):
+    token = CancellationToken(idle_timeout=0.05)
+    run = analysis(token, lambda: time.sleep(0.1))
+    before = get_cancellation_metrics()
+
+    with pytest.raises(AnalysisCancelledError):
+        run._analyze_chunks(chunks(1))
+
+    assert token.reason == 'idle'
+    assert run.analyzer.calls == 1
+    delta = metrics_delta(before)
+    assert delta['cancelled_idle'] == 1
+    assert delta['model_calls_avoided'] == 3
+
+
+def test_cancelling_a_budgeted_run_drops_calls_that_never_started(analysis):
+    token = CancellationToken()
+    run = analysis(token, lambda: token.wait(5), latency_budget=0.3)
+    stages = [key for key, _, _ in pipeline.ANALYSIS_STAGES]
+    run.plan = AnalysisPlan(stages=stages, max_chunk_size=100, deadline=time.monotonic() + 0.3)
+    before = get_cancellation_metrics()
+    threading.Timer(0.1, token.cancel).start()
+
+    with pytest.raises(AnalysisCancelledError):
+        run._analyze_chunks(chunks(40))
+
+    scheduled = 40 * len(stages)
+    assert 0 < run.analyzer.calls < scheduled
+    delta = metrics_delta(before)
+    assert delta['cancelled_by_client'] == 1
+    assert delta['model_calls_avoided'] == scheduled - run.analyzer.calls
@@ -0,0 +1,34 @@
+import pytest
+
+from code_analyzer import ai_analyzer
+from code_analyzer.ai_analyzer import AIAnalyzer
+from code_analyzer.cassette import Cassette, CassetteMissError
+from code_analyzer.concurrency import AdaptiveConcurrencyLimiter, CircuitBreaker
+
+
+@pytest.fixture
+def replaying(tmp_path):
+    path = str(tmp_path / 'calls.cassette')
+    recorder = Cassette(path, 'record', latency_scale=0)
+    recorder.call('chat', 'm', 'alone', lambda: 'answer alone')
+    recorder.record_batch_item('m', 'batched', 'answer batched', 0.2)
+    recorder.close()
+    cassette = Cassette(path, 'replay', latency_scale=0)
+    yield cassette
+    cassette.close()
+
+
+def test_batched_prompts_replay_individually(replaying):
+    assert replaying.call('chat', 'm', 'alone', None) == 'answer alone'
+    assert replaying.call('chat', 'm', 'batched', None) == 'answer batched'
+    assert replaying.snapshot()['misses'] == 0
+
+
+def test_misses_are_raised_without_retrying(replaying, monkeypatch):
+    monkeypatch.setattr(ai_analyzer, 'get_model_client', replaying.wrap)
+    monkeypatch.setattr(ai_analyzer, 'model_circuit_breaker', CircuitBreaker())
+    monkeypatch.setattr(ai_analyzer, 'model_limiter', AdaptiveConcurrencyLimiter())
+
+    with pytest.raises(CassetteMissError):
+        AIAnalyzer()._make_api_call("never recorded")
+    assert replaying.snapshot()['misses'] == 1
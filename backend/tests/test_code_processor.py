@@ -0,0 +1,83 @@
+import pytest
+
+from code_analyzer.code_processor import CodeProcessor
+
+
+def chunks(code, language, max_chunk_size=8000):
+    return [
+        (chunk['context']['start_line'], chunk['context']['total_lines'], chunk['code'])
+        for chunk in CodeProcessor(max_chunk_size=max_chunk_size).process_code_string(code, language)
+    ]
+
+
+PYTHON = (
+    "import os\n"
+    "# helper comment\n"
+    "\n"
+    "\n"
+    "def f(x):\n"
+    "    # inner\n"
+    "    return x\n"
+    "\n"
+    "\n"
+    "\n"
+    "# about g\n"
+    "def g(y):\n"
+    "    return y\n"
+)
+
+
+def test_python_units_keep_their_original_line_numbers():
+    assert chunks(PYTHON, 'python', max_chunk_size=30) == [
+        (1, 1, 'import os'),
+        (5, 3, 'def f(x):\n    return x'),
+        (12, 2, 'def g(y):\n    return y'),
+    ]
+
+
+def test_small_files_are_a_single_chunk():
+    assert chunks(PYTHON, 'python') == [(1, 13, 'import os\ndef f(x):\n    return x\ndef g(y):\n    return y')]
+
+
+def test_comment_only_chunks_are_dropped():
+    code = "def f():\n    return 1\n" + "# " + "x" * 40 + "\n"
+    assert chunks(code, 'python', max_chunk_size=30) == [(1, 2, 'def f():\n    return 1')]
+
+
+@pytest.mark.parametrize('language, code', [
+    ('javascript', "function a() {\n  return 1;\n}\n// next\nfunction b() {\n  return 2;\n}\n"),
+    ('go', "func a() int {\n\treturn 1\n}\n// next\nfunc b() int {\n\treturn 2\n}\n"),
+    ('java', "int a() {\n  return 1;\n}\n// next\nint b() {\n  return 2;\n}\n"),
+])
+def test_bracket_units(language, code):
+    first, second = chunks(code, language, max_chunk_size=30)
+    assert first[:2] == (1, 3) and first[2].endswith('}')
+    assert second[:2] == (5, 3) and 'return 2' in second[2] and '//' not in second[2]
+
+
+def test_oversized_python_class_splits_into_methods_with_the_header_kept():
+    code = "class A:\n    '''doc'''\n" + "".join(
+        f"    def m{i}(self):\n        return {i}\n\n" for i in range(4))
+    result = chunks(code, 'python', max_chunk_size=60)
+    assert [start for start, _, _ in result] == [1, 6, 9, 12]
+    assert result[0][2].startswith("class A:\n    '''doc'''\n    def m0(self):")
+    for _, _, piece in result[1:]:
+        assert piece.startswith('    def m')
+        assert piece.rstrip().split('\n')[-1].strip().startswith('return')
+
+
+def test_oversized_bracket_class_keeps_its_closing_brace_with_the_last_method():
+    code = "class A {\n" + "".join(f"  m{i}() {{\n    return {i};\n  }}\n" for i in range(4)) + "}\n"
+    result = chunks(code, 'javascript', max_chunk_size=60)
+    assert result[0][2].startswith('class A {\n  m0() {')
+    assert result[-1][2].endswith('  }\n}')
+    assert all(piece.strip() not in ('}', 'class A {') for _, _, piece in result)
+
+
+def test_oversized_member_never_leaves_a_header_alone():
+    body = "".join(f"    value_{i} = {i}\n" for i in range(10))
+    code = "def long_function(argument):\n" + body
+    result = chunks(code, 'python', max_chunk_size=40)
+    assert len(result) > 1
+    assert result[0][2].startswith('def long_function(argument):\n    value_0')
+    assert not any(piece.strip().endswith(':') for _, _, piece in result)
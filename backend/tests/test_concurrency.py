@@ -0,0 +1,82 @@
+import random
+
+import pytest
+
+from code_analyzer import ai_analyzer
+from code_analyzer.ai_analyzer import AIAnalyzer
+from code_analyzer.concurrency import AdaptiveConcurrencyLimiter, BackendUnavailableError, CircuitBreaker
+
+
+class FakeChat:
+    def send_message(self, prompt):
+        return type('Response', (), {'text': 'ok'})()
+
+
+class FakeClient:
+    def __init__(self):
+        self.chats = type('Chats', (), {'create': lambda _self, model: FakeChat()})()
+
+
+class TimingOutLimiter(AdaptiveConcurrencyLimiter):
+    def acquire(self, timeout=None):
+        raise BackendUnavailableError("No model backend concurrency slot available", retry_after=1.0)
+
+
+@pytest.fixture
+def analyzer(monkeypatch):
+    monkeypatch.setattr(ai_analyzer, 'get_model_client', FakeClient)
+    return AIAnalyzer()
+
+
+def test_acquire_timeout_gives_back_half_open_probe(analyzer, monkeypatch):
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+    breaker.record_failure()
+    monkeypatch.setattr(ai_analyzer, 'model_circuit_breaker', breaker)
+    monkeypatch.setattr(ai_analyzer, 'model_limiter', TimingOutLimiter())
+
+    with pytest.raises(BackendUnavailableError):
+        analyzer._make_api_call("prompt")
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.half_open_calls == 0
+
+    # The probe slot is free again, so the next call probes and closes the breaker
+    monkeypatch.setattr(ai_analyzer, 'model_limiter', AdaptiveConcurrencyLimiter())
+    assert analyzer._make_api_call("prompt") == {'success': True, 'content': 'ok'}
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_client_errors_are_not_retried(analyzer, monkeypatch):
+    calls = []
+
+    class RejectingChat:
+        def send_message(self, prompt):
+            calls.append(prompt)
+            raise ValueError("400 INVALID_ARGUMENT")
+
+    monkeypatch.setattr(ai_analyzer, 'model_circuit_breaker', CircuitBreaker())
+    monkeypatch.setattr(ai_analyzer, 'model_limiter', AdaptiveConcurrencyLimiter())
+    analyzer.chats[analyzer.model] = RejectingChat()
+
+    result = analyzer._make_api_call("prompt")
+    assert result['success'] is False
+    assert len(calls) == 1
+
+
+def test_steady_variable_latency_does_not_shrink_the_limit():
+    rng = random.Random(7)
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=8)
+    tiers = {'fast': (0.5, 3.0), 'standard': (2.0, 8.0), 'heavy': (5.0, 20.0)}
+    for _ in range(2000):
+        model = rng.choice(list(tiers))
+        limiter.acquire()
+        limiter.release(rng.uniform(*tiers[model]), 'success', model)
+    assert limiter.total_decreases == 0
+    assert limiter.limit >= 8
+
+
+def test_sustained_slowdown_shrinks_the_limit():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=8)
+    for latency in [2.0] * 100 + [8.0] * 20:
+        limiter.acquire()
+        limiter.release(latency, 'success', 'model')
+    assert limiter.total_decreases >= 1
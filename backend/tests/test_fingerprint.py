@@ -0,0 +1,88 @@
+from code_analyzer.fingerprint import Fingerprinter, FingerprintIndex
+
+
+def make_index():
+    return FingerprintIndex(Fingerprinter())
+
+
+def fingerprint(code):
+    return Fingerprinter().fingerprint(code)
+
+
+def test_renames_identifiers_in_code_only():
+    index = make_index()
+    index.add(fingerprint("def add(a, b):\n    return a + b\n"), {
+        'semantic_analysis': "This is a function that returns a sum: `add(a, b)`.\n```python\nadd(a, b)\n```",
+    })
+
+    match_type, _, results = index.lookup(fingerprint("def plus(x, y):\n    return x + y\n"),
+                                          ['semantic_analysis'])
+
+    text = results['semantic_analysis']
+    assert match_type == 'exact'
+    assert "This is a function that returns a sum: `plus(x, y)`." in text
+    assert "```python\nplus(x, y)\n```" in text
+    assert "identifiers in code were renamed" in text
+
+
+def test_identical_code_is_reused_without_note():
+    index = make_index()
+    code = "def add(a, b):\n    return a + b\n"
+    index.add(fingerprint(code), {'edge_cases': "None."})
+
+    assert index.lookup(fingerprint(code), ['edge_cases']) == ('exact', 1.0, {'edge_cases': "None."})
+
+
+def test_constant_only_match_carries_note():
+    index = make_index()
+    index.add(fingerprint("def inc(a):\n    return a + 1\n"), {'correctness_analysis': "Adds 1."})
+
+    _, _, results = index.lookup(fingerprint("def inc(a):\n    return a + 2\n"), ['correctness_analysis'])
+
+    assert "constant values differ" in results['correctness_analysis']
+    assert results['correctness_analysis'].endswith("Adds 1.")
+
+
+def test_string_literals_are_not_abstracted():
+    first = fingerprint("def key():\n    return 'secret-one'\n")
+    second = fingerprint("def key():\n    return 'secret-two'\n")
+
+    assert first.structural_hash != second.structural_hash
+
+
+def test_results_are_not_shared_between_scopes():
+    index = make_index()
+    code = "def add(a, b):\n    return a + b\n"
+    index.add(fingerprint(code), {'edge_cases': "None."}, scope='tenant-a')
+
+    assert index.lookup(fingerprint(code), ['edge_cases'], scope='tenant-b') is None
+    assert index.lookup(fingerprint(code), ['edge_cases'], scope='tenant-a') is not None
+
+
+def test_imported_modules_and_names_are_not_renamed():
+    safe = fingerprint("import json\n\ndef load(data):\n    return json.loads(data)\n")
+    unsafe = fingerprint("import pickle\n\ndef load(data):\n    return pickle.loads(data)\n")
+    strong = fingerprint("from hashlib import sha256\n\ndef digest(data):\n    return sha256(data).hexdigest()\n")
+    weak = fingerprint("from hashlib import md5\n\ndef digest(data):\n    return md5(data).hexdigest()\n")
+
+    assert safe.structural_hash != unsafe.structural_hash
+    assert strong.structural_hash != weak.structural_hash
+    index = make_index()
+    index.add(safe, {'correctness_analysis': "Safe: `json.loads` only builds plain data."})
+    assert index.lookup(unsafe, ['correctness_analysis']) is None
+
+
+def test_free_names_are_not_renamed():
+    assert fingerprint("def run(cmd):\n    return check_call(cmd)\n").structural_hash != \
+        fingerprint("def run(cmd):\n    return check_output(cmd)\n").structural_hash
+
+
+def test_near_matches_need_the_same_imports():
+    body = "".join(f"    total_{i} = data.count({i}) + len(data)\n" for i in range(40))
+    safe = fingerprint(f"import json\n\ndef load(data):\n{body}    return json.loads(data)\n")
+    unsafe = fingerprint(f"import pickle\n\ndef load(data):\n{body}    return pickle.loads(data)\n")
+    index = make_index()
+    index.add(safe, {'correctness_analysis': "Safe."})
+
+    assert Fingerprinter.similarity(safe.signature, unsafe.signature) >= index.threshold
+    assert index.lookup(unsafe, ['correctness_analysis']) is None
@@ -0,0 +1,81 @@
+import threading
+import time
+
+import pytest
+
+from code_analyzer import ai_analyzer, pipeline
+from code_analyzer.concurrency import AdaptiveConcurrencyLimiter
+from code_analyzer.pipeline import AnalysisPipeline, AnalysisPlan, RESULT_KEYS
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    """Calls take 10s and 4 run at once, as far as the planner can tell."""
+    monkeypatch.setattr(ai_analyzer, 'get_model_client', lambda: None)
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=4)
+    limiter.smoothed_latency = 10.0
+    monkeypatch.setattr(pipeline, 'model_limiter', limiter)
+    return limiter
+
+
+def plan(budget, code_length=1000):
+    return AnalysisPipeline(latency_budget=budget).plan_analysis(code_length)
+
+
+def test_no_budget_plans_every_stage(limiter):
+    planned = plan(None)
+    assert planned.stages == ['correctness_analysis', 'semantic_analysis', 'edge_cases', 'test_cases']
+    assert planned.max_tier is None and planned.deadline is None
+
+
+def test_ample_budget_plans_every_stage_at_the_normal_chunk_size(limiter):
+    planned = plan(600)
+    assert len(planned.stages) == 4
+    assert planned.max_tier is None
+    assert planned.max_chunk_size == AnalysisPipeline().code_processor.max_chunk_size
+
+
+def test_stages_are_dropped_least_valuable_first(limiter):
+    # 10 chunks x 2 stages over 4 slots is 5 rounds of 10s
+    planned = plan(60, code_length=10 * AnalysisPipeline().code_processor.max_chunk_size)
+    assert planned.stages == ['correctness_analysis', 'semantic_analysis']
+
+
+def test_tight_budget_caps_the_tier_and_coarsens_chunks(limiter):
+    planned = plan(15)
+    assert planned.max_tier == 'fast'
+    assert planned.max_chunk_size == 2 * AnalysisPipeline().code_processor.max_chunk_size
+    assert planned.stages[0] == 'correctness_analysis'
+
+
+def test_partial_results_are_replaced_by_refined_ones(limiter):
+    release = threading.Event()
+    refined = []
+
+    def chunk_task(chunk, stages):
+        key, = stages
+        if key != 'correctness_analysis':
+            release.wait(5)
+        return {key: f"{key} of {chunk['code']}"}
+
+    analysis = AnalysisPipeline(latency_budget=0.2, on_refined=refined.append)
+    analysis._chunk_task = chunk_task
+    analysis.plan = AnalysisPlan(stages=['correctness_analysis', 'semantic_analysis'], max_chunk_size=100,
+                                 deadline=time.monotonic() + 0.2)
+    chunks = [{'code': 'a', 'context': {}}, {'code': 'b', 'context': {}}]
+
+    partial = analysis._analyze_chunks(chunks)
+    assert partial['partial'] and partial['refining']
+    assert partial['incomplete_sections'] == ['edge_cases', 'semantic_analysis', 'test_cases']
+    assert partial['correctness_analysis'] == "correctness_analysis of a\n\ncorrectness_analysis of b"
+    assert partial['chunks'][0]['semantic_analysis'] == "Not finished within the latency budget."
+    assert partial['chunks'][0]['test_cases'] == "Skipped to meet the latency budget."
+
+    release.set()
+    deadline = time.monotonic() + 5
+    while not refined and time.monotonic() < deadline:
+        time.sleep(0.01)
+    result, = refined
+    assert result['partial'] is False
+    for key in RESULT_KEYS:
+        assert result['chunks'][1][key] == f"{key} of b"
@@ -0,0 +1,27 @@
+import cProfile
+
+import pytest
+
+from code_analyzer import profiling
+from code_analyzer.profiling import ProfileSession
+
+
+def test_cprofile_is_refused_where_unsupported(monkeypatch):
+    monkeypatch.setattr(profiling, 'CPROFILE_SUPPORTED', False)
+    with pytest.raises(ValueError, match="Python < 3.12"):
+        ProfileSession(mode='cprofile')
+
+
+def test_profiler_errors_do_not_fail_tracked_work(monkeypatch):
+    class BusyProfile(cProfile.Profile):
+        def enable(self, *args, **kwargs):
+            raise ValueError("Another profiling tool is already active")
+
+    monkeypatch.setattr(profiling.cProfile, 'Profile', BusyProfile)
+    session = ProfileSession(mode='cprofile')
+    session.start()
+    with session.track():
+        done = True
+    report = session.stop()
+    assert done
+    assert report.pstats is None
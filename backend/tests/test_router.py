@@ -0,0 +1,22 @@
+import json
+
+from code_analyzer.router import DEFAULT_ROUTING_TABLE, ModelRouter, load_routing_table
+
+
+def test_partial_tier_override_keeps_other_tiers(monkeypatch):
+    monkeypatch.setenv('MODEL_ROUTING_TABLE', json.dumps({
+        'tiers': {'heavy': 'custom-pro'},
+        'costs': {'custom-pro': {'input': 0.002, 'output': 0.02}},
+    }))
+    table = load_routing_table()
+    router = ModelRouter(table)
+
+    assert router.tier_model('heavy') == 'custom-pro'
+    assert router.tier_model('fast') == DEFAULT_ROUTING_TABLE['tiers']['fast']
+    assert set(DEFAULT_ROUTING_TABLE['costs']) < set(table['costs'])
+    assert table['rules'] == DEFAULT_ROUTING_TABLE['rules']
+
+
+def test_invalid_table_falls_back_to_defaults(monkeypatch):
+    monkeypatch.setenv('MODEL_ROUTING_TABLE', '["not", "a", "table"]')
+    assert load_routing_table() == DEFAULT_ROUTING_TABLE
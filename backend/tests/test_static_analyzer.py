@@ -0,0 +1,27 @@
+import ast
+
+from code_analyzer.static_analyzer import StaticAnalyzer
+
+
+def is_trivial(code):
+    return StaticAnalyzer().analyze(code).is_trivial
+
+
+def test_plain_getters_and_dataclass_shells_are_trivial():
+    assert is_trivial("def name(self):\n    return self._name\n")
+    assert is_trivial("@dataclass(frozen=True)\nclass Point:\n    x: int = 0\n    y: int = 0\n")
+
+
+def test_decorated_functions_are_not_trivial():
+    assert not is_trivial("@app.route('/admin')\ndef admin():\n    return PAGE\n")
+    assert not is_trivial("class Config:\n    @property\n    def url(self):\n        return self._url\n")
+
+
+def test_subscript_returns_are_not_trivial():
+    assert not is_trivial("def first(self):\n    return self.items[0]\n")
+
+
+def test_parsed_tree_is_reused():
+    code = "def first(items):\n    return items[0]\n"
+    tree = ast.parse(code)
+    assert StaticAnalyzer().analyze("not parsed again (", 'python', tree).definitions == ['first']
@@ -0,0 +1,39 @@
+import pytest
+
+from code_analyzer.test_runner import TestRunner
+
+SOURCE = "def add(a, b):\n    return a + b\n"
+TESTS = "def test_add():\n    assert add(1, 2) == 3\n\ndef test_wrong():\n    assert add(1, 1) == 3\n"
+
+
+@pytest.fixture(scope='module')
+def runner():
+    return TestRunner(max_workers=2, wall_timeout=20, sandbox='none')
+
+
+def test_reports_each_test(runner):
+    result = runner.run_suite(SOURCE, TESTS)
+    assert result.status == 'failed'
+    assert [(test.name, test.outcome) for test in result.tests] == [('test_add', 'passed'), ('test_wrong', 'failed')]
+
+
+def test_code_that_exits_early_is_an_error(runner):
+    source = "import os\nopen('results.json', 'w').write('{}')\nos._exit(0)\n" + SOURCE
+    result = runner.run_suite(source, TESTS)
+    assert result.status == 'error'
+    assert result.tests == []
+
+
+def test_printing_does_not_corrupt_the_report(runner):
+    source = "print('{\"done\": true}')\nprint('{}')\n" + SOURCE
+    result = runner.run_suite(source, TESTS)
+    assert result.status == 'failed'
+    assert len(result.tests) == 2
+
+
+def test_malformed_report_is_an_error():
+    assert TestRunner._parse_report(b'{}\n') is None
+    assert TestRunner._parse_report(b'[1]\n') is None
+    assert TestRunner._parse_report(b'{"test": {"name": "t", "outcome": "passed"}}\n') is None
+    assert TestRunner._parse_report(b'{"done": true}\n{"test": {"name": "t", "outco') == \
+        {'tests': [], 'collection_error': None, 'done': True}
@@ -0,0 +1,83 @@
+import asyncio
+
+import httpx
+import pytest
+
+import api
+from code_analyzer.admission import AdmissionController
+from code_analyzer.streaming import UploadStream
+
+
+@pytest.fixture
+def uploads(monkeypatch):
+    """A single analysis slot, held by 'holder', and a count of fed upload pieces."""
+    fed = []
+    original_feed = UploadStream.feed
+
+    def feed(self, data):
+        fed.append(data)
+        return original_feed(self, data)
+
+    def analyze_code(code, **kwargs):
+        return {'chunks_analyzed': len(list(code)), 'results': []}
+
+    monkeypatch.setattr(UploadStream, 'feed', feed)
+    monkeypatch.setattr(api, 'analyze_code', analyze_code)
+    monkeypatch.setattr(api, 'admission_controller', AdmissionController(max_running=1))
+    monkeypatch.setattr(api, 'request_times', {})
+    return fed
+
+
+async def start_upload(client):
+    before = set(api.analysis_tokens)
+    request = asyncio.ensure_future(client.post(
+        '/analyze/upload', content=b'x = 1\ny = 2\n', headers={'X-API-Key': 'test_key'}))
+    await asyncio.sleep(0.3)
+    analysis_id, = set(api.analysis_tokens) - before
+    return request, analysis_id
+
+
+def client():
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url='http://test')
+
+
+def test_queued_upload_is_not_read_until_it_has_a_slot(uploads):
+    async def scenario():
+        api.admission_controller.admit('holder', tenant='other', mode='full')
+        assert await api.admission_controller.wait_for_slot('holder')
+        async with client() as http:
+            request, analysis_id = await start_upload(http)
+            assert not request.done()
+            assert uploads == []
+            assert api.admission_controller.snapshot()['queued'] == 1
+
+            api.admission_controller.release('holder')
+            response = await request
+            await asyncio.gather(*api.upload_tasks)
+        return response, analysis_id
+
+    response, analysis_id = asyncio.run(scenario())
+    assert response.status_code == 200
+    assert response.json()['bytes_received'] == len(b'x = 1\ny = 2\n')
+    assert uploads
+    assert api.analysis_status[analysis_id] == 'completed'
+    api.forget_analysis(analysis_id)
+
+
+def test_upload_cancelled_while_queued_is_never_read(uploads):
+    async def scenario():
+        api.admission_controller.admit('holder', tenant='other', mode='full')
+        assert await api.admission_controller.wait_for_slot('holder')
+        async with client() as http:
+            request, analysis_id = await start_upload(http)
+            api.analysis_tokens[analysis_id].cancel('client')
+            response = await request
+        api.admission_controller.release('holder')
+        return response, analysis_id
+
+    response, analysis_id = asyncio.run(scenario())
+    assert response.status_code == 200
+    assert response.json()['status'] == 'cancelled'
+    assert response.json()['bytes_received'] == 0
+    assert uploads == []
+    api.forget_analysis(analysis_id)
@@ -0,0 +1,74 @@
+import asyncio
+import os
+import subprocess
+import sys
+
+import httpx
+import pytest
+
+import api
+from code_analyzer import warmup
+
+
+@pytest.fixture
+def fresh_readiness(monkeypatch):
+    monkeypatch.setattr(warmup, 'WARM_UP_ENABLED', True)
+    monkeypatch.setattr(warmup, 'readiness', {'ready': False, 'started_at': None, 'finished_at': None,
+                                              'phases': {}, 'errors': {}})
+    monkeypatch.setattr(warmup, 'open_model_connection', lambda model: None)
+    monkeypatch.setattr(warmup, '_start_batcher', lambda: None)
+    monkeypatch.setattr(api, 'request_times', {})
+
+
+def get_ready():
+    async def request():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url='http://test') as client:
+            return await client.get('/ready')
+    return asyncio.run(request())
+
+
+def fail(message):
+    def phase(*args):
+        raise RuntimeError(message)
+    return phase
+
+
+def test_importing_the_api_does_not_load_the_model_sdk():
+    code = "import sys, api; print(sorted(m for m in ('google.genai', 'dotenv') if m in sys.modules))"
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            env={**os.environ, 'WARM_UP_ENABLED': 'false'}).stdout
+    assert output.strip().splitlines()[-1] == '[]'
+
+
+def test_ready_once_warm_up_has_finished(fresh_readiness, monkeypatch):
+    monkeypatch.setattr(warmup, 'get_model_client', lambda: object())
+    assert get_ready().status_code == 503
+
+    warmup.warm_up()
+
+    response = get_ready()
+    assert response.status_code == 200
+    assert set(response.json()['phases']) == {'pipeline', 'model_client', 'model_connection', 'micro_batcher'}
+
+
+def test_failed_model_client_keeps_the_process_unready(fresh_readiness, monkeypatch):
+    monkeypatch.setattr(warmup, 'get_model_client', fail("No module named 'google.genai'"))
+
+    warmup.warm_up()
+
+    response = get_ready()
+    assert response.status_code == 503
+    assert response.json()['finished_at'] is not None
+    assert response.json()['errors'] == {'model_client': "No module named 'google.genai'"}
+
+
+def test_unreachable_backend_does_not_keep_the_process_unready(fresh_readiness, monkeypatch):
+    monkeypatch.setattr(warmup, 'get_model_client', lambda: object())
+    monkeypatch.setattr(warmup, 'open_model_connection', fail("connection refused"))
+
+    warmup.warm_up()
+
+    response = get_ready()
+    assert response.status_code == 200
+    assert response.json()['errors'] == {'model_connection': "connection refused"}